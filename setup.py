@@ -1,9 +1,15 @@
+import re
+
 from setuptools import setup
 
+# The version is only kept in the package, so that the cache keys and the release agree.
+with open('vmf_converter/__init__.py', 'r') as init_file:
+  version = re.search(r"^__version__ = '([^']+)'", init_file.read(), re.MULTILINE).group(1)
+
 setup(
   name='vmf-converter',
   packages=['vmf_converter', 'vmf_converter.core'],
-  version='0.0.2',
+  version=version,
   description='VMF Converter for Music21',
   long_description = open('README.rst', 'r').read(),
   author = 'Patrick Ayoup',
@@ -12,6 +18,12 @@ setup(
   url='https://github.com/project-schumann/vmf-converter/',
   download_url='https://github.com/project-schumann/vmf-converter/tarball/0.0.1',
   keywords = ['music', 'vector', 'notation'],
+  extras_require = {
+    'numpy': ['numpy']
+  },
+  entry_points = {
+    'console_scripts': ['vmf-convert = vmf_converter.batch:main']
+  },
   classifiers = [
     'Development Status :: 5 - Production/Stable',
     'Environment :: Console',
@@ -88,3 +88,22 @@ class ArticulationConverterTest(unittest.TestCase):
         Tests the VMF to Articulation conversion for unsupported articulation.
         """
         ArticulationConverter.vmf_to_articulation(20)
+
+    def test_articulation_to_vmf_007(self):
+        """
+        Tests that subclasses of a supported articulation are not supported.
+        """
+        class Marcato(Accent):
+            pass
+
+        with self.assertRaises(ValueError):
+            ArticulationConverter.articulation_to_vmf(Marcato())
+
+    def test_vmf_to_articulation_008(self):
+        """
+        Tests that every supported articulation round trips through its encoding.
+        """
+        for articulation in (Staccato, Staccatissimo, StrongAccent, Accent, Tenuto):
+            vmf = ArticulationConverter.articulation_to_vmf(articulation())
+
+            assert type(ArticulationConverter.vmf_to_articulation(vmf)) is articulation
@@ -0,0 +1,75 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+from vmf_converter import batch
+
+
+class BatchTest(unittest.TestCase):
+    """Test Class for batch module"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, 'source')
+        self.destination = os.path.join(self.directory.name, 'destination')
+
+        os.makedirs(os.path.join(self.source, 'nested'))
+        shutil.copy('./fixtures/keyChange.mid', self.source)
+        shutil.copy('./fixtures/chordsAndSustain.xml', os.path.join(self.source, 'nested'))
+
+        with open(os.path.join(self.source, 'broken.mid'), 'w') as broken_file:
+            broken_file.write('not a midi file')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_convert_corpus_001(self):
+        """
+        Tests converting a directory tree, with a failing file isolated from the others.
+        """
+        summary = batch.convert_corpus(self.source, self.destination, processes=2, chunk_size=1)
+
+        assert sorted(os.path.basename(path) for path in summary.converted) == ['chordsAndSustain.xml', 'keyChange.mid']
+        assert [os.path.basename(path) for path, error in summary.failed] == ['broken.mid']
+        assert summary.files_per_second > 0
+
+        with open(os.path.join(self.destination, 'nested', 'chordsAndSustain.vmf'), 'r') as actual_file:
+            actual = json.loads(actual_file.read())
+
+        with open('./expected/chordsAndSustain.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())
+
+        assert actual == expected
+
+    def test_main_001(self):
+        """
+        Tests the console entry point.
+        """
+        status = batch.main([self.source, self.destination, '-j', '1', '-f', 'vmfb', '-e', 'mid'])
+
+        assert status == 1
+        assert os.path.isfile(os.path.join(self.destination, 'keyChange.vmfb'))
+        assert not os.path.exists(os.path.join(self.destination, 'nested'))
+
+    def test_convert_corpus_002(self):
+        """
+        Tests that files over the tick budget fail without stopping the others.
+        """
+        summary = batch.convert_corpus(self.source, self.destination, processes=1, max_ticks=4)
+
+        assert [os.path.basename(path) for path in summary.converted] == ['keyChange.mid']
+        assert sorted(os.path.basename(path) for path, error in summary.failed) == ['broken.mid', 'chordsAndSustain.xml']
+        assert 'over the budget' in dict(summary.failed)[os.path.join(self.source, 'nested', 'chordsAndSustain.xml')]
+
+    def test_convert_corpus_003(self):
+        """
+        Tests quantizing the scores before encoding them.
+        """
+        summary = batch.convert_corpus(self.source, self.destination, processes=1, quantize=(4, 3))
+
+        assert sorted(os.path.basename(path) for path, report in summary.quantized) == \
+               ['chordsAndSustain.xml', 'keyChange.mid']
+        assert all(report.max_onset_displacement == 0 for path, report in summary.quantized)
+        assert 'Quantized 2 files' in str(summary)
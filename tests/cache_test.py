@@ -0,0 +1,223 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from music21 import converter
+
+from vmf_converter import cache
+from vmf_converter.cache import VMFCache, ENTRY_EXTENSION, TEMPORARY_EXTENSION
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.vmf_converter import VMFConverter
+
+
+class VMFCacheTest(unittest.TestCase):
+    """Test Class for cache module"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = VMFCache(os.path.join(self.directory.name, 'cache'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def copy_fixture(self, name):
+        path = os.path.join(self.directory.name, name + '.vmf')
+        shutil.copyfile('./expected/' + name + '.vmf', path)
+
+        return path
+
+    def counting_reader(self, calls):
+        def read(path):
+            calls.append(path)
+            return vmf_converter_core.read_vmf_file(path)
+
+        return read
+
+    def test_load_001(self):
+        """
+        Tests that a hit returns the same music without calling the reader.
+        """
+        path = self.copy_fixture('chords')
+        calls = []
+
+        first = self.cache.load(path, self.counting_reader(calls))
+        second = self.cache.load(path, self.counting_reader(calls))
+
+        assert len(calls) == 1
+        assert self.cache.hits == 1
+        assert self.cache.misses == 1
+
+        expected = [(n.offset, n.duration.quarterLength, n.fullName) for n in first.flat.notes]
+        actual = [(n.offset, n.duration.quarterLength, n.fullName) for n in second.flat.notes]
+        assert actual == expected
+        assert len(actual) > 0
+
+    def test_load_002(self):
+        """
+        Tests that changing the contents of a file changes its key.
+        """
+        path = self.copy_fixture('chords')
+        calls = []
+
+        key = self.cache.key(path)
+        self.cache.load(path, self.counting_reader(calls))
+
+        shutil.copyfile('./expected/triplets.vmf', path)
+
+        assert self.cache.key(path) != key
+
+        self.cache.load(path, self.counting_reader(calls))
+
+        assert len(calls) == 2
+
+    def test_key_001(self):
+        """
+        Tests that bumping the cache format changes the key of a file, so that its old entry is not found.
+        """
+        path = self.copy_fixture('chords')
+        key = self.cache.key(path)
+
+        cache.CACHE_FORMAT_VERSION += 1
+
+        try:
+            assert self.cache.key(path) != key
+        finally:
+            cache.CACHE_FORMAT_VERSION -= 1
+
+        assert self.cache.key(path) == key
+
+    def test_get_001(self):
+        """
+        Tests that a corrupt entry is removed and treated as a miss.
+        """
+        path = self.copy_fixture('chords')
+        key = self.cache.key(path)
+
+        with open(os.path.join(self.cache.directory, key + ENTRY_EXTENSION), 'wb') as file:
+            file.write(b'not a pickle')
+
+        assert self.cache.get(key) is None
+        assert not os.path.exists(os.path.join(self.cache.directory, key + ENTRY_EXTENSION))
+
+    def test_evict_001(self):
+        """
+        Tests that the least recently used entries are evicted beyond the size cap.
+        """
+        paths = [self.copy_fixture(name) for name in ('chords', 'triplets', 'duplets')]
+
+        for path in paths:
+            self.cache.load(path, vmf_converter_core.read_vmf_file)
+
+        entry_paths = [os.path.join(self.cache.directory, self.cache.key(path) + ENTRY_EXTENSION) for path in paths]
+
+        # Make the first entry the most recently used and the second the least.
+        for age, entry_path in zip((10, 30, 20), entry_paths):
+            os.utime(entry_path, (1000000000 - age, 1000000000 - age))
+
+        self.cache.max_bytes = os.path.getsize(entry_paths[0]) + os.path.getsize(entry_paths[2])
+        self.cache.evict()
+
+        assert os.path.exists(entry_paths[0])
+        assert not os.path.exists(entry_paths[1])
+        assert os.path.exists(entry_paths[2])
+
+    def test_put_001(self):
+        """
+        Tests that storing a score leaves it unchanged.
+        """
+        score = converter.parse('./fixtures/chordsAndSustain.xml')
+        expected = [(n.offset, n.fullName) for n in score.flat.notes]
+
+        self.cache.put('key', score)
+
+        assert [(n.offset, n.fullName) for n in score.flat.notes] == expected
+        assert [(n.offset, n.fullName) for n in self.cache.get('key').flat.notes] == expected
+
+    def test_evict_002(self):
+        """
+        Tests that temporary files left behind by a failed write count toward the size cap and are evicted.
+        """
+        path = self.copy_fixture('chords')
+        key = self.cache.key(path)
+        entry_path = os.path.join(self.cache.directory, key + ENTRY_EXTENSION)
+        temporary_path = os.path.join(self.cache.directory, 'leftover' + TEMPORARY_EXTENSION)
+
+        self.cache.load(path, vmf_converter_core.read_vmf_file)
+
+        with open(temporary_path, 'wb') as file:
+            file.write(b'\0' * 1000)
+
+        os.utime(temporary_path, (1000000000, 1000000000))
+
+        self.cache.max_bytes = os.path.getsize(entry_path) + 999
+        self.cache.evict()
+
+        assert os.path.exists(entry_path)
+        assert not os.path.exists(temporary_path)
+
+    def test_put_002(self):
+        """
+        Tests that a failed rename leaves no temporary file behind.
+        """
+        score = converter.parse('./fixtures/chordsAndSustain.xml')
+
+        def fail(source, destination):
+            raise OSError('rename failed')
+
+        replace_file = cache._replace_file
+        cache._replace_file = fail
+
+        try:
+            with self.assertRaises(OSError):
+                self.cache.put('key', score)
+        finally:
+            cache._replace_file = replace_file
+
+        assert os.listdir(self.cache.directory) == []
+
+    def test_put_003(self):
+        """
+        Tests that the directory is scanned on the first put, then only when the cache grows past its cap.
+        """
+        score = converter.parse('./fixtures/chordsAndSustain.xml')
+        calls = []
+        evict = self.cache.evict
+
+        def counting_evict():
+            calls.append(None)
+            evict()
+
+        self.cache.evict = counting_evict
+
+        for key in ('first', 'second', 'third'):
+            self.cache.put(key, score)
+
+        assert len(calls) == 1
+
+        size = os.path.getsize(os.path.join(self.cache.directory, 'first' + ENTRY_EXTENSION))
+        self.cache.max_bytes = size * 2 + size // 2
+        self.cache.put('fourth', score)
+
+        assert len(calls) == 2
+        assert len(os.listdir(self.cache.directory)) == 2
+
+    def test_vmf_converter_parse_file_001(self):
+        """
+        Tests that the converter uses the cache when one is set.
+        """
+        path = self.copy_fixture('chords')
+
+        first = VMFConverter(cache=self.cache)
+        first.parseFile(path)
+        second = VMFConverter(cache=self.cache)
+        second.parseFile(path)
+
+        assert self.cache.misses == 1
+        assert self.cache.hits == 1
+        assert len(second.stream.flat.notes) == len(first.stream.flat.notes)
+
+        VMFConverter().parseFile(path)
+
+        assert self.cache.misses == 1
+        assert self.cache.hits == 1
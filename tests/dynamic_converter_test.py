@@ -1,6 +1,11 @@
 import unittest
 from nose.tools import raises
-from vmf_converter.core.dynamic_converter import DynamicConverter
+from vmf_converter.core.dynamic_converter import DynamicConverter, DYNAMICS, VELOCITY_TO_VMF
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class DynamicConverterTest(unittest.TestCase):
@@ -80,6 +85,21 @@ class DynamicConverterTest(unittest.TestCase):
         """
         DynamicConverter.velocity_to_vmf(150)
 
+    def test_velocity_to_vmf_014(self):
+        """
+        Tests that fractional velocities are rounded to the nearest integer instead of truncated.
+        """
+        assert DynamicConverter.velocity_to_vmf(12.4) == -5
+        assert DynamicConverter.velocity_to_vmf(12.5) == -4
+        assert DynamicConverter.velocity_to_vmf(64.9) == 1
+        assert DynamicConverter.velocity_to_vmf(127.4) == 5
+
+        with self.assertRaises(ValueError):
+            DynamicConverter.velocity_to_vmf(127.5)
+
+        with self.assertRaises(ValueError):
+            DynamicConverter.velocity_to_vmf(-0.6)
+
     def test_vmf_to_velocity_001(self):
         """
         Tests the VMF to Velocity conversion for a pppp dynamic.
@@ -145,4 +165,44 @@ class DynamicConverterTest(unittest.TestCase):
         """
         Tests the VMF to Velocity conversion for a 0 dynamic (invalid).
         """
-        DynamicConverter.vmf_to_velocity(0)
\ No newline at end of file
+        DynamicConverter.vmf_to_velocity(0)
+
+    def test_velocity_to_vmf_013(self):
+        """
+        Tests that the velocity table agrees with the ranges of every dynamic.
+        """
+        assert len(VELOCITY_TO_VMF) == 128
+
+        for vmf, velocity, low, high in DYNAMICS:
+            assert DynamicConverter.velocity_to_vmf(low) == vmf
+            assert DynamicConverter.velocity_to_vmf(high) == vmf
+            assert DynamicConverter.vmf_to_velocity(vmf) == velocity
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_velocities_to_vmf_001(self):
+        """
+        Tests the batch conversion of velocities against the scalar one.
+        """
+        velocities = numpy.arange(128).reshape(8, 16)
+
+        assert DynamicConverter.velocities_to_vmf(velocities).tolist() == \
+            [[DynamicConverter.velocity_to_vmf(velocity) for velocity in row] for row in velocities.tolist()]
+
+        with self.assertRaises(ValueError):
+            DynamicConverter.velocities_to_vmf(numpy.array([64, 128]))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_vmf_to_velocities_001(self):
+        """
+        Tests the batch conversion of dynamics against the scalar one, and that 0 is rejected.
+        """
+        dynamics = numpy.array([-5, -4, -3, -2, -1, 1, 2, 3, 4, 5])
+
+        assert DynamicConverter.vmf_to_velocities(dynamics).tolist() == \
+            [DynamicConverter.vmf_to_velocity(vmf) for vmf in dynamics.tolist()]
+
+        with self.assertRaises(ValueError):
+            DynamicConverter.vmf_to_velocities(numpy.array([1, 0]))
+
+        with self.assertRaises(ValueError):
+            DynamicConverter.vmf_to_velocities(numpy.array([6]))
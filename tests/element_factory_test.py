@@ -0,0 +1,113 @@
+import unittest
+
+from music21.articulations import Staccato
+from music21.chord import Chord
+from music21.note import Note
+from music21.pitch import Pitch
+
+from vmf_converter.core.element_factory import ElementFactory
+
+
+class ElementFactoryTest(unittest.TestCase):
+    """Test Class for element_factory module"""
+
+    def test_pitch_001(self):
+        """
+        Tests that pitches match the ones spelled by music21.
+        """
+        factory = ElementFactory()
+
+        for i in range(2):
+            for pitch_class in range(12):
+                expected = Pitch(pitchClass=pitch_class, octave=3)
+                actual = factory.pitch(pitch_class, 3)
+
+                assert actual.nameWithOctave == expected.nameWithOctave
+                assert actual.ps == expected.ps
+
+        assert factory.misses == 12
+        assert factory.hits == 12
+        assert factory.hit_rate == 0.5
+
+    def test_pitch_002(self):
+        """
+        Tests that pitches from the same prototype do not share state.
+        """
+        factory = ElementFactory()
+
+        first = factory.pitch(1, 4)
+        second = factory.pitch(1, 4)
+
+        assert first is not second
+        assert first.accidental is not second.accidental
+
+        first.accidental.displayStatus = True
+        first.octave = 5
+
+        assert second.accidental.displayStatus is None
+        assert second.nameWithOctave == 'C#4'
+
+    def test_pitch_003(self):
+        """
+        Tests that pitches keep their own groups and the implicit naturals of the prototype.
+        """
+        factory = ElementFactory()
+
+        first = factory.pitch(0, 4)
+        second = factory.pitch(0, 4)
+
+        first.groups.append('melody')
+
+        assert type(second.groups) is type(Pitch().groups)
+        assert len(second.groups) == 0
+        assert second.accidental.name == 'natural'
+        assert second.implicitAccidental == Pitch(pitchClass=0, octave=4).implicitAccidental
+
+    def test_chord_001(self):
+        """
+        Tests that chords are built with their pitches in order.
+        """
+        factory = ElementFactory()
+
+        factory.note(4, 4)
+        first = factory.chord(((0, 4), (4, 4), (7, 4)))
+        second = factory.chord(((0, 4), (4, 4), (7, 4)))
+
+        assert isinstance(first, Chord)
+        assert [pitch.nameWithOctave for pitch in second.pitches] == ['C4', 'E4', 'G4']
+        assert first.pitches[0] is not second.pitches[0]
+        # The second pitch was cached by the note, and the second chord by the first.
+        assert factory.hits == 2
+        assert factory.misses == 4
+
+    def test_articulation_001(self):
+        """
+        Tests that articulations are new instances of the converted class.
+        """
+        factory = ElementFactory()
+
+        first = factory.articulation(3)
+        second = factory.articulation(3)
+
+        assert isinstance(first, Staccato)
+        assert first is not second
+        assert factory.articulation(0) is None
+        self.assertRaises(ValueError, factory.articulation, 9)
+
+    def test_max_size_001(self):
+        """
+        Tests that the least recently used prototypes are evicted.
+        """
+        factory = ElementFactory(max_size=2)
+
+        factory.pitch(0, 4)
+        factory.pitch(2, 4)
+        factory.pitch(0, 4)
+        factory.pitch(4, 4)
+
+        # (2, 4) was evicted, (0, 4) was kept.
+        factory.pitch(0, 4)
+        assert factory.hits == 2
+        factory.pitch(2, 4)
+        assert factory.misses == 4
+        assert isinstance(factory.note(2, 4), Note)
@@ -0,0 +1,71 @@
+import unittest
+import io
+import json
+
+from music21 import converter
+
+from vmf_converter.core import midi_converter, vmf_converter_core
+
+
+class MidiConverterTest(unittest.TestCase):
+    """Test Class for midi_converter module"""
+
+    def test_convert_midi_file_to_vmf_001(self):
+        """
+        Tests that the direct conversion matches the expected files of the MIDI fixtures.
+        """
+        for fixture in ('simple', 'ties', 'triplets', 'chords', 'dynamics', 'keyChange', 'tempoChange',
+                        'SimpleToCompound', 'CompoundToCompound', 'duplets', 'dottedQuarter'):
+            actual = midi_converter.convert_midi_file_to_vmf('./fixtures/' + fixture + '.mid')
+
+            with open('./expected/' + fixture + '.vmf', 'r') as expected_file:
+                expected = json.loads(expected_file.read())
+
+            assert actual == expected, fixture
+
+    def test_convert_midi_file_to_vmf_002(self):
+        """
+        Tests that the direct conversion matches the conversion of the parsed score, in every layout.
+        """
+        for fixture in ('aus_meines_herz_triplets.mid', 'quintuplets.mid', 'anacrusis.mid', 'voices.mid'):
+            for body_encoding in ('plain', 'rle'):
+                for body_layout in ('tick', 'voice'):
+                    actual = midi_converter.convert_midi_file_to_vmf('./fixtures/' + fixture, body_encoding,
+                                                                     body_layout)
+                    expected = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/' + fixture),
+                                                                       body_encoding, body_layout)
+
+                    assert actual == expected, (fixture, body_encoding, body_layout)
+
+    def test_convert_midi_file_to_vmf_003(self):
+        """
+        Tests that the tick budget is applied as it is for parsed scores.
+        """
+        actual = midi_converter.convert_midi_file_to_vmf('./fixtures/aus_meines_herz_triplets.mid', max_ticks=20,
+                                                         coarsen=True)
+        expected = vmf_converter_core.convert_score_to_vmf(
+            converter.parse('./fixtures/aus_meines_herz_triplets.mid'), max_ticks=20, coarsen=True)
+
+        assert actual == expected
+
+        with self.assertRaises(ValueError):
+            midi_converter.convert_midi_file_to_vmf('./fixtures/aus_meines_herz_triplets.mid', max_ticks=20)
+
+    def test_read_midi_tracks_001(self):
+        """
+        Tests that tracks needing voices are detected, so that they are parsed by music21 instead.
+        """
+        assert midi_converter.is_direct_conversion_supported(midi_converter.read_midi_tracks('./fixtures/chords.mid'))
+        assert not midi_converter.is_direct_conversion_supported(
+            midi_converter.read_midi_tracks('./fixtures/voices.mid'))
+
+    def test_write_midi_file_as_vmf_001(self):
+        """
+        Tests that the streamed output is the same as the dictionary.
+        """
+        file = io.StringIO()
+
+        midi_converter.write_midi_file_as_vmf('./fixtures/chords.mid', file, body_encoding='rle')
+
+        assert json.loads(file.getvalue()) == midi_converter.convert_midi_file_to_vmf('./fixtures/chords.mid',
+                                                                                      body_encoding='rle')
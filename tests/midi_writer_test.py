@@ -0,0 +1,200 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+
+from music21 import converter
+
+from vmf_converter.core import midi_writer, vmf_converter_core
+from vmf_converter.core.tick_grid import TickGrid
+from vmf_converter.core.vmf_document import VMFDocument
+
+
+def find_notes(score):
+    """
+    Lists the notes of a score, with chords split into their notes.
+
+    :param score: The music21 score.
+    :return: A sorted list of (offset, quarter length, MIDI pitch, velocity) tuples.
+    """
+
+    notes = []
+
+    for part in score.parts:
+        for element in part.flat.notes:
+            for pitch in element.pitches:
+                notes.append((float(element.offset), float(element.quarterLength), pitch.midi,
+                              element.volume.velocity))
+
+    return sorted(notes)
+
+
+class MidiWriterTest(unittest.TestCase):
+    """Test Class for midi_writer module"""
+
+    def parse_midi(self, data):
+        """
+        Parses the bytes of a MIDI file with music21.
+        """
+
+        handle, path = tempfile.mkstemp(suffix='.mid')
+
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(data)
+
+            return converter.parse(path, forceSource=True)
+        finally:
+            os.remove(path)
+
+    def test_convert_vmf_to_midi_001(self):
+        """
+        Tests that the rendered notes are those of the decoded score.
+        """
+        for fixture in ('simple', 'ties', 'triplets', 'chordsAndSustain', 'dynamics', 'voices', 'anacrusis'):
+            with open('./expected/' + fixture + '.vmf', 'r') as expected_file:
+                vmf_string = expected_file.read()
+
+            actual = self.parse_midi(midi_writer.convert_vmf_to_midi(json.loads(vmf_string)))
+            expected = vmf_converter_core.read_vmf_string(vmf_string)
+
+            assert find_notes(actual) == find_notes(expected), fixture
+
+    def test_convert_vmf_to_midi_002(self):
+        """
+        Tests that the meter and tempo events come from the header.
+        """
+        with open('./expected/tempoChange.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        score = self.parse_midi(midi_writer.convert_vmf_to_midi(vmf))
+
+        tempos = [(mark.offset, mark.number) for mark in score.flat.getElementsByClass('MetronomeMark')]
+        time_signatures = [(ts.offset, ts.ratioString) for ts in score.flat.getElementsByClass('TimeSignature')]
+
+        assert tempos == [(0.0, 100.0), (4.0, 150.0)]
+        assert time_signatures == [(0.0, '2/4')]
+
+    def test_convert_vmf_to_midi_003(self):
+        """
+        Tests that the encoding and layout of the body do not change the MIDI file.
+        """
+        score = converter.parse('./fixtures/chords.mid')
+
+        expected = midi_writer.convert_vmf_to_midi(vmf_converter_core.convert_score_to_vmf(score))
+        actual = midi_writer.convert_vmf_to_midi(vmf_converter_core.convert_score_to_vmf(score, body_encoding='rle',
+                                                                                           body_layout='voice'))
+
+        assert actual == expected
+
+    def test_convert_document_to_midi_001(self):
+        """
+        Tests that a range of ticks is rendered from its start, with the notes sounding there.
+        """
+        with open('./expected/chordsAndSustain.vmf', 'r') as expected_file:
+            document = VMFDocument.from_string(expected_file.read())
+
+        notes = find_notes(self.parse_midi(document.ticks(1, 8).to_midi()))
+
+        assert notes[0][0] == 0.0
+        assert notes == sorted(notes)
+
+    def test_convert_document_to_midi_002(self):
+        """
+        Tests that a document is rendered through its views, without copying its body.
+        """
+        with open('./expected/chordsAndSustain.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        expected = midi_writer.convert_vmf_to_midi(vmf)
+        document = VMFDocument.from_dict(vmf)
+
+        def to_dict():
+            raise AssertionError("The body was copied")
+
+        document.to_dict = to_dict
+
+        assert midi_writer.convert_document_to_midi(document) == expected
+
+    def test_build_conductor_events_001(self):
+        """
+        Tests that key signatures a MIDI file cannot hold are left out instead of failing.
+        """
+        with open('./expected/keyChange.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        vmf['header']['key_signature'] = {'0.0': -135, '4.0': 1, '8.0': 8, '12.0': -7}
+
+        events = midi_writer.build_conductor_events(VMFDocument.from_dict(vmf).header, 480)
+        key_signatures = [(time, event[-2:]) for time, order, event in events
+                          if event[1] == midi_writer.KEY_SIGNATURE]
+
+        assert key_signatures == [(1920, b'\x01\x00'), (5760, b'\xf9\x00')]
+
+        self.parse_midi(midi_writer.convert_vmf_to_midi(vmf))
+
+    def test_build_conductor_events_002(self):
+        """
+        Tests that time signatures whose denominator is not a power of two are left out instead of miswritten.
+        """
+        with open('./expected/keyChange.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        vmf['header']['time_signature'] = {'0.0': '4/4', '4.0': '3/6', '8.0': '6/8', '12.0': '5/0'}
+
+        events = midi_writer.build_conductor_events(VMFDocument.from_dict(vmf).header, 480)
+        time_signatures = [(time, event[3:5]) for time, order, event in events
+                           if event[1] == midi_writer.TIME_SIGNATURE]
+
+        assert time_signatures == [(0, b'\x04\x02'), (3840, b'\x06\x03')]
+
+    def test_build_conductor_events_003(self):
+        """
+        Tests that tempos that are not positive, or too slow for a MIDI tempo, are left out instead of failing.
+        """
+        with open('./expected/tempoChange.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        vmf['header']['tempo'] = {'0.0': 0, '2.0': -60, '4.0': 120, '6.0': 1}
+
+        events = midi_writer.build_conductor_events(VMFDocument.from_dict(vmf).header, 480)
+        tempos = [(time, event[3:]) for time, order, event in events if event[1] == midi_writer.SET_TEMPO]
+
+        assert tempos == [(1920, b'\x07\xa1\x20')]
+
+        self.parse_midi(midi_writer.convert_vmf_to_midi(vmf))
+
+    def test_find_ticks_per_quarter_001(self):
+        """
+        Tests that the resolution is a multiple of the tick values.
+        """
+        assert midi_writer.find_ticks_per_quarter(TickGrid.uniform('1/2')) == 480
+        assert midi_writer.find_ticks_per_quarter(TickGrid.uniform('1/7')) == 3360
+        assert midi_writer.find_ticks_per_quarter(TickGrid([(0, 1), (2, '1/5')])) == 480
+
+        with self.assertRaises(ValueError):
+            midi_writer.find_ticks_per_quarter(TickGrid.uniform('1/127'))
+
+    def test_encode_variable_length_001(self):
+        """
+        Tests the encoding of variable length quantities.
+        """
+        assert midi_writer.encode_variable_length(0) == b'\x00'
+        assert midi_writer.encode_variable_length(0x7F) == b'\x7F'
+        assert midi_writer.encode_variable_length(0x80) == b'\x81\x00'
+        assert midi_writer.encode_variable_length(0x0FFFFFFF) == b'\xFF\xFF\xFF\x7F'
+
+    def test_write_vmf_as_midi_001(self):
+        """
+        Tests that the written file holds the rendered bytes.
+        """
+        with open('./expected/simple.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        file = io.BytesIO()
+
+        midi_writer.write_vmf_as_midi(vmf, file)
+
+        assert file.getvalue() == midi_writer.convert_vmf_to_midi(vmf)
+        assert file.getvalue().startswith(b'MThd')
@@ -0,0 +1,119 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+
+from music21 import converter
+
+from vmf_converter.core import musicxml_converter, vmf_converter_core
+
+
+class MusicXMLConverterTest(unittest.TestCase):
+    """Test Class for musicxml_converter module"""
+
+    def write_grace_note_fixture(self):
+        """
+        Writes a copy of the syncopated fixture whose first note is a grace note.
+        """
+
+        with open('./fixtures/syncopated.xml', 'r') as fixture_file:
+            musicxml = fixture_file.read().replace('<pitch>', '<grace/><pitch>', 1)
+
+        handle, path = tempfile.mkstemp(suffix='.xml')
+
+        with os.fdopen(handle, 'w') as file:
+            file.write(musicxml)
+
+        return path
+
+    def test_convert_musicxml_file_to_vmf_001(self):
+        """
+        Tests that the direct conversion matches the expected files of the MusicXML fixtures.
+        """
+        for fixture, expected_fixture in (('chordsAndSustain', 'chordsAndSustain'), ('quintuplets', 'quintuplets'),
+                                          ('syncopated', 'syncopated'), ('anacrusis2', 'anacrusis')):
+            actual = musicxml_converter.convert_musicxml_file_to_vmf('./fixtures/' + fixture + '.xml')
+
+            with open('./expected/' + expected_fixture + '.vmf', 'r') as expected_file:
+                expected = json.loads(expected_file.read())
+
+            assert actual == expected, fixture
+
+    def test_convert_musicxml_file_to_vmf_002(self):
+        """
+        Tests that the direct conversion matches the conversion of the parsed score, in every layout.
+        """
+        for fixture in ('anacrusis.xml', 'anacrusisAndRests.xml', 'articulation.xml', 'chordsAndSustain.xml',
+                        'quintuplets.xml', 'voices.xml'):
+            for body_encoding in ('plain', 'rle'):
+                for body_layout in ('tick', 'voice'):
+                    actual = musicxml_converter.convert_musicxml_file_to_vmf('./fixtures/' + fixture, body_encoding,
+                                                                             body_layout)
+                    expected = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/' + fixture),
+                                                                       body_encoding, body_layout)
+
+                    assert actual == expected, (fixture, body_encoding, body_layout)
+
+    def test_convert_musicxml_file_to_vmf_003(self):
+        """
+        Tests that the tick budget is applied as it is for parsed scores.
+        """
+        actual = musicxml_converter.convert_musicxml_file_to_vmf('./fixtures/voices.xml', max_ticks=20, coarsen=True)
+        expected = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/voices.xml'), max_ticks=20,
+                                                           coarsen=True)
+
+        assert actual == expected
+
+        with self.assertRaises(ValueError):
+            musicxml_converter.convert_musicxml_file_to_vmf('./fixtures/voices.xml', max_ticks=20)
+
+    def test_convert_musicxml_file_to_vmf_004(self):
+        """
+        Tests that a file with a feature the stream reader does not cover is parsed by music21 instead.
+        """
+        path = self.write_grace_note_fixture()
+
+        try:
+            actual = musicxml_converter.convert_musicxml_file_to_vmf(path, body_layout='voice')
+            expected = vmf_converter_core.convert_score_to_vmf(converter.parse(path), body_layout='voice')
+        finally:
+            os.remove(path)
+
+        assert actual == expected
+
+    def test_read_musicxml_parts_001(self):
+        """
+        Tests that the measures, voices and padding of the parts are read.
+        """
+        parts = musicxml_converter.read_musicxml_parts('./fixtures/voices.xml')
+
+        assert musicxml_converter.is_direct_conversion_supported(parts)
+        assert len(parts) == 1
+        assert parts[0].name == 'Piano'
+        assert parts[0].number_of_voices == 2
+        assert [measure.has_voices for measure in parts[0].measures] == [True, True, False, False, True]
+        assert parts[0].measures[0].padding == 2.0
+        assert parts[0].measures[0].time_signature == '3/4'
+
+    def test_read_musicxml_parts_002(self):
+        """
+        Tests that features the stream reader does not cover are detected.
+        """
+        path = self.write_grace_note_fixture()
+
+        try:
+            assert not musicxml_converter.is_direct_conversion_supported(musicxml_converter.read_musicxml_parts(path))
+        finally:
+            os.remove(path)
+
+    def test_write_musicxml_file_as_vmf_001(self):
+        """
+        Tests that the streamed output is the same as the dictionary.
+        """
+        file = io.StringIO()
+
+        musicxml_converter.write_musicxml_file_as_vmf('./fixtures/voices.xml', file, body_encoding='rle')
+
+        assert json.loads(file.getvalue()) == musicxml_converter.convert_musicxml_file_to_vmf(
+            './fixtures/voices.xml', body_encoding='rle')
@@ -0,0 +1,146 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+
+from fractions import Fraction
+
+from music21 import converter
+
+from vmf_converter.core import musicxml_writer, vmf_converter_core
+from vmf_converter.core.vmf_document import VMFDocument
+
+
+def find_notes(score):
+    """
+    Lists the notes of a score, with tied notes merged and chords split into their notes.
+
+    :param score: The music21 score.
+    :return: A sorted list of (offset, quarter length, MIDI pitch) tuples.
+    """
+
+    notes = []
+
+    for part in score.parts:
+        for element in part.flat.stripTies().notes:
+            for pitch in element.pitches:
+                notes.append((float(element.offset), float(element.quarterLength), pitch.midi))
+
+    return sorted(notes)
+
+
+class MusicXMLWriterTest(unittest.TestCase):
+    """Test Class for musicxml_writer module"""
+
+    def parse_musicxml(self, musicxml):
+        """
+        Parses the contents of a MusicXML file with music21.
+        """
+
+        handle, path = tempfile.mkstemp(suffix='.xml')
+
+        try:
+            with os.fdopen(handle, 'w') as file:
+                file.write(musicxml)
+
+            return converter.parse(path, forceSource=True)
+        finally:
+            os.remove(path)
+
+    def test_convert_vmf_to_musicxml_001(self):
+        """
+        Tests that the written notes are those of the decoded score.
+        """
+        for fixture in ('simple', 'ties', 'triplets', 'quintuplets', 'chordsAndSustain', 'syncopated', 'voices',
+                        'anacrusis', 'CompoundToSimple'):
+            with open('./expected/' + fixture + '.vmf', 'r') as expected_file:
+                vmf_string = expected_file.read()
+
+            actual = self.parse_musicxml(musicxml_writer.convert_vmf_to_musicxml(json.loads(vmf_string)))
+            expected = vmf_converter_core.read_vmf_string(vmf_string)
+
+            assert find_notes(actual) == find_notes(expected), fixture
+
+    def test_convert_vmf_to_musicxml_002(self):
+        """
+        Tests that the meters, keys and tempos come from the header.
+        """
+        with open('./expected/keyChange.vmf', 'r') as expected_file:
+            score = self.parse_musicxml(musicxml_writer.convert_vmf_to_musicxml(json.loads(expected_file.read())))
+
+        key_signatures = [(ks.offset, ks.sharps) for ks in score.parts[0].flat.getElementsByClass('KeySignature')]
+
+        assert key_signatures == [(0.0, 0), (4.0, 1)]
+
+        with open('./expected/tempoChange.vmf', 'r') as expected_file:
+            score = self.parse_musicxml(musicxml_writer.convert_vmf_to_musicxml(json.loads(expected_file.read())))
+
+        tempos = [(mark.offset, mark.number) for mark in score.flat.getElementsByClass('MetronomeMark')]
+        time_signatures = [(ts.offset, ts.ratioString)
+                           for ts in score.parts[0].flat.getElementsByClass('TimeSignature')]
+
+        assert tempos == [(0.0, 100.0), (4.0, 150.0)]
+        assert time_signatures == [(0.0, '2/4')]
+
+    def test_convert_vmf_to_musicxml_003(self):
+        """
+        Tests that the encoding and layout of the body do not change the MusicXML file.
+        """
+        score = converter.parse('./fixtures/chordsAndSustain.xml')
+
+        expected = musicxml_writer.convert_vmf_to_musicxml(vmf_converter_core.convert_score_to_vmf(score))
+        actual = musicxml_writer.convert_vmf_to_musicxml(vmf_converter_core.convert_score_to_vmf(
+            score, body_encoding='rle', body_layout='voice'))
+
+        assert actual == expected
+
+    def test_convert_document_to_musicxml_001(self):
+        """
+        Tests that a range of ticks is written from its start, with the notes sounding there.
+        """
+        with open('./expected/chordsAndSustain.vmf', 'r') as expected_file:
+            document = VMFDocument.from_string(expected_file.read())
+
+        part = document.ticks(1, 8)
+
+        assert find_notes(self.parse_musicxml(part.to_musicxml())) == find_notes(part.to_score())
+
+    def test_find_note_types_001(self):
+        """
+        Tests that durations are split into note types, dots and tuplets.
+        """
+        assert musicxml_writer.find_note_types(Fraction(1)) == [(1, 'quarter', 0, None)]
+        assert musicxml_writer.find_note_types(Fraction(7, 2)) == [(Fraction(7, 2), 'half', 2, None)]
+        assert musicxml_writer.find_note_types(Fraction(5)) == [(4, 'whole', 0, None), (1, 'quarter', 0, None)]
+        assert musicxml_writer.find_note_types(Fraction(1, 3)) == [(Fraction(1, 3), 'eighth', 0, (3, 2))]
+        assert musicxml_writer.find_note_types(Fraction(1, 5)) == [(Fraction(1, 5), '16th', 0, (5, 4))]
+        assert musicxml_writer.find_note_types(Fraction(5, 6)) == [(Fraction(2, 3), 'quarter', 0, (3, 2)),
+                                                                   (Fraction(1, 6), '16th', 0, (3, 2))]
+
+    def test_iter_measures_001(self):
+        """
+        Tests that the measures take the time signature in effect at their start.
+        """
+        header = {'time_signature': {'0.0': '3/8', '1.5': '4/4'}, 'measure_index': {'0': [0.0, 0]}}
+
+        assert list(musicxml_writer.iter_measures(header, Fraction(6))) == [
+            (0, 0, Fraction(3, 2), '3/8'), (1, Fraction(3, 2), Fraction(11, 2), '4/4'),
+            (2, Fraction(11, 2), Fraction(19, 2), None)]
+
+        with self.assertRaises(ValueError):
+            list(musicxml_writer.iter_measures({'time_signature': {}}, Fraction(4)))
+
+    def test_write_vmf_as_musicxml_001(self):
+        """
+        Tests that the written file holds the rendered MusicXML.
+        """
+        with open('./expected/simple.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        file = io.StringIO()
+
+        musicxml_writer.write_vmf_as_musicxml(vmf, file)
+
+        assert file.getvalue() == musicxml_writer.convert_vmf_to_musicxml(vmf)
+        assert '<score-partwise version="3.0">' in file.getvalue()
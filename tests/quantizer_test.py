@@ -0,0 +1,115 @@
+import unittest
+
+from fractions import Fraction
+
+from music21 import converter
+from music21.note import Note
+from music21.stream import Measure, Part, Score
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.quantizer import quantize_score
+
+
+class QuantizerTest(unittest.TestCase):
+    """Test Class for quantizer module"""
+
+    def build_performance(self):
+        score = Score()
+        part = Part()
+
+        # Sixteenths and triplets, played slightly off the beat.
+        for offset, quarter_length in ((0.0, 0.2479), (0.26, 0.2479), (0.49, 0.26), (0.76, 0.2379), (1.01, 0.33),
+                                       (1.34, 0.3279), (1.66, 0.34), (2.0021, 0.9979)):
+            part.insert(offset, Note('C4', quarterLength=quarter_length))
+
+        score.insert(0, part)
+
+        return score
+
+    def test_quantize_score_001(self):
+        """
+        Tests snapping a performance to the grid with the least displacement.
+        """
+        score = self.build_performance()
+
+        report = quantize_score(score, (4, 3))
+
+        assert report.divisors == (4, 3)
+        assert report.tick_value == Fraction(1, 12)
+        assert report.number_of_ticks == 36
+        assert report.number_of_notes == 8
+        assert 0 < report.mean_onset_displacement <= report.max_onset_displacement < 0.02
+        assert [(Fraction(n.offset).limit_denominator(12), n.quarterLength) for n in score.flat.notes] == \
+               [(0, 0.25), (Fraction(1, 4), 0.25), (Fraction(1, 2), 0.25), (Fraction(3, 4), 0.25),
+                (1, Fraction(1, 3)), (Fraction(4, 3), Fraction(1, 3)), (Fraction(5, 3), Fraction(1, 3)), (2, 1.0)]
+        assert vmf_converter_core.scan_score_durations(score) == Fraction(1, 12)
+
+    def test_quantize_score_002(self):
+        """
+        Tests that the grid fits the tick budget, and that a budget no grid fits is an error.
+        """
+        score = self.build_performance()
+
+        report = quantize_score(score, (4, 3), max_ticks=20)
+
+        assert report.divisors == (4,)
+        assert report.number_of_ticks == 12
+        assert report.max_onset_displacement > 0.05
+
+        with self.assertRaises(ValueError):
+            quantize_score(self.build_performance(), (4, 3), max_ticks=2)
+
+    def test_quantize_score_003(self):
+        """
+        Tests that a score already on the grid is left as it is.
+        """
+        score = converter.parse('./fixtures/triplets.mid')
+
+        expected = [(n.offset, n.quarterLength) for n in score.flat.notesAndRests]
+
+        report = quantize_score(score)
+
+        assert report.max_onset_displacement == 0
+        assert report.max_duration_displacement == 0
+        assert [(n.offset, n.quarterLength) for n in score.flat.notesAndRests] == expected
+
+    def test_quantize_score_004(self):
+        """
+        Tests that a note lengthened to one step stops at the next onset, and that a note snapped onto the next
+        onset is dropped.
+        """
+        score = Score()
+        part = Part()
+
+        for offset, quarter_length in ((0.0, 0.26), (0.26, 0.02), (0.33, 0.33), (0.66, 0.01), (0.67, 0.33)):
+            part.insert(offset, Note('C4', quarterLength=quarter_length))
+
+        score.insert(0, part)
+
+        report = quantize_score(score, (4, 3))
+
+        assert report.divisors == (4, 3)
+        assert report.number_of_notes == 4
+        assert report.number_of_dropped == 1
+        assert [(n.offset, n.quarterLength) for n in score.flat.notes] == \
+               [(0.0, 0.25), (0.25, Fraction(1, 12)), (Fraction(1, 3), Fraction(1, 3)),
+                (Fraction(2, 3), Fraction(1, 3))]
+
+    def test_quantize_score_005(self):
+        """
+        Tests that the ticks counted against the budget include the padding of a pickup measure.
+        """
+        score = Score()
+        part = Part()
+        measure = Measure(number=0)
+        measure.paddingLeft = 3.0
+        measure.insert(0, Note('C4', quarterLength=0.99))
+        part.insert(0, measure)
+        score.insert(0, part)
+
+        report = quantize_score(score, (4,))
+
+        assert report.number_of_ticks == 16
+
+        with self.assertRaises(ValueError):
+            quantize_score(score, (4,), max_ticks=4)
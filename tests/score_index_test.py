@@ -0,0 +1,74 @@
+import unittest
+
+from music21 import converter
+from music21 import key, meter, tempo
+from music21.note import Note
+
+from vmf_converter.core.score_index import ScoreIndex
+
+
+class ScoreIndexTest(unittest.TestCase):
+    """Test Class for ScoreIndex module"""
+
+    def test_score_index_001(self):
+        """
+        Tests that the index collects the same durations and events as flattening the score.
+        """
+        score = converter.parse('./fixtures/keyChange.mid')
+
+        index = ScoreIndex(score)
+
+        flat = score.flat
+        assert index.durations == {element.duration.quarterLength for element in flat.notesAndRests}
+        assert index.offsets == {element.offset for element in flat.notesAndRests}
+        assert [offset for offset, ks in index.key_signatures] == \
+               [ks.offset for ks in flat.getElementsByClass(key.KeySignature)]
+        assert [offset for offset, ts in index.time_signatures] == \
+               [ts.offset for ts in flat.getElementsByClass(meter.TimeSignature)]
+        assert [offset for offset, mm in index.tempos] == \
+               [mm.offset for mm in flat.getElementsByClass(tempo.MetronomeMark)]
+
+    def test_score_index_002(self):
+        """
+        Tests the chord cardinality and voice counts of the index.
+        """
+        score = converter.parse('./fixtures/voices.mid').measures(0, 2)
+
+        index = ScoreIndex(score)
+
+        assert index.largest_chord == 0
+        assert index.voices_per_part == [2, 1]
+        assert index.number_of_voices == 3
+
+    def test_score_index_003(self):
+        """
+        Tests that the index collects the padding of pickup measures.
+        """
+        score = converter.parse('./fixtures/anacrusis2.xml')
+
+        index = ScoreIndex(score)
+
+        assert index.paddings == {score.parts[0].getElementsByClass('Measure')[0].paddingLeft}
+
+    def test_for_score_001(self):
+        """
+        Tests that the index is reused for an unmodified score.
+        """
+        score = converter.parse('./fixtures/chords.mid')
+
+        assert ScoreIndex.for_score(score) is ScoreIndex.for_score(score)
+
+    def test_for_score_002(self):
+        """
+        Tests that the index is rebuilt once the score is modified.
+        """
+        score = converter.parse('./fixtures/chords.mid')
+
+        index = ScoreIndex.for_score(score)
+
+        score.insert(0, Note(quarterLength=0.125))
+
+        rebuilt = ScoreIndex.for_score(score)
+
+        assert rebuilt is not index
+        assert 0.125 in rebuilt.durations
@@ -0,0 +1,67 @@
+import unittest
+
+from fractions import Fraction
+
+from vmf_converter.core.tick_grid import TickGrid, gcd, lcm
+
+
+class TickGridTest(unittest.TestCase):
+    """Test Class for tick_grid module"""
+
+    def test_tick_grid_001(self):
+        """
+        Tests the mapping between tick numbers and offsets across sections.
+        """
+        grid = TickGrid([(0, 1), (4, Fraction(1, 3)), (5, Fraction(1, 2))])
+
+        assert grid.start_ticks == [0, 4, 7]
+        assert grid.offset(2) == 2
+        assert grid.offset(5) == Fraction(13, 3)
+        assert grid.offset(8) == Fraction(11, 2)
+        assert grid.tick_number(Fraction(13, 3)) == 5
+        assert grid.tick_number(4.5) == 5
+        assert grid.tick_number(6) == 9
+        assert not grid.is_uniform
+
+    def test_tick_grid_002(self):
+        """
+        Tests that a section must start on a tick of the previous one, and the first at offset 0.
+        """
+        with self.assertRaises(ValueError):
+            TickGrid([(0, Fraction(1, 3)), (Fraction(1, 2), 1)])
+
+        with self.assertRaises(ValueError):
+            TickGrid([(1, 1)])
+
+    def test_from_header_001(self):
+        """
+        Tests reading the grid of a header, with and without a tick_values table.
+        """
+        grid = TickGrid([(0, 1), (8, Fraction(1, 5))])
+
+        assert TickGrid.from_header({'tick_value': '1', 'tick_values': grid.to_dict()}) == grid
+        assert TickGrid.from_header({'tick_value': '1/3'}) == TickGrid.uniform(Fraction(1, 3))
+        assert TickGrid.from_header({'tick_value': '1/3'}).is_uniform
+
+    def test_from_tick_001(self):
+        """
+        Tests that the grid from a tick on starts at offset 0, in the section of that tick.
+        """
+        grid = TickGrid([(0, 1), (4, Fraction(1, 3)), (5, Fraction(1, 2))])
+
+        assert grid.from_tick(0) == grid
+        assert grid.from_tick(2) == TickGrid([(0, 1), (2, Fraction(1, 3)), (3, Fraction(1, 2))])
+        assert grid.from_tick(4) == TickGrid([(0, Fraction(1, 3)), (1, Fraction(1, 2))])
+        assert grid.from_tick(5) == TickGrid([(0, Fraction(1, 3)), (Fraction(2, 3), Fraction(1, 2))])
+        assert grid.from_tick(8) == TickGrid.uniform(Fraction(1, 2))
+
+    def test_gcd_001(self):
+        """
+        Tests the greatest common divisor and least common multiple of integers.
+        """
+        assert gcd(12, 18) == 6
+        assert gcd(0, 5) == 5
+        assert gcd(0, 0) == 0
+        assert gcd(-4, 6) == 2
+        assert lcm(4, 6) == 12
+        assert lcm(1, 7) == 7
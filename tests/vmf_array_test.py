@@ -0,0 +1,66 @@
+import unittest
+import json
+
+from fractions import Fraction
+
+from music21 import converter
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.vmf_header import VMFHeader
+
+try:
+    import numpy
+    from vmf_converter.core.dynamic_converter import DynamicConverter
+    from vmf_converter.core.vmf_array import decode_velocities, encode_to_array
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class VMFArrayTest(unittest.TestCase):
+    """Test Class for vmf_array module"""
+
+    def test_encode_to_array_001(self):
+        """
+        Tests that the array holds exactly the values of the list body.
+        """
+        for fixture in ('simple.mid', 'ties.mid', 'triplets.mid', 'chords.mid', 'voices.mid'):
+            expected = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/' + fixture).measures(0, 2))
+
+            array, header = encode_to_array(converter.parse('./fixtures/' + fixture).measures(0, 2))
+
+            assert array.tolist() == expected['body']
+            assert header == VMFHeader.from_dict(expected['header'])
+
+    def test_encode_to_array_002(self):
+        """
+        Tests the shape, type and header of the array encoding.
+        """
+        array, header = encode_to_array(converter.parse('./fixtures/chordsAndSustain.xml'))
+
+        with open('./expected/chordsAndSustain.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())
+
+        assert array.shape == (8, 2, 10)
+        assert array.dtype == numpy.int8
+        assert array.flags['C_CONTIGUOUS']
+        assert array.tolist() == expected['body']
+        assert header.tick_value == Fraction(1)
+        assert header.number_of_voices == 2
+        assert header.time_signature == {0.0: '4/4'}
+
+    def test_decode_velocities_001(self):
+        """
+        Tests that the decoded velocities match the dynamics of the sounding ticks.
+        """
+        array, header = encode_to_array(converter.parse('./fixtures/dynamics.mid'))
+
+        velocities = decode_velocities(array)
+
+        assert velocities.shape == array.shape[:2]
+        assert velocities.dtype == numpy.int16
+
+        for tick, row in zip(array.tolist(), velocities.tolist()):
+            for voice, velocity in zip(tick, row):
+                expected = DynamicConverter.vmf_to_velocity(voice[1]) if voice[0] != 0 else 0
+                assert velocity == expected
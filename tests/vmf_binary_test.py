@@ -0,0 +1,129 @@
+import unittest
+import json
+import os
+import tempfile
+
+from music21 import converter
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.vmf_binary import VMFBinaryFile, is_vmf_binary_file, write_vmf_binary_file
+from vmf_converter.vmf_converter import VMFConverter
+
+
+class VMFBinaryTest(unittest.TestCase):
+    """Test Class for vmf_binary module"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_fixture(self, name, body_encoding='plain', body_layout='tick'):
+        with open('./expected/' + name + '.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        written = dict(vmf)
+        if body_layout == 'voice':
+            written['header'] = dict(written['header'], body_layout='voice')
+            written['body'] = [[tick[voice_number] for tick in vmf['body']]
+                               for voice_number in range(vmf['header']['number_of_voices'])]
+
+            if body_encoding == 'rle':
+                written['header']['body_encoding'] = 'rle'
+                written['body'] = [vmf_converter_core.run_length_encode_body(voice) for voice in written['body']]
+        elif body_encoding == 'rle':
+            written['header'] = dict(vmf['header'], body_encoding='rle')
+            written['body'] = vmf_converter_core.run_length_encode_body(vmf['body'])
+
+        path = os.path.join(self.directory.name, name + '.vmfb')
+        write_vmf_binary_file(written, path)
+
+        return vmf, path
+
+    def test_vmf_binary_file_001(self):
+        """
+        Tests that a binary VMF file holds the header and ticks of the JSON file.
+        """
+        expected, path = self.write_fixture('chords')
+
+        with VMFBinaryFile(path) as binary_file:
+            assert binary_file.header == expected['header']
+            assert len(binary_file) == len(expected['body'])
+            assert binary_file.row_width == 10
+            assert list(binary_file) == expected['body']
+
+    def test_vmf_binary_file_002(self):
+        """
+        Tests random access to single ticks and voices.
+        """
+        expected, path = self.write_fixture('triplets', body_encoding='rle')
+
+        with VMFBinaryFile(path) as binary_file:
+            assert 'body_encoding' not in binary_file.header
+            assert binary_file[7] == expected['body'][7]
+            assert binary_file[-1] == expected['body'][-1]
+            assert binary_file.voice_tick(5, 1) == expected['body'][5][1]
+            assert list(binary_file.voice(0)) == [tick[0] for tick in expected['body']]
+
+            with self.assertRaises(IndexError):
+                binary_file.tick(len(expected['body']))
+
+    def test_vmf_binary_file_003(self):
+        """
+        Tests that other files are rejected.
+        """
+        assert not is_vmf_binary_file('./expected/simple.vmf')
+
+        with self.assertRaises(ValueError):
+            VMFBinaryFile('./expected/simple.vmf')
+
+    def test_vmf_binary_file_004(self):
+        """
+        Tests that a body in the voice layout is stored by tick.
+        """
+        expected, path = self.write_fixture('voices', body_encoding='rle', body_layout='voice')
+
+        with VMFBinaryFile(path) as binary_file:
+            assert binary_file.header == expected['header']
+            assert list(binary_file) == expected['body']
+
+    def test_read_vmf_file_001(self):
+        """
+        Tests reading a binary VMF file to a score.
+        """
+        expected, path = self.write_fixture('voices')
+
+        expected_score = vmf_converter_core.read_vmf_file('./expected/voices.vmf')
+        actual_score = vmf_converter_core.read_vmf_file(path)
+
+        assert len(expected_score.parts) == len(actual_score.parts)
+
+        for expected_part, actual_part in zip(expected_score.parts, actual_score.parts):
+            expected_elements = expected_part.flat.notesAndRests.elements
+            actual_elements = actual_part.flat.notesAndRests.elements
+
+            assert len(expected_elements) == len(actual_elements)
+
+            for expected_element, actual_element in zip(expected_elements, actual_elements):
+                assert expected_element.quarterLength == actual_element.quarterLength
+                assert expected_element.pitches == actual_element.pitches
+
+    def test_vmf_converter_write_001(self):
+        """
+        Tests writing and parsing a binary VMF file through music21.
+        """
+        converter.registerSubconverter(VMFConverter)
+
+        path = os.path.join(self.directory.name, 'simple.vmfb')
+        converter.parse('./fixtures/simple.mid').measures(0, 2).write('vmfb', path)
+
+        with open('./expected/simple.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())
+
+        with VMFBinaryFile(path) as binary_file:
+            assert list(binary_file) == expected['body']
+
+        score = converter.parse(path)
+
+        assert len(score.parts) == 2
@@ -1,5 +1,10 @@
 import unittest
+import io
 import json
+import multiprocessing
+import os
+import tempfile
+from fractions import Fraction
 
 from music21 import converter
 from music21 import duration
@@ -8,8 +13,11 @@ from music21.meter import TimeSignature
 from music21.note import Note, Rest
 from music21.key import KeySignature
 from music21.tempo import MetronomeMark
+from music21.stream import Part, Score, Stream
 
 from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.vmf_document import VMFDocument
+from vmf_converter.vmf_converter import VMFConverter
 
 
 class vmfConverterTest(unittest.TestCase):
@@ -804,4 +812,508 @@ class vmfConverterTest(unittest.TestCase):
 
         number_of_notes = vmf_converter_core.find_number_of_notes_in_tick(tick)
 
-        assert number_of_notes == 2
\ No newline at end of file
+        assert number_of_notes == 2
+
+    def test_convert_score_to_vmf_019(self):
+        """
+        Tests the conversion of a score stream to a run-length encoded vmf data structure.
+        """
+        score = converter.parse('./fixtures/triplets.mid')
+        first_phrase = score.measures(0, 2)
+
+        actual = vmf_converter_core.convert_score_to_vmf(first_phrase, body_encoding='rle')
+
+        with open('./expected/triplets.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())
+
+        assert actual['header']['body_encoding'] == 'rle'
+        assert len(actual['body']) < len(expected['body'])
+        assert list(vmf_converter_core.run_length_decode_body(actual['body'])) == expected['body']
+
+    def test_run_length_encode_body_001(self):
+        """
+        Tests collapsing runs of identical rows.
+        """
+        body = [[[1, 1]], [[2, 1]], [[2, 1]], [[2, 1]], [[0, 0]]]
+
+        encoded = vmf_converter_core.run_length_encode_body(body)
+
+        assert encoded == [[1, [[1, 1]]], [3, [[2, 1]]], [1, [[0, 0]]]]
+        assert list(vmf_converter_core.run_length_decode_body(encoded)) == body
+
+    def test_read_vmf_string_005(self):
+        """
+        Tests reading a run-length encoded VMF file.
+        """
+        with open('./expected/chords.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        expected_score = vmf_converter_core.read_vmf_string(json.dumps(vmf))
+
+        vmf['header']['body_encoding'] = 'rle'
+        vmf['body'] = vmf_converter_core.run_length_encode_body(vmf['body'])
+
+        actual_score = vmf_converter_core.read_vmf_string(json.dumps(vmf))
+
+        for expected, actual in zip(expected_score.parts, actual_score.parts):
+            for expected_element, actual_element in zip(expected.flat.notesAndRests.elements,
+                                                        actual.flat.notesAndRests.elements):
+                assert type(expected_element) is type(actual_element)
+                assert expected_element.quarterLength == actual_element.quarterLength
+                assert expected_element.pitches == actual_element.pitches
+
+    def test_vmf_converter_write_001(self):
+        """
+        Tests writing a run-length encoded VMF file through music21.
+        """
+        converter.registerSubconverter(VMFConverter)
+
+        score = converter.parse('./fixtures/dottedQuarter.mid').measures(0, 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dottedQuarter.vmf')
+            score.write('vmf.rle', path)
+
+            with open(path, 'r') as actual_file:
+                actual = json.loads(actual_file.read())
+
+        with open('./expected/dottedQuarter.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())
+
+        assert actual['header']['body_encoding'] == 'rle'
+        assert list(vmf_converter_core.run_length_decode_body(actual['body'])) == expected['body']
+
+    def test_write_vmf_001(self):
+        """
+        Tests that streaming a score to a file gives the same JSON as serializing the whole structure.
+        """
+        for body_encoding in ('plain', 'rle'):
+            expected = vmf_converter_core.convert_score_to_vmf(
+                converter.parse('./fixtures/triplets.mid').measures(0, 2), body_encoding=body_encoding)
+
+            actual = io.StringIO()
+            vmf_converter_core.write_vmf(converter.parse('./fixtures/triplets.mid').measures(0, 2), actual,
+                                         body_encoding=body_encoding)
+
+            assert actual.getvalue() == json.dumps(expected)
+            assert json.loads(actual.getvalue()) == expected
+
+    def test_read_vmf_string_006(self):
+        """
+        Tests that durations built from many ticks are exact.
+        """
+        sustain = [2, 0, 0, 0, 0, 0]
+        vmf = {'header': {'tick_value': '1/3', 'number_of_parts': 1, 'number_of_voices': 1,
+                          'time_signature': {'0.0': '4/4'}, 'key_signature': {'0.0': 0}, 'tempo': {'0.0': 120}},
+               'body': [[[1, 3, 0, 0, 4, 0]]] + [[sustain]] * 4 + [[[1, 3, 0, 2, 4, 0]]] + [[sustain]] * 5}
+
+        actual_score = vmf_converter_core.read_vmf_string(json.dumps(vmf))
+
+        actual_durations = [element.quarterLength for element in actual_score.flat.notesAndRests]
+
+        assert actual_durations == [Fraction(5, 3), 2.0]
+
+    def test_read_vmf_string_007(self):
+        """
+        Tests that a rest following a chord is kept.
+        """
+        vmf = {'header': {'tick_value': '1/2', 'number_of_parts': 1, 'number_of_voices': 1,
+                          'time_signature': {'0.0': '2/4'}, 'key_signature': {'0.0': 0}, 'tempo': {'0.0': 120}},
+               'body': [[[1, 3, 0, 0, 4, 4, 4, 0]], [[2, 0, 0, 0, 4, 4, 4, 0]],
+                        [[0, 0, 0, 0, 0, 0, 0, 0]], [[0, 0, 0, 0, 0, 0, 0, 0]]]}
+
+        actual_score = vmf_converter_core.read_vmf_string(json.dumps(vmf))
+
+        actual_elements = list(actual_score.flat.notesAndRests)
+
+        assert [type(element) for element in actual_elements] == [Chord, Rest]
+        assert [element.offset for element in actual_elements] == [0.0, 1.0]
+        assert [element.quarterLength for element in actual_elements] == [1.0, 1.0]
+
+    def test_read_vmf_string_008(self):
+        """
+        Tests that measures are laid out as makeMeasures does across time signature changes.
+        """
+        note_tick = [1, 1, 0, 0, 4, 0]
+        sustain = [2, 1, 0, 0, 4, 0]
+        vmf = {'header': {'tick_value': '1/2', 'number_of_parts': 1, 'number_of_voices': 1,
+                          'time_signature': {'0.0': '2/4', '3.0': '3/4'}, 'key_signature': {'0.0': 0},
+                          'tempo': {'0.0': 120}},
+               'body': [[note_tick], [sustain], [sustain], [note_tick], [sustain], [sustain], [sustain],
+                        [note_tick], [sustain], [sustain], [sustain], [sustain]]}
+
+        actual_score = vmf_converter_core.read_vmf_string(json.dumps(vmf))
+        actual_measures = actual_score.parts[0].voices[0].getElementsByClass('Measure')
+
+        expected_voice = Stream()
+        for quarter_length in (1.5, 2.0, 2.5):
+            expected_voice.append(Note('C4', quarterLength=quarter_length))
+        meter_stream = Stream()
+        meter_stream.insert(0.0, TimeSignature('2/4'))
+        meter_stream.insert(3.0, TimeSignature('3/4'))
+        expected_measures = expected_voice.makeMeasures(meterStream=meter_stream).getElementsByClass('Measure')
+
+        assert len(actual_measures) == len(expected_measures) == 3
+        for expected_measure, actual_measure in zip(expected_measures, actual_measures):
+            assert actual_measure.number == expected_measure.number
+            assert actual_measure.offset == expected_measure.offset
+            assert str(actual_measure.timeSignature) == str(expected_measure.timeSignature)
+            assert [(n.offset, n.quarterLength) for n in actual_measure.notes] == \
+                   [(n.offset, n.quarterLength) for n in expected_measure.notes]
+
+        assert actual_measures[0].clef.sign == 'G'
+        assert actual_measures[-1].rightBarline.style == 'final'
+
+    def test_read_meters_001(self):
+        """
+        Tests reading the time signatures of a header in offset order.
+        """
+        actual = vmf_converter_core.read_meters({'10.0': '6/8', '2.0': '3/4', '0.0': '4/4'})
+
+        assert actual == [(0, '4/4', 4), (2, '3/4', 3), (10, '6/8', 3)]
+
+    def test_convert_score_to_vmf_020(self):
+        """
+        Tests that the voice layout holds the same ticks as the tick layout, one voice at a time.
+        """
+        with open('./expected/voices.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())
+
+        expected_voices = [[tick[voice_number] for tick in expected['body']]
+                           for voice_number in range(expected['header']['number_of_voices'])]
+
+        for body_encoding in ('plain', 'rle'):
+            actual = vmf_converter_core.convert_score_to_vmf(
+                converter.parse('./fixtures/voices.mid').measures(0, 2),
+                body_encoding=body_encoding, body_layout='voice')
+
+            assert actual['header']['body_layout'] == 'voice'
+
+            if body_encoding == 'rle':
+                assert actual['body'] == [vmf_converter_core.run_length_encode_body(voice) for voice in expected_voices]
+            else:
+                assert actual['body'] == expected_voices
+
+    def test_read_vmf_string_009(self):
+        """
+        Tests reading the voice layout, whole and one voice at a time.
+        """
+        with open('./expected/voices.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        expected_score = vmf_converter_core.read_vmf(vmf)
+
+        vmf['header']['body_layout'] = 'voice'
+        vmf['body'] = [[tick[voice_number] for tick in vmf['body']] for voice_number in range(3)]
+
+        actual_score = vmf_converter_core.read_vmf_string(json.dumps(vmf))
+
+        for expected, actual in zip(expected_score.flat.notesAndRests, actual_score.flat.notesAndRests):
+            assert expected.offset == actual.offset
+            assert expected.quarterLength == actual.quarterLength
+            assert expected.pitches == actual.pitches
+
+        # Only the first tick of the other voices is read, for their part id.
+        vmf['body'][0] = vmf['body'][0][:1]
+        vmf['body'][1] = vmf['body'][1][:1]
+
+        single_voice_score = vmf_converter_core.read_vmf(vmf, voice_numbers=[2])
+
+        assert len(single_voice_score.parts) == 1
+        assert len(single_voice_score.parts[0].voices) == 1
+        assert [n.pitches for n in single_voice_score.flat.notes] == \
+               [n.pitches for n in expected_score.parts[1].flat.notes]
+
+    def test_scan_score_durations_002(self):
+        """
+        Tests that the tick divides the offsets of the notes as well as their durations.
+        """
+        score = Score()
+        part = Part()
+        part.insert(0.5, Note('C4', quarterLength=1.0))
+        part.insert(2.0, Note('D4', quarterLength=Fraction(2, 3)))
+        score.insert(0, part)
+
+        assert vmf_converter_core.scan_score_durations(score) == Fraction(1, 6)
+
+    def test_fraction_gcd_001(self):
+        """
+        Tests the greatest common divisor of exact fractions, with float noise removed first.
+        """
+        values = [vmf_converter_core.to_exact_quarter_length(value) for value in (0.1 + 0.2, 0.5, Fraction(2, 3))]
+
+        assert values[0] == Fraction(3, 10)
+        assert vmf_converter_core.fraction_gcd(values) == Fraction(1, 30)
+        assert vmf_converter_core.fraction_gcd([]) == 0
+
+    def test_scan_score_tick_sections_001(self):
+        """
+        Tests that a tuplet only refines the tick value of the measure it is in.
+        """
+        score = Score()
+        part = Part()
+
+        for i in range(8):
+            part.append(Note('C4', quarterLength=1.0))
+
+        for i in range(3):
+            part.append(Note('D4', quarterLength=Fraction(2, 3)))
+
+        part.append(Note('E4', quarterLength=2.0))
+        part.append(Note('F4', quarterLength=4.0))
+        score.insert(0, part)
+
+        vmf_converter_core.prepare_score_for_vmf(score)
+
+        assert vmf_converter_core.scan_score_tick_sections(score) == \
+               [(0, 1), (8, Fraction(2, 3)), (12, 4)]
+
+    def test_convert_score_to_vmf_021(self):
+        """
+        Tests that an adaptive tick value encodes fewer ticks and decodes to the same score.
+        """
+        expected_score = vmf_converter_core.read_vmf(
+            vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/aus_meines_herz_triplets.mid')))
+
+        for body_encoding in ('plain', 'rle'):
+            for body_layout in ('tick', 'voice'):
+                expected = vmf_converter_core.convert_score_to_vmf(
+                    converter.parse('./fixtures/aus_meines_herz_triplets.mid'), body_encoding, body_layout)
+                actual = vmf_converter_core.convert_score_to_vmf(
+                    converter.parse('./fixtures/aus_meines_herz_triplets.mid'), body_encoding, body_layout,
+                    adaptive_resolution=True)
+
+                assert 'tick_values' not in expected['header']
+                assert actual['header']['tick_values'] == {'0.0': '1', '3.0': '1/6'}
+                assert len(json.dumps(actual['body'])) < len(json.dumps(expected['body']))
+
+                actual_score = vmf_converter_core.read_vmf_string(json.dumps(actual))
+
+                for expected_part, actual_part in zip(expected_score.parts, actual_score.parts):
+                    expected_elements = expected_part.flat.notes.elements
+                    actual_elements = actual_part.flat.notes.elements
+
+                    assert [(e.offset, e.quarterLength, e.pitches) for e in actual_elements] == \
+                           [(e.offset, e.quarterLength, e.pitches) for e in expected_elements]
+
+    def test_vmf_converter_write_002(self):
+        """
+        Tests writing a VMF file with an adaptive tick value through music21.
+        """
+        converter.registerSubconverter(VMFConverter)
+
+        score = converter.parse('./fixtures/triplets.mid')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'triplets.vmf')
+            score.write('vmf.adaptive', path)
+
+            with open(path, 'r') as actual_file:
+                actual = json.loads(actual_file.read())
+
+        assert actual['header']['tick_values'] == {'0.0': '1', '2.0': '1/3'}
+        assert len(actual['body']) == 8
+
+    def test_estimate_vmf_cost_001(self):
+        """
+        Tests that the predicted cost matches the encoding.
+        """
+        for body_encoding in ('plain', 'rle'):
+            cost = vmf_converter_core.estimate_vmf_cost(converter.parse('./fixtures/aus_meines_herz.mid'), body_encoding)
+            actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/aus_meines_herz.mid'),
+                                                             body_encoding)
+
+            assert cost.number_of_ticks == 172
+            assert cost.number_of_voices == 4
+            assert cost.row_width == 6
+
+            if body_encoding == 'rle':
+                assert cost.json_bytes >= len(json.dumps(actual))
+            else:
+                assert abs(cost.json_bytes - len(json.dumps(actual))) < 0.05 * len(json.dumps(actual))
+
+    def test_estimate_vmf_cost_002(self):
+        """
+        Tests that the predicted number of ticks is that of the encoding when the voices end at different ticks.
+        """
+        for fixture in ('voices.xml', 'voices.mid', 'quintuplets.mid'):
+            for body_layout in ('tick', 'voice'):
+                cost = vmf_converter_core.estimate_vmf_cost(converter.parse('./fixtures/' + fixture))
+                actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/' + fixture),
+                                                                 body_layout=body_layout)
+
+                if body_layout == 'voice':
+                    assert [len(voice) for voice in actual['body']] == [cost.number_of_ticks] * len(actual['body'])
+                else:
+                    assert cost.number_of_ticks == len(actual['body']), fixture
+
+    def test_convert_score_to_vmf_023(self):
+        """
+        Tests that the measure index maps the measures to their offsets and first ticks.
+        """
+        actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/chordsAndSustain.xml'),
+                                                         measure_index=True)
+
+        assert actual['header']['measure_index'] == {'1': [0.0, 0], '2': [4.0, 4]}
+
+        actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/aus_meines_herz_triplets.mid'),
+                                                         adaptive_resolution=True, measure_index=True)
+
+        grid = vmf_converter_core.TickGrid.from_header(actual['header'])
+
+        for number, (offset, tick_number) in actual['header']['measure_index'].items():
+            assert grid.offset(tick_number) == offset
+
+        assert 'measure_index' not in vmf_converter_core.convert_score_to_vmf(
+            converter.parse('./fixtures/chordsAndSustain.xml'))['header']
+
+    def test_convert_score_to_vmf_022(self):
+        """
+        Tests that a score over the tick budget fails before encoding, or falls back to a coarser grid.
+        """
+        with self.assertRaises(ValueError):
+            vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/aus_meines_herz_triplets.mid'),
+                                                    max_ticks=20)
+
+        actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/aus_meines_herz_triplets.mid'),
+                                                         max_ticks=20, coarsen=True)
+
+        assert actual['header']['tick_value'] == '1/3'
+        assert len(actual['body']) == 18
+
+        actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/aus_meines_herz_triplets.mid'),
+                                                         max_ticks=36)
+
+        assert actual['header']['tick_value'] == '1/6'
+
+        with self.assertRaises(ValueError):
+            vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/simple.mid'), max_bytes=100,
+                                                    coarsen=True)
+
+    def test_iter_coarser_tick_values_001(self):
+        """
+        Tests that coarser tick values keep the quarter note grid, then double.
+        """
+        actual = vmf_converter_core.iter_coarser_tick_values(Fraction(1, 12))
+
+        assert [next(actual) for i in range(8)] == [Fraction(1, 6), Fraction(1, 4), Fraction(1, 3), Fraction(1, 2),
+                                                    1, 2, 4, 8]
+
+    def test_convert_score_to_vmf_024(self):
+        """
+        Tests that encoding the parts on a pool of processes gives the same output as encoding them serially.
+        """
+        for fixture in ('aus_meines_herz_triplets.mid', 'voices.mid', 'anacrusis.xml'):
+            for body_encoding in ('plain', 'rle'):
+                for body_layout in ('tick', 'voice'):
+                    expected = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/' + fixture),
+                                                                       body_encoding, body_layout,
+                                                                       adaptive_resolution=True)
+                    actual = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/' + fixture),
+                                                                     body_encoding, body_layout,
+                                                                     adaptive_resolution=True, processes=2)
+
+                    assert actual == expected, (fixture, body_encoding, body_layout)
+
+        assert vmf_converter_core._worker_parts is None
+
+    def test_can_encode_in_parallel_001(self):
+        """
+        Tests that scores with a single part, a single process and platforms without fork are encoded serially.
+        """
+        score = converter.parse('./fixtures/voices.mid')
+        vmf_converter_core.prepare_score_for_vmf(score)
+
+        assert not vmf_converter_core.can_encode_in_parallel(score, 1)
+        assert not vmf_converter_core.can_encode_in_parallel(converter.parse('./fixtures/anacrusis.xml'), None)
+        assert vmf_converter_core.can_encode_in_parallel(score, None) == (
+            'fork' in multiprocessing.get_all_start_methods())
+
+        find_fork_context = vmf_converter_core.find_fork_context
+        vmf_converter_core.find_fork_context = lambda: None
+
+        try:
+            assert not vmf_converter_core.can_encode_in_parallel(score, None)
+        finally:
+            vmf_converter_core.find_fork_context = find_fork_context
+
+    def test_convert_score_to_vmf_025(self):
+        """
+        Tests that voices ending at different ticks are padded with rests to the end of the longest voice,
+        in both layouts.
+        """
+        for body_encoding in ('plain', 'rle'):
+            tick_vmf = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/voices.xml'),
+                                                               body_encoding)
+            voice_vmf = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/voices.xml'),
+                                                                body_encoding, body_layout='voice')
+
+            tick_document = VMFDocument.from_dict(tick_vmf)
+            voice_document = VMFDocument.from_dict(voice_vmf)
+
+            assert tick_document.number_of_ticks == voice_document.number_of_ticks == 42
+            assert [len(voice) for voice in voice_document.voices()] == [42, 42]
+            assert voice_document.voice(1)[-1][0] == 0
+            assert voice_document.to_dict() == tick_document.to_dict()
+            assert voice_document.to_midi() == tick_document.to_midi()
+
+            expected_score = vmf_converter_core.read_vmf(tick_vmf)
+            actual_score = voice_document.to_score()
+
+            assert [(n.offset, n.quarterLength, n.pitches) for n in actual_score.flat.notes] == \
+                   [(n.offset, n.quarterLength, n.pitches) for n in expected_score.flat.notes]
+
+    def test_read_vmf_string_010(self):
+        """
+        Tests that decoding the voices on a pool of processes gives the same score as decoding them serially.
+        """
+        min_runs = vmf_converter_core.PARALLEL_DECODE_MIN_RUNS
+        vmf_converter_core.PARALLEL_DECODE_MIN_RUNS = 0
+
+        try:
+            for body_encoding in ('plain', 'rle'):
+                for body_layout in ('tick', 'voice'):
+                    vmf_string = json.dumps(vmf_converter_core.convert_score_to_vmf(
+                        converter.parse('./fixtures/aus_meines_herz_triplets.mid'), body_encoding, body_layout))
+
+                    expected_score = vmf_converter_core.read_vmf_string(vmf_string)
+                    actual_score = vmf_converter_core.read_vmf_string(vmf_string, processes=2)
+
+                    expected = [(type(element), element.offset, element.quarterLength)
+                                for element in expected_score.recurse()]
+                    actual = [(type(element), element.offset, element.quarterLength)
+                              for element in actual_score.recurse()]
+
+                    assert actual == expected, (body_encoding, body_layout)
+                    assert [(n.pitches, n.tie, n.volume.velocity) for n in actual_score.flat.notes] == \
+                           [(n.pitches, n.tie, n.volume.velocity) for n in expected_score.flat.notes]
+
+            # The data only reaches the workers, so concurrent reads do not share it.
+            assert vmf_converter_core._worker_vmf is None
+        finally:
+            vmf_converter_core.PARALLEL_DECODE_MIN_RUNS = min_runs
+
+    def test_can_decode_in_parallel_001(self):
+        """
+        Tests that small bodies, streamed bodies, a single process and platforms without fork are decoded serially.
+        """
+        with open('./expected/voices.vmf', 'r') as expected_file:
+            vmf = json.loads(expected_file.read())
+
+        assert not vmf_converter_core.can_decode_in_parallel(vmf, None)
+
+        vmf['body'] = vmf['body'] * vmf_converter_core.PARALLEL_DECODE_MIN_RUNS
+
+        assert not vmf_converter_core.can_decode_in_parallel(vmf, 1)
+        assert not vmf_converter_core.can_decode_in_parallel({'header': vmf['header'], 'body': iter(vmf['body'])},
+                                                             None)
+        assert vmf_converter_core.can_decode_in_parallel(vmf, None) == (
+            'fork' in multiprocessing.get_all_start_methods())
+
+        find_fork_context = vmf_converter_core.find_fork_context
+        vmf_converter_core.find_fork_context = lambda: None
+
+        try:
+            assert not vmf_converter_core.can_decode_in_parallel(vmf, None)
+        finally:
+            vmf_converter_core.find_fork_context = find_fork_context
@@ -0,0 +1,43 @@
+import unittest
+
+from vmf_converter.core.vmf_cost import VMFCost, LIST_BYTES, POINTER_BYTES
+
+
+class VMFCostTest(unittest.TestCase):
+    """Test Class for vmf_cost module"""
+
+    def test_vmf_cost_001(self):
+        """
+        Tests the sizes predicted for a plain body.
+        """
+        cost = VMFCost(1000, 2, 3, number_of_runs=10, header_bytes=100)
+
+        assert cost.row_width == 10
+        assert cost.number_of_rows == 1000
+        assert cost.json_bytes == 100 + 24 + 1000 * (2 * (10 * 3.2 + 2) + 2)
+        assert cost.peak_memory == 1000 * (POINTER_BYTES + LIST_BYTES + 2 * POINTER_BYTES +
+                                           2 * (LIST_BYTES + 10 * POINTER_BYTES))
+
+    def test_vmf_cost_002(self):
+        """
+        Tests that a run-length encoded body is bounded by its runs.
+        """
+        plain = VMFCost(1000, 1, 1, number_of_runs=10)
+        run_length_encoded = VMFCost(1000, 1, 1, number_of_runs=10, body_encoding='rle')
+
+        assert run_length_encoded.number_of_rows == 10
+        assert run_length_encoded.json_bytes < plain.json_bytes
+        assert run_length_encoded.peak_memory < plain.peak_memory
+        assert VMFCost(5, 1, 1, number_of_runs=10, body_encoding='rle').number_of_rows == 5
+
+    def test_exceeds_001(self):
+        """
+        Tests checking a cost against a budget of ticks and bytes.
+        """
+        cost = VMFCost(1000, 1, 1)
+
+        assert not cost.exceeds()
+        assert not cost.exceeds(max_ticks=1000)
+        assert cost.exceeds(max_ticks=999)
+        assert cost.exceeds(max_bytes=cost.json_bytes - 1)
+        assert not cost.exceeds(max_ticks=1000, max_bytes=cost.json_bytes)
@@ -0,0 +1,185 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from fractions import Fraction
+
+from music21 import converter
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.vmf_binary import write_vmf_binary_file
+from vmf_converter.core.vmf_document import VMFDocument
+
+
+class VMFDocumentTest(unittest.TestCase):
+    """Test Class for vmf_document module"""
+
+    def load_fixture(self, name):
+        with open('./expected/' + name + '.vmf', 'r') as expected_file:
+            return json.loads(expected_file.read())
+
+    def test_vmf_document_001(self):
+        """
+        Tests the header and the voice and part views of a document.
+        """
+        vmf = self.load_fixture('voices')
+
+        document = VMFDocument.from_file('./expected/voices.vmf')
+
+        assert document.header.number_of_voices == 3
+        assert len(document) == len(vmf['body'])
+        assert document.part_ids == [0, 1]
+        assert list(document.voice(2)) == [tick[2] for tick in vmf['body']]
+        assert document.part(0).voice_numbers == [0, 1]
+        assert list(document.part(0)) == [tick[0:2] for tick in vmf['body']]
+        assert [list(voice) for voice in document.part(1).voices()] == [[tick[2] for tick in vmf['body']]]
+
+    def test_vmf_document_002(self):
+        """
+        Tests that views and tick ranges refer to the ticks of the body instead of copying them.
+        """
+        vmf = self.load_fixture('triplets')
+
+        document = VMFDocument.from_dict(vmf)
+        sliced = document[3:9]
+
+        assert len(sliced) == 6
+        assert list(sliced) == vmf['body'][3:9]
+        assert sliced[0] is vmf['body'][3]
+        assert sliced.voice(1)[-1] is vmf['body'][8][1]
+        assert list(sliced.voice(0)[2:4]) == [tick[0] for tick in vmf['body'][5:7]]
+        assert len(document[20:30]) == 0
+
+    def test_vmf_document_003(self):
+        """
+        Tests documents over run-length encoded and binary bodies.
+        """
+        vmf = self.load_fixture('duplets')
+
+        encoded = {'header': dict(vmf['header'], body_encoding='rle'),
+                   'body': vmf_converter_core.run_length_encode_body(vmf['body'])}
+
+        assert list(VMFDocument.from_dict(encoded)) == vmf['body']
+        assert list(VMFDocument.from_dict(encoded)[5:11].voice(1)) == [tick[1] for tick in vmf['body'][5:11]]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'duplets.vmfb')
+            write_vmf_binary_file(vmf, path)
+
+            with VMFDocument.from_file(path) as document:
+                assert document.header.tick_value == Fraction(1, 4)
+                assert list(document.part(1)[2:5]) == [tick[1:2] for tick in vmf['body'][2:5]]
+
+    def test_vmf_document_004(self):
+        """
+        Tests the views of a document in the voice layout.
+        """
+        vmf = self.load_fixture('voices')
+
+        voices = [[tick[voice_number] for tick in vmf['body']] for voice_number in range(3)]
+
+        for body_encoding, body in (('plain', voices),
+                                    ('rle', [vmf_converter_core.run_length_encode_body(voice) for voice in voices])):
+            header = dict(vmf['header'], body_layout='voice', body_encoding=body_encoding)
+            document = VMFDocument.from_dict({'header': header, 'body': body})
+
+            assert len(document) == len(vmf['body'])
+            assert document.part_ids == [0, 1]
+            assert list(document.voice(1)) == voices[1]
+            assert list(document) == vmf['body']
+            assert list(document[3:5].part(0)) == [tick[0:2] for tick in vmf['body'][3:5]]
+            assert document.to_dict() == vmf
+
+    def test_to_score_001(self):
+        """
+        Tests the explicit conversion of a document to a music21 score.
+        """
+        expected_score = vmf_converter_core.read_vmf_file('./expected/chords.vmf')
+        actual_score = VMFDocument.from_file('./expected/chords.vmf').to_score()
+
+        for expected, actual in zip(expected_score.parts, actual_score.parts):
+            for expected_element, actual_element in zip(expected.flat.notesAndRests.elements,
+                                                        actual.flat.notesAndRests.elements):
+                assert expected_element.quarterLength == actual_element.quarterLength
+                assert expected_element.pitches == actual_element.pitches
+
+    def test_to_score_002(self):
+        """
+        Tests that a tick range of a document with an adaptive tick value decodes on its own sections.
+        """
+        header = {'tick_value': '1', 'tick_values': {'0.0': '1', '2.0': '1/2'}, 'number_of_voices': 1,
+                  'number_of_parts': 1, 'time_signature': {'0.0': '4/4'}, 'key_signature': {'0.0': 0}, 'tempo': {}}
+        body = [[[1, 1, 0, 0, 4, 0]], [[1, 1, 0, 2, 4, 0]], [[1, 1, 0, 4, 4, 0]], [[2, 1, 0, 4, 4, 0]],
+                [[1, 1, 0, 5, 4, 0]]]
+
+        document = VMFDocument.from_dict({'header': header, 'body': body})
+
+        assert [n.quarterLength for n in document.to_score().flat.notes] == [1.0, 1.0, 1.0, 0.5]
+        assert [n.quarterLength for n in document.ticks(1, 5).to_score().flat.notes] == [1.0, 1.0, 0.5]
+        assert document.ticks(2, 5).to_dict()['header']['tick_values'] == {'0.0': '1/2'}
+
+    def test_to_score_003(self):
+        """
+        Tests that a tick range starts with the notes sounding at its first tick, and the key and tempo in effect.
+        """
+        header = {'tick_value': '1', 'number_of_voices': 1, 'number_of_parts': 1, 'time_signature': {'0.0': '4/4'},
+                  'key_signature': {'0.0': 0, '2.0': 2}, 'tempo': {'0.0': 60.0, '4.0': 90.0}}
+        body = [[[1, 1, 0, 0, 4, 0]], [[1, 1, 0, 2, 4, 0]], [[2, 1, 0, 2, 4, 0]], [[2, 1, 0, 2, 4, 0]],
+                [[1, 1, 0, 4, 4, 0]]]
+
+        document = VMFDocument.from_dict({'header': header, 'body': body}).ticks(2, 5)
+
+        actual = document.to_dict()['header']
+
+        assert actual['key_signature'] == {'0.0': 2}
+        assert actual['tempo'] == {'0.0': 60.0, '2.0': 90.0}
+
+        notes = document.to_score().flat.notes
+
+        assert [n.quarterLength for n in notes] == [2.0, 1.0]
+        assert notes[0].pitch.name == 'D'
+        assert notes[0].tie.type == 'stop'
+        assert notes[1].tie is None
+
+    def test_measures_001(self):
+        """
+        Tests decoding a range of measures from the measure index.
+        """
+        score = converter.parse('./fixtures/aus_meines_herz.mid')
+        expected = vmf_converter_core.convert_score_to_vmf(score, measure_index=True)
+
+        document = VMFDocument.from_dict(expected)
+
+        assert document.measures(3, 4).start == 12
+        assert document.measures(3, 4).stop == 24
+        assert document.measures(29).stop == len(expected['body'])
+        assert document.offsets(6, 7.25).stop == 15
+
+        actual = document.measures(3, 4).to_score()
+        measures = [element for element in actual.parts[0].recurse() if 'Measure' in element.classes]
+
+        assert [measure.number for measure in measures] == [3, 4]
+        assert [n.quarterLength for n in actual.parts[0].flat.notesAndRests] == \
+               [n.quarterLength for n in document.to_score().parts[0].measures(3, 4).flat.notesAndRests]
+
+        with self.assertRaises(KeyError):
+            document.measures(30)
+
+        with self.assertRaises(ValueError):
+            VMFDocument.from_dict(self.load_fixture('simple')).measures(1)
+
+    def test_import_001(self):
+        """
+        Tests that reading a document does not import music21.
+        """
+        code = 'import sys\n' \
+               'from vmf_converter.core.vmf_document import VMFDocument\n' \
+               'list(VMFDocument.from_file("./expected/simple.vmf").voice(0))\n' \
+               'assert "music21" not in sys.modules\n'
+
+        environment = dict(os.environ, PYTHONPATH=os.path.abspath('..'))
+
+        assert subprocess.call([sys.executable, '-c', code], env=environment) == 0
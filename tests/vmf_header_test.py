@@ -0,0 +1,71 @@
+import unittest
+import json
+
+from fractions import Fraction
+
+from vmf_converter.core.vmf_header import VMFHeader
+
+
+class VMFHeaderTest(unittest.TestCase):
+    """Test Class for VMFHeader module"""
+
+    def test_from_dict_001(self):
+        """
+        Tests the typed fields of a header read from a VMF file.
+        """
+        with open('./expected/tempoChange.vmf', 'r') as expected_file:
+            header = VMFHeader.from_dict(json.loads(expected_file.read())['header'])
+
+        assert header.tick_value == Fraction(2)
+        assert header.number_of_voices == 1
+        assert header.number_of_parts == 1
+        assert header.time_signature == {0.0: '2/4'}
+        assert header.tempo == {0.0: 100, 4.0: 150}
+        assert header.body_encoding == 'plain'
+        assert header.body_layout == 'tick'
+
+    def test_to_dict_001(self):
+        """
+        Tests that a header survives the round trip through its dictionary form.
+        """
+        with open('./expected/SimpleToSimple.vmf', 'r') as expected_file:
+            expected = json.loads(expected_file.read())['header']
+
+        assert VMFHeader.from_dict(expected).to_dict() == expected
+
+    def test_to_dict_002(self):
+        """
+        Tests that the body encoding and layout are only written when they are not the defaults.
+        """
+        header = VMFHeader('1/4', 2, 1, {0.0: '4/4'}, body_encoding='rle', body_layout='voice')
+
+        actual = header.to_dict()
+
+        assert actual['body_encoding'] == 'rle'
+        assert actual['body_layout'] == 'voice'
+        assert VMFHeader.from_dict(actual) == header
+        assert 'body_layout' not in VMFHeader('1/4', 2, 1).to_dict()
+
+    def test_to_dict_003(self):
+        """
+        Tests that the tick value table is only written when the tick value changes.
+        """
+        header = VMFHeader('1', 1, 1, {0.0: '4/4'}, tick_values={0.0: '1', 8.0: '1/5'})
+
+        actual = header.to_dict()
+
+        assert actual['tick_values'] == {'0.0': '1', '8.0': '1/5'}
+        assert VMFHeader.from_dict(actual).tick_values == {0.0: Fraction(1), 8.0: Fraction(1, 5)}
+        assert 'tick_values' not in VMFHeader('1/4', 2, 1).to_dict()
+
+    def test_to_dict_004(self):
+        """
+        Tests that the measure index is only written when there is one.
+        """
+        header = VMFHeader('1', 1, 1, {0.0: '4/4'}, measure_index={1: (0.0, 0), 2: (4.0, 4)})
+
+        actual = header.to_dict()
+
+        assert actual['measure_index'] == {'1': [0.0, 0], '2': [4.0, 4]}
+        assert VMFHeader.from_dict(actual).measure_index == {1: (0.0, 0), 2: (4.0, 4)}
+        assert 'measure_index' not in VMFHeader('1/4', 2, 1).to_dict()
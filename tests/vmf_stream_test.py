@@ -0,0 +1,73 @@
+import unittest
+import io
+import json
+
+from music21 import converter
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.vmf_stream import VMFStreamReader, read_vmf_stream
+
+
+class VMFStreamTest(unittest.TestCase):
+    """Test Class for vmf_stream module"""
+
+    def test_read_vmf_stream_001(self):
+        """
+        Tests that the rows are read one at a time, whatever the chunk size.
+        """
+        with open('./expected/quintuplets.vmf', 'r') as expected_file:
+            contents = expected_file.read()
+
+        expected = json.loads(contents)
+
+        for chunk_size in (1, 7, 64, 65536):
+            reader = VMFStreamReader(io.StringIO(contents), chunk_size=chunk_size)
+
+            assert reader.header == expected['header']
+            assert list(reader.rows()) == expected['body']
+
+    def test_read_vmf_stream_002(self):
+        """
+        Tests reading a document whose body comes before the header, with extra keys and whitespace.
+        """
+        contents = '{ "version" : 1.25 ,\n "body" : [ [[1, 1, 0, 0, 4, 0]] , [[2, 1, 0, 0, 4, 0]] ],\n' \
+                   ' "header": {"tick_value": "1"} }'
+
+        header, rows = read_vmf_stream(io.StringIO(contents))
+
+        assert header == {'tick_value': '1'}
+        assert list(rows) == [[[1, 1, 0, 0, 4, 0]], [[2, 1, 0, 0, 4, 0]]]
+
+    def test_read_vmf_stream_003(self):
+        """
+        Tests reading an empty body and rejecting truncated documents.
+        """
+        header, rows = read_vmf_stream(io.StringIO('{"header": {}, "body": []}'))
+
+        assert header == {}
+        assert list(rows) == []
+
+        header, rows = read_vmf_stream(io.StringIO('{"header": {}, "body": [[[1, 1'))
+
+        with self.assertRaises(ValueError):
+            list(rows)
+
+    def test_read_vmf_stream_004(self):
+        """
+        Tests that the voices of the voice layout are read one tick at a time, whatever the chunk size.
+        """
+        for body_encoding in ('plain', 'rle'):
+            vmf = vmf_converter_core.convert_score_to_vmf(converter.parse('./fixtures/voices.xml'), body_encoding,
+                                                          body_layout='voice')
+            contents = json.dumps(vmf)
+
+            for chunk_size in (1, 7, 65536):
+                reader = VMFStreamReader(io.StringIO(contents), chunk_size=chunk_size)
+
+                assert reader.header == vmf['header']
+                assert list(reader.rows()) == vmf['body']
+
+            # The header is only found after the body.
+            header, rows = read_vmf_stream(io.StringIO(json.dumps({'body': vmf['body'], 'header': vmf['header']})))
+
+            assert list(rows) == vmf['body']
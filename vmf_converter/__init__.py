@@ -1,2 +1,3 @@
 """Converter utilities for the vector music format (VMF)."""
-__all__ = ['vmf_converter']
+__all__ = ['vmf_converter', 'batch', 'cache']
+__version__ = '0.0.2'
@@ -0,0 +1,259 @@
+"""Parallel conversion of whole corpora of scores to VMF."""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+# Extensions of the files converted by default.
+DEFAULT_EXTENSIONS = ('mid', 'midi', 'xml', 'mxl', 'musicxml')
+# Extensions of the MIDI files, which are converted without building a music21 score unless quantized.
+MIDI_EXTENSIONS = ('.mid', '.midi')
+# Extensions of the uncompressed MusicXML files, which are streamed without building a music21 score unless quantized.
+MUSICXML_EXTENSIONS = ('.xml', '.musicxml')
+
+
+class BatchSummary:
+    """
+    The outcome of a batch conversion.
+    """
+
+    def __init__(self):
+        # Paths of the files converted successfully.
+        self.converted = []
+        # (path, error) pairs of the files that failed.
+        self.failed = []
+        # (path, QuantizationReport) pairs of the files quantized before encoding.
+        self.quantized = []
+        # Wall clock time of the whole batch, in seconds.
+        self.elapsed = 0.0
+
+    @property
+    def files_per_second(self):
+        """
+        The throughput of the batch.
+        """
+
+        if self.elapsed <= 0:
+            return 0.0
+
+        return (len(self.converted) + len(self.failed)) / self.elapsed
+
+    def __str__(self):
+        lines = ['Converted %d files, %d failed, in %.1f seconds (%.1f files/s).' % (
+            len(self.converted), len(self.failed), self.elapsed, self.files_per_second)]
+
+        if len(self.quantized) > 0:
+            worst_path, worst_report = max(self.quantized, key=lambda item: item[1].max_onset_displacement)
+            lines.append('Quantized %d files, onsets moved at most %.4f quarter notes (%s).' % (
+                len(self.quantized), worst_report.max_onset_displacement, worst_path))
+
+        for path, error in self.failed:
+            lines.append('FAILED %s: %s' % (path, error.strip().splitlines()[-1]))
+
+        return '\n'.join(lines)
+
+
+def find_scores(source_directory, extensions=DEFAULT_EXTENSIONS):
+    """
+    Finds the files to convert in a directory tree.
+
+    :param source_directory: The root of the directory tree.
+    :param extensions: The extensions of the files to convert, without the dot.
+    :return: A sorted list of file paths.
+    """
+
+    extensions = {'.' + extension.lower() for extension in extensions}
+
+    paths = []
+
+    for directory, directory_names, file_names in os.walk(source_directory):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() in extensions:
+                paths.append(os.path.join(directory, file_name))
+
+    return sorted(paths)
+
+
+def convert_corpus(source_directory, destination_directory, processes=None, chunk_size=8,
+                   output_format='vmf', body_encoding='plain', extensions=DEFAULT_EXTENSIONS, max_ticks=None,
+                   quantize=None):
+    """
+    Converts every score in a directory tree to VMF on a pool of worker processes.
+
+    The workers import music21 once when they start. A file that fails to convert is
+    recorded in the summary without affecting the others. The directory structure of
+    the source is mirrored in the destination.
+
+    :param source_directory: The root of the tree of scores to convert.
+    :param destination_directory: The root of the tree to write the VMF files to.
+    :param processes: The number of worker processes, the number of CPUs by default.
+    :param chunk_size: The number of files handed to a worker at a time.
+    :param output_format: 'vmf' for JSON files or 'vmfb' for binary files.
+    :param body_encoding: The encoding of the body of JSON files, plain or run-length encoded.
+    :param extensions: The extensions of the files to convert, without the dot.
+    :param max_ticks: The largest number of ticks of a file, or None for no limit. Larger files
+    fail before they are encoded, instead of exhausting the memory of their worker.
+    :param quantize: The divisors of the quarter note of the grids to quantize the scores to
+    before encoding, such as (4, 3), or None to encode them as they are.
+    :return: A BatchSummary of the conversion.
+    """
+
+    if output_format not in ('vmf', 'vmfb'):
+        raise ValueError("Output format is not supported")
+
+    summary = BatchSummary()
+    start = time.time()
+
+    tasks = []
+
+    for source in find_scores(source_directory, extensions):
+        relative_path = os.path.relpath(source, source_directory)
+        destination = os.path.join(destination_directory, os.path.splitext(relative_path)[0] + '.' + output_format)
+
+        tasks.append((source, destination, output_format, body_encoding, max_ticks, quantize))
+
+    pool = multiprocessing.Pool(processes, initializer=_initialize_worker)
+
+    try:
+        for source, error, report in pool.imap_unordered(_convert_file, tasks, chunksize=max(1, chunk_size)):
+            if error is None:
+                summary.converted.append(source)
+            else:
+                summary.failed.append((source, error))
+
+            if report is not None:
+                summary.quantized.append((source, report))
+    finally:
+        pool.close()
+        pool.join()
+
+    summary.elapsed = time.time() - start
+
+    return summary
+
+
+def _initialize_worker():
+    """
+    Imports music21 and registers the VMF converter once per worker process.
+    """
+
+    from music21 import converter
+    from vmf_converter.vmf_converter import VMFConverter
+
+    converter.registerSubconverter(VMFConverter)
+
+
+def _convert_file(task):
+    """
+    Converts a single file, catching any error so that it only fails this file.
+
+    :param task: A tuple of the source path, destination path, output format, body encoding, tick budget
+    and quantization divisors.
+    :return: A tuple of the source path, the formatted error or None on success, and the
+    QuantizationReport of the file or None.
+    """
+
+    source, destination, output_format, body_encoding, max_ticks, quantize = task
+
+    report = None
+
+    try:
+        from music21 import converter
+        from vmf_converter.core import midi_converter, musicxml_converter, quantizer, vmf_binary, vmf_converter_core
+
+        destination_directory = os.path.dirname(destination)
+        if destination_directory and not os.path.isdir(destination_directory):
+            try:
+                os.makedirs(destination_directory)
+            except OSError:
+                # Another worker may have created it in the meantime.
+                if not os.path.isdir(destination_directory):
+                    raise
+
+        extension = os.path.splitext(source)[1].lower()
+
+        if quantize is None and extension in MIDI_EXTENSIONS:
+            if output_format == 'vmfb':
+                vmf_binary.write_vmf_binary_file(midi_converter.convert_midi_file_to_vmf(source, max_ticks=max_ticks),
+                                                 destination)
+            else:
+                with open(destination, 'w') as file:
+                    midi_converter.write_midi_file_as_vmf(source, file, body_encoding=body_encoding,
+                                                          max_ticks=max_ticks)
+
+            return source, None, report
+
+        if quantize is None and extension in MUSICXML_EXTENSIONS:
+            if output_format == 'vmfb':
+                vmf_binary.write_vmf_binary_file(
+                    musicxml_converter.convert_musicxml_file_to_vmf(source, max_ticks=max_ticks), destination)
+            else:
+                with open(destination, 'w') as file:
+                    musicxml_converter.write_musicxml_file_as_vmf(source, file, body_encoding=body_encoding,
+                                                                  max_ticks=max_ticks)
+
+            return source, None, report
+
+        score = converter.parse(source)
+
+        if quantize is not None:
+            report = quantizer.quantize_score(score, quantize, max_ticks)
+
+        if output_format == 'vmfb':
+            vmf_binary.write_vmf_binary_file(vmf_converter_core.convert_score_to_vmf(score, max_ticks=max_ticks),
+                                             destination)
+        else:
+            with open(destination, 'w') as file:
+                vmf_converter_core.write_vmf(score, file, body_encoding=body_encoding, max_ticks=max_ticks)
+    except Exception:
+        return source, traceback.format_exc(), report
+
+    return source, None, report
+
+
+def main(argv=None):
+    """
+    Entry point of the vmf-convert console script.
+
+    :param argv: The command line arguments, sys.argv[1:] by default.
+    :return: The exit status, 1 if any file failed to convert.
+    """
+
+    parser = argparse.ArgumentParser(description='Convert a directory tree of scores to VMF.')
+    parser.add_argument('source', help='directory of MIDI and MusicXML files to convert')
+    parser.add_argument('destination', help='directory to write the VMF files to')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=8,
+                        help='number of files handed to a worker at a time (default: 8)')
+    parser.add_argument('-f', '--format', choices=('vmf', 'vmfb'), default='vmf',
+                        help='write JSON (vmf) or binary (vmfb) files (default: vmf)')
+    parser.add_argument('--rle', action='store_true', help='run-length encode the body of JSON files')
+    parser.add_argument('--max-ticks', type=int, default=None,
+                        help='fail files that would encode to more ticks than this (default: no limit)')
+    parser.add_argument('-q', '--quantize', default=None,
+                        help='comma separated divisors of the quarter note of the grids to quantize to, such as 4,3')
+    parser.add_argument('-e', '--extensions', default=','.join(DEFAULT_EXTENSIONS),
+                        help='comma separated extensions of the files to convert')
+
+    arguments = parser.parse_args(argv)
+
+    summary = convert_corpus(arguments.source, arguments.destination,
+                             processes=arguments.processes,
+                             chunk_size=arguments.chunk_size,
+                             output_format=arguments.format,
+                             body_encoding='rle' if arguments.rle else 'plain',
+                             extensions=[extension.strip().lstrip('.') for extension in arguments.extensions.split(',')],
+                             max_ticks=arguments.max_ticks,
+                             quantize=None if arguments.quantize is None else
+                             tuple(int(divisor) for divisor in arguments.quantize.split(',')))
+
+    print(summary)
+
+    return 1 if len(summary.failed) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Content-addressed on-disk cache of parsed scores."""
+import hashlib
+import os
+import tempfile
+
+import music21
+from music21 import freezeThaw
+
+import vmf_converter
+
+# Extension of the cache entries.
+ENTRY_EXTENSION = '.m21p'
+# Extension of the files entries are written to before they are renamed into place.
+TEMPORARY_EXTENSION = '.tmp'
+# Version of the cached scores. Bump it whenever the parsing or decoding of files changes,
+# so that entries holding scores from the previous code are no longer found.
+CACHE_FORMAT_VERSION = 1
+
+
+class VMFCache:
+    """
+    On-disk cache of music21 scores keyed by the content of the file they were parsed from.
+
+    Keys combine a hash of the file contents with the cache format, converter and music21
+    versions, so entries are never stale. Entries are frozen with music21's pickler, which
+    thaws much faster than parsing. The cache is kept under a size cap by evicting the least
+    recently used entries.
+
+    Entries are written to a temporary file and renamed into place, so that several
+    processes can share a cache directory: a reader sees either a whole entry or none.
+    Temporary files left behind by a process that died while writing count toward the cap
+    and are evicted like entries.
+
+    The size of the directory is scanned on the first put, then tracked in memory, so the
+    directory is only scanned again when the cache grows past its cap.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        """
+        Creates a cache in a directory, creating the directory if needed.
+
+        :param directory: The directory holding the cache entries.
+        :param max_bytes: The size cap of the cache, in bytes.
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # The size of the directory as of the last scan plus the entries put since, or None before the first scan.
+        self.__total_bytes = None
+
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Another process may have created it in the meantime.
+            if not os.path.isdir(directory):
+                raise
+
+    def key(self, path):
+        """
+        Computes the cache key of a file.
+
+        :param path: The path of the file.
+        :return: The hexadecimal key of the file's contents and the versions of the code reading it.
+        """
+
+        versions = '%d\0%s\0%s\0' % (CACHE_FORMAT_VERSION, vmf_converter.__version__, music21.VERSION_STR)
+
+        digest = hashlib.sha256(versions.encode('utf-8'))
+
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def load(self, path, parse):
+        """
+        Gets the score of a file from the cache, parsing and storing it on a miss.
+
+        :param path: The path of the file.
+        :param parse: A function parsing a file path to a music21 score, used on a miss.
+        :return: The music21 score of the file.
+        """
+
+        key = self.key(path)
+
+        score = self.get(key)
+
+        if score is not None:
+            self.hits += 1
+            return score
+
+        self.misses += 1
+
+        score = parse(path)
+        self.put(key, score)
+
+        return score
+
+    def get(self, key):
+        """
+        Reads an entry of the cache and marks it as recently used.
+
+        :param key: The key of the entry.
+        :return: The cached music21 score, or None if there is no usable entry.
+        """
+
+        entry_path = self.__entry_path(key)
+
+        try:
+            with open(entry_path, 'rb') as file:
+                data = file.read()
+
+            # Record the access for the eviction order.
+            os.utime(entry_path, None)
+        except (IOError, OSError):
+            # Missing, or evicted by another process in the meantime.
+            return None
+
+        try:
+            thawer = freezeThaw.StreamThawer()
+            thawer.openStr(data)
+        except Exception:
+            # An entry that does not thaw is dropped and treated as a miss.
+            self.__remove(entry_path)
+            return None
+
+        return thawer.stream
+
+    def put(self, key, score):
+        """
+        Stores a score in the cache, then evicts entries if the cache grew beyond the size cap.
+
+        :param key: The key of the entry.
+        :param score: The music21 score to store. It is not modified.
+        """
+
+        data = freezeThaw.StreamFreezer(score).writeStr(fmt='pickle')
+
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=TEMPORARY_EXTENSION)
+        renamed = False
+
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(data)
+
+            _replace_file(temporary_path, self.__entry_path(key))
+            renamed = True
+        finally:
+            # A failed write or rename leaves nothing behind.
+            if not renamed:
+                self.__remove(temporary_path)
+
+        if self.__total_bytes is None:
+            self.evict()
+            return
+
+        self.__total_bytes += len(data)
+
+        if self.__total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits under its size cap.
+
+        Leftover temporary files are counted and removed the same way, oldest first.
+        """
+
+        entries = []
+        total_bytes = 0
+
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith((ENTRY_EXTENSION, TEMPORARY_EXTENSION)):
+                continue
+
+            entry_path = os.path.join(self.directory, file_name)
+
+            try:
+                status = os.stat(entry_path)
+            except OSError:
+                continue
+
+            entries.append((status.st_mtime, status.st_size, entry_path))
+            total_bytes += status.st_size
+
+        for modified, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+
+            self.__remove(entry_path)
+            total_bytes -= size
+
+        self.__total_bytes = total_bytes
+
+    def clear(self):
+        """
+        Removes every entry of the cache.
+        """
+
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(ENTRY_EXTENSION):
+                self.__remove(os.path.join(self.directory, file_name))
+
+        self.__total_bytes = None
+
+    def __entry_path(self, key):
+        return os.path.join(self.directory, key + ENTRY_EXTENSION)
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            # Already removed by another process.
+            pass
+
+
+def _replace_file(source, destination):
+    """
+    Renames a file over another one, atomically where the platform allows it.
+
+    :param source: The path of the file to rename.
+    :param destination: The path to rename it to, replaced if it exists.
+    """
+
+    # os.replace is only available from Python 3.3.
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+
+    # Before it, only POSIX renames over an existing file.
+    if os.name == 'nt' and os.path.exists(destination):
+        os.remove(destination)
+
+    os.rename(source, destination)
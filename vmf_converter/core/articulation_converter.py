@@ -1,5 +1,16 @@
 from music21.articulations import Staccato, Staccatissimo, StrongAccent, Accent, Tenuto
 
+# The vmf encoding of each supported articulation class. Subclasses are not supported.
+ARTICULATION_TO_VMF = {
+    Staccato: 3,
+    Staccatissimo: 4,
+    StrongAccent: 5,
+    Accent: 6,
+    Tenuto: 7
+}
+# The articulation class of each vmf encoding.
+VMF_TO_ARTICULATION = {vmf: articulation for articulation, vmf in ARTICULATION_TO_VMF.items()}
+
 
 class ArticulationConverter:
     """
@@ -15,17 +26,9 @@ class ArticulationConverter:
         :return: The vmf encoding
         """
 
-        if type(articulation) is Staccato:
-            return 3
-        elif type(articulation) is Staccatissimo:
-            return 4
-        elif type(articulation) is StrongAccent:
-            return 5
-        elif type(articulation) is Accent:
-            return 6
-        elif type(articulation) is Tenuto:
-            return 7
-        else:
+        try:
+            return ARTICULATION_TO_VMF[type(articulation)]
+        except KeyError:
             raise ValueError("Articulation is not supported")
 
     @classmethod
@@ -39,15 +42,8 @@ class ArticulationConverter:
 
         if vmf == 0:
             return None
-        elif vmf == 3:
-            return Staccato()
-        elif vmf == 4:
-            return Staccatissimo()
-        elif vmf == 5:
-            return StrongAccent()
-        elif vmf == 6:
-            return Accent()
-        elif vmf == 7:
-            return Tenuto()
-        else:
+
+        try:
+            return VMF_TO_ARTICULATION[vmf]()
+        except KeyError:
             raise ValueError("Articulation is not supported")
@@ -1,74 +1,69 @@
+"""Conversion between MIDI velocities and VMF dynamics, by table lookup."""
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The VMF dynamics from pppp to ffff, each with the velocity it decodes to and the
+# inclusive range of velocities that encode to it.
+DYNAMICS = (
+    (-5, 10, 0, 12),
+    (-4, 23, 13, 25),
+    (-3, 36, 26, 38),
+    (-2, 49, 39, 51),
+    (-1, 62, 52, 64),
+    (1, 75, 65, 77),
+    (2, 88, 78, 90),
+    (3, 101, 91, 103),
+    (4, 114, 104, 116),
+    (5, 127, 117, 127)
+)
+
+# The VMF dynamic of each MIDI velocity, indexed by velocity.
+VELOCITY_TO_VMF = tuple(vmf for vmf, velocity, low, high in DYNAMICS for i in range(low, high + 1))
+# The velocity each VMF dynamic decodes to.
+VMF_TO_VELOCITY = {vmf: velocity for vmf, velocity, low, high in DYNAMICS}
+
+# The smallest and largest VMF dynamics. Arrays of dynamics index their table from the smallest.
+MIN_VMF = min(VMF_TO_VELOCITY)
+MAX_VMF = max(VMF_TO_VELOCITY)
+
+if numpy is not None:
+    _VELOCITY_TO_VMF_ARRAY = numpy.array(VELOCITY_TO_VMF, dtype=numpy.int8)
+    # Dynamics without a velocity, such as 0, map to -1.
+    _VMF_TO_VELOCITY_ARRAY = numpy.array([VMF_TO_VELOCITY.get(vmf, -1) for vmf in range(MIN_VMF, MAX_VMF + 1)],
+                                          dtype=numpy.int16)
+
+
 class DynamicConverter:
     """
     Converts between velocities and VMF dynamics.
     """
 
-    __PPPP_VELOCITY = 10
-    __PPP_VELOCITY = 23
-    __PP_VELOCITY = 36
-    __P_VELOCITY = 49
-    __MP_VELOCITY = 62
-    __MF_VELOCITY = 75
-    __F_VELOCITY = 88
-    __FF_VELOCITY = 101
-    __FFF_VELOCITY = 114
-    __FFFF_VELOCITY = 127
-
-    __PPPP_MIN = 0
-    __PPPP_MAX = 12
-    __PPP_MIN = 13
-    __PPP_MAX = 25
-    __PP_MIN = 26
-    __PP_MAX = 38
-    __P_MIN = 39
-    __P_MAX = 51
-    __MP_MIN = 52
-    __MP_MAX = 64
-    __MF_MIN = 65
-    __MF_MAX = 77
-    __F_MIN = 78
-    __F_MAX = 90
-    __FF_MIN = 91
-    __FF_MAX = 103
-    __FFF_MIN = 104
-    __FFF_MAX = 116
-    __FFFF_MIN = 117
-    __FFFF_MAX = 127
-
     @classmethod
     def velocity_to_vmf(cls, velocity):
         """
         Converts a midi velocity to a VMF dynamic symbol.
 
+        A fractional velocity, which music21 allows, is rounded to the nearest integer,
+        halves up, before the lookup.
+
         :param velocity: The midi velocity.
         :return: A value representing a dynamic in VMF.
         """
         if velocity is None:
             return 1
 
-        if DynamicConverter.__PPPP_MIN <= velocity <= DynamicConverter.__PPPP_MAX:
-            return -5
-        elif DynamicConverter.__PPP_MIN <= velocity <= DynamicConverter.__PPP_MAX:
-            return -4
-        elif DynamicConverter.__PP_MIN <= velocity <= DynamicConverter.__PP_MAX:
-            return -3
-        elif DynamicConverter.__P_MIN <= velocity <= DynamicConverter.__P_MAX:
-            return -2
-        elif DynamicConverter.__MP_MIN <= velocity <= DynamicConverter.__MP_MAX:
-            return -1
-        elif DynamicConverter.__MF_MIN <= velocity <= DynamicConverter.__MF_MAX:
-            return 1
-        elif DynamicConverter.__F_MIN <= velocity <= DynamicConverter.__F_MAX:
-            return 2
-        elif DynamicConverter.__FF_MIN <= velocity <= DynamicConverter.__FF_MAX:
-            return 3
-        elif DynamicConverter.__FFF_MIN <= velocity <= DynamicConverter.__FFF_MAX:
-            return 4
-        elif DynamicConverter.__FFFF_MIN <= velocity <= DynamicConverter.__FFFF_MAX:
-            return 5
-        else:
+        # Round halves up on every Python version, where round() differs between 2 and 3.
+        velocity = int(math.floor(velocity + 0.5))
+
+        if not 0 <= velocity < len(VELOCITY_TO_VMF):
             raise ValueError("Velocity must be between 0 and 127")
 
+        return VELOCITY_TO_VMF[velocity]
+
     @classmethod
     def vmf_to_velocity(cls, vmf_value):
         """
@@ -77,25 +72,48 @@ class DynamicConverter:
         :param vmf_value: The dynamic value in VMF format.
         :return: The corresponding MIDI velocity value.
         """
-        if vmf_value == -5:
-            return DynamicConverter.__PPPP_VELOCITY
-        elif vmf_value == -4:
-            return DynamicConverter.__PPP_VELOCITY
-        elif vmf_value == -3:
-            return DynamicConverter.__PP_VELOCITY
-        elif vmf_value == -2:
-            return DynamicConverter.__P_VELOCITY
-        elif vmf_value == -1:
-            return DynamicConverter.__MP_VELOCITY
-        elif vmf_value == 1:
-            return DynamicConverter.__MF_VELOCITY
-        elif vmf_value == 2:
-            return DynamicConverter.__F_VELOCITY
-        elif vmf_value == 3:
-            return DynamicConverter.__FF_VELOCITY
-        elif vmf_value == 4:
-            return DynamicConverter.__FFF_VELOCITY
-        elif vmf_value == 5:
-            return DynamicConverter.__FFFF_VELOCITY
-        else:
-            raise ValueError("VMF must be -5 to 5 excluding 0.")
\ No newline at end of file
+        try:
+            return VMF_TO_VELOCITY[vmf_value]
+        except KeyError:
+            raise ValueError("VMF must be -5 to 5 excluding 0.")
+
+    @classmethod
+    def velocities_to_vmf(cls, velocities):
+        """
+        Converts an array of midi velocities to VMF dynamics at once. Requires numpy.
+
+        :param velocities: An integer array of midi velocities.
+        :return: An int8 array of VMF dynamics, with the same shape.
+        """
+        if numpy is None:
+            raise ImportError("velocities_to_vmf requires numpy")
+
+        velocities = numpy.asarray(velocities)
+
+        if velocities.size > 0 and (velocities.min() < 0 or velocities.max() >= len(VELOCITY_TO_VMF)):
+            raise ValueError("Velocity must be between 0 and 127")
+
+        return _VELOCITY_TO_VMF_ARRAY[velocities]
+
+    @classmethod
+    def vmf_to_velocities(cls, vmf_values):
+        """
+        Converts an array of VMF dynamics to midi velocities at once. Requires numpy.
+
+        :param vmf_values: An integer array of VMF dynamics.
+        :return: An int16 array of midi velocities, with the same shape.
+        """
+        if numpy is None:
+            raise ImportError("vmf_to_velocities requires numpy")
+
+        vmf_values = numpy.asarray(vmf_values)
+
+        if vmf_values.size > 0 and (vmf_values.min() < MIN_VMF or vmf_values.max() > MAX_VMF):
+            raise ValueError("VMF must be -5 to 5 excluding 0.")
+
+        velocities = _VMF_TO_VELOCITY_ARRAY[vmf_values - MIN_VMF]
+
+        if velocities.size > 0 and velocities.min() < 0:
+            raise ValueError("VMF must be -5 to 5 excluding 0.")
+
+        return velocities
@@ -0,0 +1,167 @@
+"""Cached construction of the music21 objects created while decoding VMF."""
+from collections import OrderedDict
+
+from music21.chord import Chord
+from music21.note import Note
+from music21.pitch import Accidental, Pitch
+
+from vmf_converter.core.articulation_converter import ArticulationConverter
+
+# The default number of prototypes kept in each cache.
+DEFAULT_MAX_SIZE = 1024
+
+
+class ElementFactory:
+    """
+    Creates the notes, chords, pitches and articulations of decoded ticks from cached prototypes.
+
+    Spelling a pitch from its pitch class is the expensive part of building it, so a prototype
+    is spelled once per (pitch class, octave) and new pitches copy its attributes. Chords cache
+    the prototypes of all their pitches under the tuple of (pitch class, octave) pairs.
+    Every returned object is new, so callers may modify it freely.
+
+    The caches are bounded and evict the least recently used prototypes.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param max_size: The number of prototypes kept in each cache.
+        """
+
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self.__pitches = OrderedDict()
+        self.__chords = OrderedDict()
+        self.__articulations = {}
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups served from the caches.
+        """
+
+        lookups = self.hits + self.misses
+
+        if lookups == 0:
+            return 0.0
+
+        return self.hits / lookups
+
+    def pitch(self, pitch_class, octave):
+        """
+        Creates a pitch.
+
+        :param pitch_class: The pitch class, from 0 to 11.
+        :param octave: The octave.
+        :return: A new music21 pitch.
+        """
+
+        return self.__copy_pitch(self.__lookup(self.__pitches, (pitch_class, octave), self.__create_pitch))
+
+    def note(self, pitch_class, octave):
+        """
+        Creates a note.
+
+        :param pitch_class: The pitch class, from 0 to 11.
+        :param octave: The octave.
+        :return: A new music21 note.
+        """
+
+        return Note(self.pitch(pitch_class, octave))
+
+    def chord(self, pitch_keys):
+        """
+        Creates a chord.
+
+        :param pitch_keys: A tuple of (pitch class, octave) pairs.
+        :return: A new music21 chord.
+        """
+
+        prototypes = self.__lookup(self.__chords, pitch_keys, self.__create_chord_pitches)
+
+        return Chord([self.__copy_pitch(prototype) for prototype in prototypes])
+
+    def articulation(self, vmf):
+        """
+        Creates an articulation.
+
+        :param vmf: The VMF articulation value.
+        :return: A new music21 articulation, or None for no articulation.
+        """
+
+        try:
+            articulation_class = self.__articulations[vmf]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+
+            prototype = ArticulationConverter.vmf_to_articulation(vmf)
+            articulation_class = None if prototype is None else type(prototype)
+
+            self.__articulations[vmf] = articulation_class
+
+        if articulation_class is None:
+            return None
+
+        return articulation_class()
+
+    def __lookup(self, cache, key, create):
+        """
+        Finds a prototype in a cache, creating it on a miss.
+
+        :param cache: The cache to search.
+        :param key: The key of the prototype.
+        :param create: A function creating the prototype from its key.
+        :return: The prototype.
+        """
+
+        try:
+            prototype = cache[key]
+        except KeyError:
+            self.misses += 1
+
+            prototype = create(key)
+            cache[key] = prototype
+
+            if len(cache) > self.max_size:
+                cache.popitem(last=False)
+
+            return prototype
+
+        self.hits += 1
+        cache.move_to_end(key)
+
+        return prototype
+
+    def __create_chord_pitches(self, pitch_keys):
+        return tuple(self.__lookup(self.__pitches, pitch_key, self.__create_pitch) for pitch_key in pitch_keys)
+
+    @staticmethod
+    def __create_pitch(pitch_key):
+        pitch_class, octave = pitch_key
+
+        return Pitch(pitchClass=pitch_class, octave=octave)
+
+    @staticmethod
+    def __copy_pitch(prototype):
+        """
+        Copies a prototype pitch without sharing any of its mutable parts.
+
+        :param prototype: The pitch to copy.
+        :return: A new music21 pitch.
+        """
+
+        # The new pitch keeps its own groups and microtone, which is zero for every VMF pitch.
+        pitch = Pitch()
+        pitch.step = prototype.step
+        pitch.octave = prototype.octave
+
+        if prototype.accidental is not None:
+            pitch.accidental = Accidental(prototype.accidental.name)
+
+        # Spelling from a pitch class marks naturals as implicit, so they are not printed.
+        pitch.implicitAccidental = prototype.implicitAccidental
+
+        return pitch
@@ -0,0 +1,545 @@
+"""Direct conversion of MIDI files to VMF, without building a music21 score."""
+from fractions import Fraction
+
+from music21 import common, converter
+from music21.midi import MidiFile
+from music21.midi import translate
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.tick_grid import TickGrid, to_exact_quarter_length
+from vmf_converter.core.vmf_header import BODY_ENCODING_PLAIN, BODY_ENCODING_RLE, BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE
+
+# The grids music21 quantizes imported MIDI to, as divisors of the quarter note.
+QUANTIZATION_DIVISORS = (8, 3)
+# Notes starting within this fraction of a quarter note of each other form a chord, as in music21.
+CHORD_TOLERANCE_DIVISOR = 16
+# The time signature music21 measures a part with when it has none.
+DEFAULT_TIME_SIGNATURE = '4/4'
+
+
+class MidiElement:
+    """
+    A note, chord or rest of a MIDI track, as music21 imports it.
+    """
+
+    __slots__ = ('offset', 'quarter_length', 'pitches', 'velocity')
+
+    def __init__(self, offset, quarter_length, pitches=None, velocity=None):
+        """
+        :param offset: The offset of the element, in quarter lengths.
+        :param quarter_length: The duration of the element, in quarter lengths.
+        :param pitches: The MIDI note numbers of the element, or None for a rest.
+        :param velocity: The velocity of the element, or None for a rest.
+        """
+
+        self.offset = offset
+        self.quarter_length = quarter_length
+        self.pitches = pitches
+        self.velocity = velocity
+
+
+class MidiTrack:
+    """
+    The elements and the meter, key and tempo events of a MIDI track, as music21 imports it.
+
+    The events are (offset, value) pairs: the ratio strings of the time signatures, the
+    sharps of the key signatures and the quarter note BPMs of the tempos.
+    """
+
+    def __init__(self):
+        # The notes, chords and rests of the track, ordered as in the flattened part.
+        self.elements = []
+        self.time_signatures = []
+        self.key_signatures = []
+        self.tempos = []
+        # The offsets of the other events music21 inserts in the part, such as program changes.
+        self.other_offsets = []
+        # Whether notes starting together end apart, so that music21 would split the track into voices.
+        self.needs_voices = False
+
+    @property
+    def event_offsets(self):
+        """
+        The offsets of all the events of the track, which have no duration.
+        """
+
+        offsets = list(self.other_offsets)
+
+        for events in (self.time_signatures, self.key_signatures, self.tempos):
+            offsets.extend(offset for offset, value in events)
+
+        return offsets
+
+
+def read_midi_file(path):
+    """
+    Reads a MIDI file with music21's low level reader.
+
+    :param path: The path of the MIDI file.
+    :return: A music21 MidiFile instance.
+    """
+
+    midi_file = MidiFile()
+    midi_file.open(path)
+
+    try:
+        midi_file.read()
+    finally:
+        midi_file.close()
+
+    return midi_file
+
+
+def quantize_quarter_length(quarter_length):
+    """
+    Snaps a quarter length to the nearest point of the quantization grids, the way Stream.quantize does.
+
+    :param quarter_length: The quarter length to snap.
+    :return: The snapped quarter length, as a Fraction.
+    """
+
+    sign = 1
+
+    if quarter_length < 0:
+        sign = -1
+        quarter_length = -quarter_length
+
+    candidates = []
+
+    for divisor in QUANTIZATION_DIVISORS:
+        match, error, signed_error = common.nearestMultiple(float(quarter_length), 1.0 / divisor)
+        candidates.append((error, match, signed_error))
+
+    return sign * to_exact_quarter_length(sorted(candidates)[0][1])
+
+
+def read_midi_track(midi_track, ticks_per_quarter):
+    """
+    Reads the elements and events of a MIDI track, following music21's midiTrackToStream.
+
+    A note on is paired with the next event of the same pitch and channel. Notes starting
+    and ending together are gathered into chords. Offsets and durations are quantized and
+    the gaps are filled with rests, all as music21 does, without creating any music21 object.
+
+    :param midi_track: The music21 MidiTrack to read.
+    :param ticks_per_quarter: The MIDI ticks per quarter note of the file.
+    :return: A MidiTrack instance.
+    """
+
+    track = MidiTrack()
+
+    # Pair the delta times with the events following them, in absolute ticks.
+    events = []
+    time = 0
+    i = 0
+
+    while i + 1 < len(midi_track.events):
+        if midi_track.events[i].isDeltaTime() and not midi_track.events[i + 1].isDeltaTime():
+            time += midi_track.events[i].time
+            events.append((time, midi_track.events[i + 1]))
+            i += 2
+        else:
+            i += 1
+
+    # The (note on, note off) pairs of events, in the order of their note ons.
+    notes = []
+    # The note on waiting for its note off, by pitch and channel.
+    pending = {}
+
+    for i, (time, event) in enumerate(events):
+        if event.pitch is not None:
+            note_key = (event.pitch, event.channel)
+
+            if note_key in pending:
+                on_index, on = pending.pop(note_key)
+                notes.append((on_index, on, (time, event)))
+                continue
+
+            if event.isNoteOn():
+                pending[note_key] = (i, (time, event))
+                continue
+
+        offset = quantize_quarter_length(time / float(ticks_per_quarter))
+
+        if event.type == 'TIME_SIGNATURE':
+            track.time_signatures.append((offset, translate.midiEventsToTimeSignature(event).ratioString))
+        elif event.type == 'KEY_SIGNATURE':
+            track.key_signatures.append((offset, translate.midiEventsToKeySignature(event).sharps))
+        elif event.type == 'SET_TEMPO':
+            track.tempos.append((offset, translate.midiEventsToTempo(event).getQuarterBPM()))
+        elif event.type == 'PROGRAM_CHANGE':
+            track.other_offsets.append(offset)
+
+    notes = [(on, off) for on_index, on, off in sorted(notes, key=lambda note: note[0])]
+
+    for chord_notes in _gather_chords(notes, ticks_per_quarter, track):
+        (on_time, on_event), (off_time, off_event) = chord_notes[0]
+
+        # A chord lasts from the onset of its last note to the end of its first.
+        ticks = off_time - chord_notes[-1][0][0]
+        quarter_length = ticks / float(ticks_per_quarter) if ticks != 0 else 1.0
+
+        track.elements.append(MidiElement(quantize_quarter_length(on_time / float(ticks_per_quarter)),
+                                          quantize_quarter_length(max(quarter_length, 0)),
+                                          [on[1].pitch for on, off in chord_notes],
+                                          on_event.velocity))
+
+    if len(track.elements) > 0:
+        _fill_rests(track)
+
+    return track
+
+
+def _gather_chords(notes, ticks_per_quarter, track):
+    """
+    Groups the notes starting and ending within the chord tolerance of each other.
+
+    :param notes: The ((on time, on event), (off time, off event)) pairs of the notes, by onset.
+    :param ticks_per_quarter: The MIDI ticks per quarter note of the file.
+    :param track: The MidiTrack to flag when notes start together but end apart.
+    :return: A generator over lists of note pairs, one per note or chord.
+    """
+
+    tolerance = ticks_per_quarter / CHORD_TOLERANCE_DIVISOR
+    gathered = set()
+
+    for i, ((on_time, on_event), (off_time, off_event)) in enumerate(notes):
+        if i in gathered:
+            continue
+
+        chord_notes = [notes[i]]
+
+        for j in range(i + 1, len(notes)):
+            (other_on_time, other_on_event), (other_off_time, other_off_event) = notes[j]
+
+            if abs(other_on_time - on_time) > tolerance:
+                break
+
+            if abs(other_off_time - off_time) > tolerance:
+                track.needs_voices = True
+                continue
+
+            chord_notes.append(notes[j])
+            gathered.add(j)
+
+        yield chord_notes
+
+
+def _fill_rests(track):
+    """
+    Fills the start and the gaps of a track with rests, the way makeRests does.
+    The events count as elements without duration.
+
+    :param track: The MidiTrack, with quantized elements and events. It is modified in place.
+    """
+
+    event_offsets = track.event_offsets
+
+    lowest_offset = min([element.offset for element in track.elements] + event_offsets)
+
+    if lowest_offset > 0:
+        track.elements.append(MidiElement(Fraction(0), lowest_offset))
+
+    spans = sorted([(element.offset, element.quarter_length) for element in track.elements] +
+                   [(offset, Fraction(0)) for offset in event_offsets], key=lambda span: span[0])
+
+    end = Fraction(0)
+
+    for offset, quarter_length in spans:
+        if offset > end:
+            track.elements.append(MidiElement(end, offset - end))
+
+        end = max(end, offset + quarter_length)
+
+    # The sort is stable, so elements at the same offset keep the order they were inserted in.
+    track.elements.sort(key=lambda element: element.offset)
+
+
+def read_midi_tracks(path):
+    """
+    Reads the parts of a MIDI file, as music21 imports them.
+
+    Each track with notes is a part. The time and key signatures of the tracks without notes
+    are added to every part, and their tempos to the first part only.
+
+    :param path: The path of the MIDI file.
+    :return: A list of MidiTrack instances, one per part.
+    """
+
+    midi_file = read_midi_file(path)
+
+    parts = []
+    conductor = MidiTrack()
+
+    for midi_track in midi_file.tracks:
+        track = read_midi_track(midi_track, midi_file.ticksPerQuarterNote)
+
+        if midi_track.hasNotes():
+            parts.append(track)
+        else:
+            conductor.time_signatures.extend(track.time_signatures)
+            conductor.key_signatures.extend(track.key_signatures)
+            conductor.tempos.extend(track.tempos)
+
+    if len(parts) == 0:
+        return parts
+
+    for track in parts:
+        track.time_signatures.extend(conductor.time_signatures)
+        track.key_signatures.extend(conductor.key_signatures)
+
+    parts[0].tempos.extend(conductor.tempos)
+
+    return parts
+
+
+def is_direct_conversion_supported(parts):
+    """
+    Checks whether the parts of a MIDI file encode the same without music21 as with it.
+
+    Parts that need voices are split by music21 in ways the direct conversion does not follow,
+    and a part needs its first time signature at the start to be measured the same way.
+
+    :param parts: The MidiTrack instances of the parts, as returned by read_midi_tracks.
+    :return: True if the parts can be encoded directly.
+    """
+
+    if len(parts) == 0:
+        return False
+
+    for track in parts:
+        if track.needs_voices:
+            return False
+
+        if len(track.time_signatures) > 0 and min(offset for offset, value in track.time_signatures) != 0:
+            return False
+
+    return True
+
+
+def build_midi_vmf_header(parts, tick_value, tick_grid=None):
+    """
+    Builds the header of the VMF encoding of the parts of a MIDI file.
+    The header is the same as build_vmf_header gives for the imported score.
+
+    :param parts: The MidiTrack instances of the parts.
+    :param tick_value: The tick value, as a fraction of a quarter note.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :return: A dictionary containing the VMF header.
+    """
+
+    header = {}
+
+    header['tick_value'] = str(to_exact_quarter_length(tick_value))
+    header['number_of_voices'] = len(parts)
+    header['number_of_parts'] = len(parts)
+
+    # Parts without a time signature are measured in common time.
+    time_signatures = [track.time_signatures or [(Fraction(0), DEFAULT_TIME_SIGNATURE)] for track in parts]
+
+    for name, events in (('time_signature', time_signatures),
+                         ('key_signature', [track.key_signatures for track in parts]),
+                         ('tempo', [track.tempos for track in parts])):
+        # The events are ordered by offset across the parts, and the last one at an offset wins.
+        header[name] = {}
+
+        for offset, value in sorted((event for part_events in events for event in part_events),
+                                    key=lambda event: event[0]):
+            header[name][str(float(offset))] = value
+
+    if tick_grid is not None and not tick_grid.is_uniform:
+        header['tick_values'] = tick_grid.to_dict()
+
+    return header
+
+
+def iter_track_elements(track):
+    """
+    Yields the elements of a track in the form iter_element_runs takes.
+
+    :param track: The MidiTrack to encode.
+    :return: A generator over (quarter length, velocity, pitches, tied) tuples.
+    """
+
+    for element in track.elements:
+        if element.pitches is None:
+            yield element.quarter_length, None, None, False
+        else:
+            yield (element.quarter_length, element.velocity,
+                   [(pitch % 12, pitch // 12 - 1) for pitch in element.pitches], False)
+
+
+def iter_track_runs(track, largest_chord, part_id, tick_grid, number_of_ticks=None):
+    """
+    Yields the runs of ticks encoding a track.
+
+    :param track: The MidiTrack to encode.
+    :param largest_chord: The size of the largest chord of the file.
+    :param part_id: The vmf part id of the track.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body, or None to end with the track.
+    :return: A generator over the runs of ticks of the track, as iter_element_runs yields them.
+    """
+
+    return vmf_converter_core.iter_element_runs(iter_track_elements(track), largest_chord, part_id, tick_grid,
+                                                number_of_ticks=number_of_ticks)
+
+
+def encode_midi_file(path, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK, max_ticks=None,
+                     max_bytes=None, coarsen=False):
+    """
+    Reads a MIDI file and sets up the lazy encoding of its body, without building a music21 score.
+
+    The result is the same as encoding the score music21 parses from the file. Files with
+    tracks that music21 splits into voices are parsed and encoded through music21 instead.
+
+    :param path: The path of the MIDI file.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a file over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    :return: A tuple of the header dictionary and a generator over the rows of the body,
+    or over its voices in the voice layout.
+    """
+
+    if body_encoding not in (BODY_ENCODING_PLAIN, BODY_ENCODING_RLE):
+        raise ValueError("Body encoding is not supported")
+
+    if body_layout not in (BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE):
+        raise ValueError("Body layout is not supported")
+
+    parts = read_midi_tracks(path)
+
+    if not is_direct_conversion_supported(parts):
+        return vmf_converter_core.encode_score(converter.parse(path), body_encoding, body_layout,
+                                               max_ticks=max_ticks, max_bytes=max_bytes, coarsen=coarsen)
+
+    values = []
+    largest_chord = 1
+
+    for track in parts:
+        for element in track.elements:
+            values.append(element.offset)
+            values.append(element.quarter_length)
+
+            if element.pitches is not None:
+                largest_chord = max(len(element.pitches), largest_chord)
+
+    tick_value = vmf_converter_core.fraction_gcd(values)
+
+    # A file without any durations only needs whole quarter notes.
+    if tick_value == 0:
+        tick_value = Fraction(1)
+
+    tick_grid = TickGrid.uniform(tick_value)
+    header = build_midi_vmf_header(parts, tick_value)
+
+    # The elements of a part are laid out one after the other.
+    extent = ([sum(element.quarter_length for element in track.elements) for track in parts],
+              sum(len(track.elements) for track in parts))
+
+    if max_ticks is not None or max_bytes is not None:
+        tick_grid = vmf_converter_core.fit_tick_grid(extent, tick_grid, tick_value, largest_chord, header,
+                                                     body_encoding, max_ticks, max_bytes, coarsen)
+        header = build_midi_vmf_header(parts, tick_grid.tick_values[0], tick_grid)
+
+    if body_encoding == BODY_ENCODING_RLE:
+        header['body_encoding'] = BODY_ENCODING_RLE
+
+    # Every voice runs to the end of the longest one.
+    number_of_ticks = vmf_converter_core.count_body_ticks(extent[0], tick_grid)
+
+    if body_layout == BODY_LAYOUT_VOICE:
+        header['body_layout'] = BODY_LAYOUT_VOICE
+
+        return header, _iter_midi_voices(parts, largest_chord, body_encoding, tick_grid, number_of_ticks)
+
+    body = _iter_midi_body(parts, largest_chord, tick_grid, number_of_ticks)
+
+    if body_encoding == BODY_ENCODING_RLE:
+        body = vmf_converter_core.iter_run_length_encoded_body(body)
+
+    return header, body
+
+
+def _iter_midi_body(parts, largest_chord, tick_grid, number_of_ticks):
+    """
+    Encodes the body of the parts of a MIDI file one row at a time, as iter_vmf_body does.
+
+    :param parts: The MidiTrack instances of the parts.
+    :param largest_chord: The size of the largest chord of the file.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body.
+    :return: A generator over the rows of the body, each a list with one tick per voice.
+    """
+
+    voices = [vmf_converter_core.iter_run_ticks(iter_track_runs(track, largest_chord, part_id, tick_grid,
+                                                                number_of_ticks))
+              for part_id, track in enumerate(parts)]
+
+    for tick in zip(*voices):
+        yield list(tick)
+
+
+def _iter_midi_voices(parts, largest_chord, body_encoding, tick_grid, number_of_ticks):
+    """
+    Encodes the body of the parts of a MIDI file in the voice layout, as iter_vmf_voices does.
+
+    :param parts: The MidiTrack instances of the parts.
+    :param largest_chord: The size of the largest chord of the file.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body.
+    :return: A generator over the voices of the body, each a list of its ticks or runs.
+    """
+
+    for part_id, track in enumerate(parts):
+        runs = iter_track_runs(track, largest_chord, part_id, tick_grid, number_of_ticks)
+
+        if body_encoding == BODY_ENCODING_RLE:
+            yield list(vmf_converter_core.iter_run_length_encoded_runs(runs))
+        else:
+            yield list(vmf_converter_core.iter_run_ticks(runs))
+
+
+def convert_midi_file_to_vmf(path, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK, max_ticks=None,
+                             max_bytes=None, coarsen=False):
+    """
+    Converts a MIDI file to VMF without building a music21 score.
+
+    :param path: The path of the MIDI file.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a file over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    :return: A dictionary containing the VMF data structure, the same as convert_score_to_vmf
+    gives for the score music21 parses from the file.
+    """
+
+    header, body = encode_midi_file(path, body_encoding, body_layout, max_ticks, max_bytes, coarsen)
+
+    return {u'header': header, u'body': list(body)}
+
+
+def write_midi_file_as_vmf(path, file, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK,
+                           max_ticks=None, max_bytes=None, coarsen=False):
+    """
+    Converts a MIDI file to VMF without building a music21 score, and streams it to a file object.
+
+    :param path: The path of the MIDI file.
+    :param file: A text file object to write to.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a file over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    """
+
+    header, body = encode_midi_file(path, body_encoding, body_layout, max_ticks, max_bytes, coarsen)
+
+    vmf_converter_core.dump_vmf(header, body, file)
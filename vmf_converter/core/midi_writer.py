@@ -0,0 +1,274 @@
+"""Direct rendering of VMF data to Standard MIDI Files, without building a music21 score."""
+import struct
+
+from vmf_converter.core.dynamic_converter import DynamicConverter
+from vmf_converter.core.tick_grid import TickGrid, lcm
+from vmf_converter.core.vmf_document import VMFDocument
+from vmf_converter.core.vmf_header import VMFHeader
+
+# The resolution of the MIDI files, raised to a multiple of the tick values when they do not divide it.
+TICKS_PER_QUARTER = 480
+# The largest resolution a MIDI header can hold.
+MAX_TICKS_PER_QUARTER = 0x7FFF
+# The MIDI channels of the parts, in order. Channel 10 is left out, since it is reserved for percussion.
+CHANNELS = tuple(channel for channel in range(16) if channel != 9)
+# The microseconds in a minute, for tempo events.
+MICROSECONDS_PER_MINUTE = 60000000
+# The most sharps or flats a MIDI key signature can hold.
+MAX_KEY_SIGNATURE_SHARPS = 7
+# The longest quarter note a MIDI tempo can hold, in microseconds.
+MAX_MICROSECONDS_PER_QUARTER = 0xFFFFFF
+
+# Status bytes of the channel messages, before the channel is added.
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+# Type bytes of the meta events.
+META_EVENT = 0xFF
+SET_TEMPO = 0x51
+TIME_SIGNATURE = 0x58
+KEY_SIGNATURE = 0x59
+END_OF_TRACK = 0x2F
+
+# Events at the same MIDI time are written in this order, so a repeated note is released before it sounds again.
+_ORDER_META = 0
+_ORDER_NOTE_OFF = 1
+_ORDER_NOTE_ON = 2
+
+
+def encode_variable_length(value):
+    """
+    Encodes an integer as a MIDI variable length quantity.
+
+    :param value: The non-negative integer to encode.
+    :return: The encoded bytes.
+    """
+
+    encoded = bytearray([value & 0x7F])
+    value >>= 7
+
+    while value > 0:
+        encoded.insert(0, 0x80 | (value & 0x7F))
+        value >>= 7
+
+    return bytes(encoded)
+
+
+def find_ticks_per_quarter(tick_grid):
+    """
+    Finds the resolution of the MIDI file of VMF data, on which every tick starts on a whole MIDI tick.
+
+    :param tick_grid: The TickGrid of the VMF body.
+    :return: The number of MIDI ticks per quarter note.
+    """
+
+    ticks_per_quarter = TICKS_PER_QUARTER
+
+    for offset, tick_value in zip(tick_grid.offsets, tick_grid.tick_values):
+        for value in (offset, tick_value):
+            ticks_per_quarter = lcm(ticks_per_quarter, value.denominator)
+
+    if ticks_per_quarter > MAX_TICKS_PER_QUARTER:
+        raise ValueError("Tick value is too fine for a MIDI file")
+
+    return ticks_per_quarter
+
+
+def build_conductor_events(header, ticks_per_quarter):
+    """
+    Builds the meta events of the time signatures, key signatures and tempos of VMF data.
+
+    Meta events a MIDI file cannot hold are left out, as some parsed files carry them: time
+    signatures whose denominator is not a power of two, key signatures with more than seven
+    sharps or flats, and tempos that are not positive or too slow.
+
+    :param header: The VMFHeader of the data.
+    :param ticks_per_quarter: The number of MIDI ticks per quarter note.
+    :return: A list of (MIDI time, order, event bytes) tuples.
+    """
+
+    events = []
+
+    for offset, ratio_string in header.time_signature.items():
+        numerator, denominator = (int(value) for value in ratio_string.split('/'))
+
+        # The denominator is written as a power of two.
+        if not 0 < numerator < 256 or denominator <= 0 or denominator & (denominator - 1) != 0:
+            continue
+
+        # The metronome clicks every quarter note.
+        data = bytes([numerator, denominator.bit_length() - 1, 24, 8])
+        events.append((_to_midi_time(offset, ticks_per_quarter), _ORDER_META, _meta_event(TIME_SIGNATURE, data)))
+
+    for offset, sharps in header.key_signature.items():
+        if not -MAX_KEY_SIGNATURE_SHARPS <= sharps <= MAX_KEY_SIGNATURE_SHARPS:
+            continue
+
+        data = struct.pack('>bB', sharps, 0)
+        events.append((_to_midi_time(offset, ticks_per_quarter), _ORDER_META, _meta_event(KEY_SIGNATURE, data)))
+
+    for offset, bpm in header.tempo.items():
+        if bpm <= 0 or MICROSECONDS_PER_MINUTE / bpm > MAX_MICROSECONDS_PER_QUARTER:
+            continue
+
+        data = struct.pack('>I', int(round(MICROSECONDS_PER_MINUTE / bpm)))[1:]
+        events.append((_to_midi_time(offset, ticks_per_quarter), _ORDER_META, _meta_event(SET_TEMPO, data)))
+
+    return events
+
+
+def iter_voice_notes(ticks):
+    """
+    Walks the ticks of a voice and yields its notes, chords included, with their spans in ticks.
+
+    An onset starts a new note. A sustain continues it, or starts it when the voice starts
+    in the middle of a note. A rest ends it.
+
+    :param ticks: An iterable over the ticks of the voice.
+    :return: A generator over (first tick, stop tick, MIDI pitches, dynamic) tuples.
+    """
+
+    current = None
+    tick_number = 0
+
+    for tick_number, tick in enumerate(ticks):
+        if tick[0] == 2 and current is not None:
+            continue
+
+        if current is not None:
+            yield current[0], tick_number, current[1], current[2]
+            current = None
+
+        if tick[0] != 0:
+            # The pitches are the (pitch class, octave) pairs before the padding, which is -1.
+            pitches = [12 * (tick[i + 1] + 1) + tick[i] for i in range(3, len(tick) - 1, 2) if tick[i] != -1]
+            current = (tick_number, pitches, tick[1])
+
+    if current is not None:
+        yield current[0], tick_number + 1, current[1], current[2]
+
+
+def build_part_events(voices, tick_grid, ticks_per_quarter, channel):
+    """
+    Builds the note events of the voices of a part.
+
+    :param voices: The voices of the part, each an iterable over its ticks.
+    :param tick_grid: The TickGrid of the VMF body.
+    :param ticks_per_quarter: The number of MIDI ticks per quarter note.
+    :param channel: The MIDI channel of the part, from 0 to 15.
+    :return: A list of (MIDI time, order, event bytes) tuples.
+    """
+
+    events = []
+
+    for voice in voices:
+        for first_tick, stop_tick, pitches, dynamic in iter_voice_notes(voice):
+            velocity = DynamicConverter.vmf_to_velocity(dynamic)
+            start = _to_midi_time(tick_grid.offset(first_tick), ticks_per_quarter)
+            stop = _to_midi_time(tick_grid.offset(stop_tick), ticks_per_quarter)
+
+            for pitch in pitches:
+                events.append((start, _ORDER_NOTE_ON, bytes([NOTE_ON | channel, pitch, velocity])))
+                events.append((stop, _ORDER_NOTE_OFF, bytes([NOTE_OFF | channel, pitch, 0])))
+
+    return events
+
+
+def build_track_chunk(events):
+    """
+    Builds an MTrk chunk from the events of a track, in order of time.
+
+    :param events: A list of (MIDI time, order, event bytes) tuples, in any order.
+    :return: The bytes of the chunk.
+    """
+
+    data = bytearray()
+    time = 0
+
+    # The sort is stable, so the events of a chord stay in pitch order.
+    for event_time, order, event in sorted(events, key=lambda event: (event[0], event[1])):
+        data += encode_variable_length(event_time - time)
+        data += event
+        time = event_time
+
+    data += encode_variable_length(0)
+    data += _meta_event(END_OF_TRACK, b'')
+
+    return b'MTrk' + struct.pack('>I', len(data)) + bytes(data)
+
+
+def convert_document_to_midi(document):
+    """
+    Renders a VMF document to a format 1 Standard MIDI File.
+
+    The first track holds the time signatures, key signatures and tempos of the header. Each
+    part follows on a track of its own, on its own channel, with the notes of all its voices.
+    Velocities are decoded from the dynamics. Articulations are not rendered.
+
+    The ticks are read through the views of the document, so its body is never copied whole.
+
+    :param document: The VMFDocument to render. A range of ticks starts at MIDI time 0.
+    :return: The bytes of the MIDI file.
+    """
+
+    # The offsets of the header of a range of ticks are counted from its first tick.
+    header = document.plain_header()
+
+    tick_grid = TickGrid.from_header(header)
+    ticks_per_quarter = find_ticks_per_quarter(tick_grid)
+
+    tracks = [build_track_chunk(build_conductor_events(VMFHeader.from_dict(header), ticks_per_quarter))]
+
+    for part_number, part in enumerate(document.parts()):
+        channel = CHANNELS[part_number % len(CHANNELS)]
+
+        tracks.append(build_track_chunk(build_part_events(part.voices(), tick_grid, ticks_per_quarter, channel)))
+
+    header_chunk = b'MThd' + struct.pack('>IHHH', 6, 1, len(tracks), ticks_per_quarter)
+
+    return header_chunk + b''.join(tracks)
+
+
+def convert_vmf_to_midi(vmf):
+    """
+    Renders VMF data to a Standard MIDI File, without building a music21 score.
+
+    :param vmf: A dictionary with the header and body of the VMF data, in any encoding and layout.
+    :return: The bytes of the MIDI file.
+    """
+
+    return convert_document_to_midi(VMFDocument.from_dict(vmf))
+
+
+def write_vmf_as_midi(vmf, file):
+    """
+    Renders VMF data to a Standard MIDI File and writes it to a file object.
+
+    :param vmf: A dictionary with the header and body of the VMF data, in any encoding and layout.
+    :param file: A binary file object to write to.
+    """
+
+    file.write(convert_vmf_to_midi(vmf))
+
+
+def _to_midi_time(offset, ticks_per_quarter):
+    """
+    Converts an offset to a MIDI time.
+
+    :param offset: The offset, in quarter lengths.
+    :param ticks_per_quarter: The number of MIDI ticks per quarter note.
+    :return: The MIDI time, in ticks.
+    """
+
+    return int(round(offset * ticks_per_quarter))
+
+
+def _meta_event(meta_type, data):
+    """
+    Builds a meta event.
+
+    :param meta_type: The type byte of the event.
+    :param data: The data bytes of the event.
+    :return: The bytes of the event.
+    """
+
+    return bytes([META_EVENT, meta_type]) + encode_variable_length(len(data)) + data
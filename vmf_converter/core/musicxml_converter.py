@@ -0,0 +1,991 @@
+"""Streaming conversion of MusicXML files to VMF, without building a music21 score."""
+import xml.etree.ElementTree as ElementTree
+from fractions import Fraction
+
+from music21 import common, converter, duration, tempo
+from music21.musicxml import fromMxObjects
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.tick_grid import TickGrid, to_exact_quarter_length
+from vmf_converter.core.vmf_header import BODY_ENCODING_PLAIN, BODY_ENCODING_RLE, BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE
+
+# The pitch classes of the note names.
+STEP_PITCH_CLASSES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+# The alterations of the accidentals music21 reads. An accidental takes precedence over the alter of its pitch.
+ACCIDENTAL_ALTERS = {'natural': 0, 'sharp': 1, 'flat': -1, 'double-sharp': 2, 'sharp-sharp': 2, 'flat-flat': -2,
+                     'triple-sharp': 3, 'triple-flat': -3}
+# The time signature music21 measures a part with until it finds one.
+DEFAULT_TIME_SIGNATURE = '4/4'
+
+
+class _UnsupportedFeature(Exception):
+    """
+    Raised while reading a MusicXML file that music21 imports in ways the direct conversion does not follow.
+    """
+
+
+class MusicXMLElement:
+    """
+    A note, chord or rest of a MusicXML measure, as music21 imports it.
+    """
+
+    __slots__ = ('offset', 'quarter_length', 'pitches', 'tied')
+
+    def __init__(self, offset, quarter_length, pitches=None, tied=False):
+        """
+        :param offset: The offset of the element in its measure, in quarter lengths.
+        :param quarter_length: The duration of the element, in quarter lengths.
+        :param pitches: The (pitch class, octave) pairs of the element, or None for a rest.
+        :param tied: Whether a tie starts at the element.
+        """
+
+        self.offset = offset
+        self.quarter_length = quarter_length
+        self.pitches = pitches
+        self.tied = tied
+
+
+class MusicXMLMeasure:
+    """
+    A measure of a MusicXML part, as music21 imports it.
+    """
+
+    __slots__ = ('number', 'offset', 'padding', 'voices', 'has_voices', 'time_signature', 'key_signature', 'tempos')
+
+    def __init__(self, number, offset, padding, voices, has_voices, time_signature=None, key_signature=None,
+                 tempos=None):
+        """
+        :param number: The measure number.
+        :param offset: The offset of the measure in its part, in quarter lengths.
+        :param padding: The pickup padding of the measure, 0 when it has none.
+        :param voices: The elements of each voice of the measure, ordered by offset. A measure
+        without voices holds all its elements as a single voice.
+        :param has_voices: Whether the measure has voices, so that music21 splits it between parts.
+        :param time_signature: The ratio string of the time signature of the measure, or None.
+        :param key_signature: The sharps of the key signature of the measure, or None.
+        :param tempos: The (offset in the measure, quarter note BPM) pairs of the tempos of the measure.
+        """
+
+        self.number = number
+        self.offset = offset
+        self.padding = padding
+        self.voices = voices
+        self.has_voices = has_voices
+        self.time_signature = time_signature
+        self.key_signature = key_signature
+        self.tempos = tempos or []
+
+
+class MusicXMLPart:
+    """
+    The measures of a MusicXML part, as music21 imports it.
+    """
+
+    def __init__(self, name=None):
+        """
+        :param name: The music21 id of the part, its best name, or None when it has no name.
+        """
+
+        self.name = name
+        self.measures = []
+
+    @property
+    def has_voices(self):
+        """
+        Whether any measure of the part has voices, so that music21 splits the part into one part per voice.
+        """
+
+        return any(measure.has_voices for measure in self.measures)
+
+    @property
+    def number_of_voices(self):
+        """
+        The number of parts music21 splits the part into.
+        """
+
+        return max(len(measure.voices) if measure.has_voices else 1 for measure in self.measures)
+
+
+class _PartReader:
+    """
+    Reads the measures of a MusicXML part one at a time, following music21's mxToStreamPart and mxToMeasure.
+    """
+
+    def __init__(self, part):
+        """
+        :param part: The MusicXMLPart to add the measures to.
+        """
+
+        self.part = part
+        # The divisions of the quarter note, carried over from measure to measure.
+        self.divisions = None
+        # The offset of the next measure.
+        self.offset = Fraction(0)
+        self.last_measure_number = 0
+        self.last_measure_was_short = False
+        # The ratio string of the last time signature, and the ones found so far.
+        self.time_signature = None
+        self.time_signatures = set()
+
+    def read_measure(self, measure_element):
+        """
+        Reads a measure element and adds it to the part.
+
+        :param measure_element: The ElementTree element of the measure.
+        """
+
+        children = list(measure_element)
+
+        time_signature, key_signature = self._read_attributes(children)
+
+        if self.divisions is None:
+            raise _UnsupportedFeature("A measure has no divisions")
+
+        voice_ids = sorted({child.findtext('voice').strip() for child in children
+                            if child.tag == 'note' and child.find('voice') is not None})
+        has_voices = len(voice_ids) > 1
+        voices = {voice_id: [] for voice_id in voice_ids}
+        elements = []
+        tempos = []
+
+        # The end of the directions, which count towards the length of the measure.
+        highest_time = Fraction(0)
+        offset = Fraction(0)
+        rest_count = 0
+        note_count = 0
+        chord_notes = []
+
+        for i, child in enumerate(children):
+            if child.tag == 'backup':
+                offset -= self._read_duration(child)
+            elif child.tag == 'forward':
+                offset += self._read_duration(child)
+            elif child.tag == 'direction':
+                highest_time = max(self._read_direction(child, offset, tempos), highest_time)
+            elif child.tag == 'harmony':
+                raise _UnsupportedFeature("Chord symbols are imported as chords")
+            elif child.tag == 'note':
+                in_chord = child.find('chord') is not None
+                next_in_chord = (i + 1 < len(children) and children[i + 1].tag == 'note' and
+                                 children[i + 1].find('chord') is not None)
+
+                # A chord is only read the same way when its notes follow each other.
+                if in_chord and (i == 0 or children[i - 1].tag != 'note'):
+                    raise _UnsupportedFeature("A chord is interrupted")
+
+                if child.get('print-object') == 'no':
+                    if in_chord or next_in_chord:
+                        raise _UnsupportedFeature("A chord has a hidden note")
+
+                    continue
+
+                for tag in ('grace', 'cue', 'unpitched'):
+                    if child.find(tag) is not None:
+                        raise _UnsupportedFeature("A note is a " + tag + " note")
+
+                if offset < 0:
+                    raise _UnsupportedFeature("A note starts before its measure")
+
+                if child.find('rest') is not None:
+                    if in_chord or next_in_chord:
+                        raise _UnsupportedFeature("A chord has a rest")
+
+                    rest_count += 1
+                    element = MusicXMLElement(offset, self._read_note_duration(child))
+                elif in_chord or next_in_chord:
+                    chord_notes.append(child)
+
+                    if next_in_chord:
+                        continue
+
+                    # The chord takes the duration of its first note and the first tie of its notes.
+                    ties = [_read_tie(chord_note) for chord_note in chord_notes]
+                    tie = next((tie for tie in ties if tie is not None), None)
+
+                    element = MusicXMLElement(offset, self._read_note_duration(chord_notes[0]),
+                                              [_read_pitch(chord_note) for chord_note in chord_notes],
+                                              tie == 'start')
+                    chord_notes = []
+                else:
+                    note_count += 1
+                    element = MusicXMLElement(offset, self._read_note_duration(child), [_read_pitch(child)],
+                                              _read_tie(child) == 'start')
+
+                if element.quarter_length <= 0:
+                    raise _UnsupportedFeature("A note has no duration")
+
+                if has_voices:
+                    voice_id = child.findtext('voice')
+
+                    if voice_id is None:
+                        raise _UnsupportedFeature("A note of a measure with voices has no voice")
+
+                    voices[voice_id.strip()].append(element)
+                else:
+                    elements.append(element)
+
+                offset += element.quarter_length
+
+        if has_voices:
+            voices = [_sort_elements(voices[voice_id]) for voice_id in voice_ids]
+
+            if not any(voices):
+                raise _UnsupportedFeature("A measure with voices has no notes")
+
+            # Each voice starts with a rest up to its first element, as makeRests gives.
+            for voice in voices:
+                if len(voice) > 0 and voice[0].offset > 0:
+                    voice.insert(0, MusicXMLElement(Fraction(0), voice[0].offset))
+        else:
+            voices = [_sort_elements(elements)]
+
+        self._add_measure(measure_element, voices, has_voices, highest_time, time_signature, key_signature, tempos,
+                          rest_count == 1 and note_count == 0 and not has_voices)
+
+    def _add_measure(self, measure_element, voices, has_voices, highest_time, time_signature, key_signature, tempos,
+                     full_measure_rest):
+        """
+        Places a read measure in the part, with music21's rules for pickups and short measures.
+
+        :param measure_element: The ElementTree element of the measure.
+        :param voices: The elements of each voice of the measure.
+        :param has_voices: Whether the measure has voices.
+        :param highest_time: The end of the directions of the measure.
+        :param time_signature: The ratio string of the time signature of the measure, or None.
+        :param key_signature: The sharps of the key signature of the measure, or None.
+        :param tempos: The (offset, quarter note BPM) pairs of the tempos of the measure.
+        :param full_measure_rest: Whether the measure holds a single rest and no notes.
+        """
+
+        number = _read_measure_number(measure_element.get('number'), self.last_measure_number)
+
+        if number != self.last_measure_number:
+            self.last_measure_number = number
+
+        if time_signature is not None:
+            self.time_signature = time_signature
+            self.time_signatures.add(time_signature)
+        elif self.time_signature is None:
+            self.time_signature = DEFAULT_TIME_SIGNATURE
+
+        bar_length = _bar_quarter_length(self.time_signature)
+
+        # A whole rest alone in a measure fills the bar.
+        if full_measure_rest:
+            rest = next(element for element in voices[0] if element.pitches is None)
+
+            if rest.quarter_length == 4 and rest.quarter_length != bar_length:
+                rest.quarter_length = bar_length
+
+        for voice in voices:
+            for element in voice:
+                highest_time = max(element.offset + element.quarter_length, highest_time)
+
+        padding = Fraction(0)
+
+        if highest_time >= bar_length:
+            shift = highest_time
+        elif highest_time == 0 and not any(voices):
+            voices[0].append(MusicXMLElement(Fraction(0), bar_length))
+            shift = bar_length
+        elif self.offset == 0:
+            # The first measure is measured by its own time signature.
+            if time_signature is None:
+                raise _UnsupportedFeature("A short first measure has no time signature")
+
+            padding = bar_length - highest_time
+            shift = highest_time
+        else:
+            shift = highest_time
+
+            if self.last_measure_was_short:
+                if time_signature is None and len(self.time_signatures) != 1:
+                    raise _UnsupportedFeature("A short measure has an ambiguous time signature")
+
+                measure_bar_length = _bar_quarter_length(time_signature or self.time_signature)
+
+                # A short measure after another one is a pickup.
+                if highest_time < measure_bar_length:
+                    padding = measure_bar_length - highest_time
+                    self.last_measure_was_short = False
+            else:
+                self.last_measure_was_short = True
+
+        self.part.measures.append(MusicXMLMeasure(number, self.offset, padding, voices, has_voices, time_signature,
+                                                  key_signature, tempos))
+
+        self.offset += shift
+
+    def _read_attributes(self, children):
+        """
+        Reads the divisions, time signature and key signature of a measure.
+
+        :param children: The child elements of the measure.
+        :return: A tuple of the ratio string of the time signature and the sharps of the key
+        signature of the measure, each None when the measure has none.
+        """
+
+        time_signature = None
+        key_signature = None
+
+        for i, attributes in enumerate(child for child in children if child.tag == 'attributes'):
+            tags = {attribute.tag for attribute in attributes}
+
+            # music21 merges the attributes of a measure, wherever they are.
+            if i > 0 and len(tags & {'divisions', 'time', 'key', 'staves'}) > 0:
+                raise _UnsupportedFeature("A measure has several attributes")
+
+            if int(attributes.findtext('staves', '1')) > 1:
+                raise _UnsupportedFeature("A part has several staves")
+
+            if attributes.find('divisions') is not None:
+                self.divisions = Fraction(attributes.findtext('divisions').strip())
+
+            times = attributes.findall('time')
+            keys = attributes.findall('key')
+
+            if len(times) > 1 or len(keys) > 1:
+                raise _UnsupportedFeature("A measure has several time or key signatures")
+
+            if len(times) == 1:
+                time_signature = _read_time_signature(times[0])
+
+            if len(keys) == 1:
+                key_signature = int(keys[0].findtext('fifths', '0'))
+
+        return time_signature, key_signature
+
+    def _read_duration(self, element):
+        """
+        Reads the duration of a note, backup or forward element, as it is written.
+
+        :param element: The ElementTree element.
+        :return: The duration in quarter lengths, as a Fraction.
+        """
+
+        duration_text = element.findtext('duration')
+
+        if duration_text is None:
+            raise _UnsupportedFeature("An element has no duration")
+
+        return Fraction(duration_text.strip()) / self.divisions
+
+    def _read_note_duration(self, note_element):
+        """
+        Reads the duration of a note or rest, the way mxToDuration does.
+        A note with a type takes the duration of its type, dots and tuplet instead of the written one.
+
+        :param note_element: The ElementTree element of the note.
+        :return: The duration in quarter lengths, as a Fraction.
+        """
+
+        written = self._read_duration(note_element)
+        note_type = note_element.findtext('type')
+
+        if note_type is None:
+            return _read_raw_quarter_length(float(written))
+
+        try:
+            quarter_length = Fraction(duration.typeToDuration[fromMxObjects.musicXMLTypeToType(note_type.strip())])
+        except fromMxObjects.FromMxObjectsException:
+            raise _UnsupportedFeature("A note has an unknown type")
+
+        dots = len(note_element.findall('dot'))
+        quarter_length *= Fraction(2 ** (dots + 1) - 1, 2 ** dots)
+
+        time_modification = note_element.find('time-modification')
+
+        if time_modification is not None:
+            quarter_length *= Fraction(int(time_modification.findtext('normal-notes')),
+                                       int(time_modification.findtext('actual-notes')))
+
+        return quarter_length
+
+    def _read_direction(self, direction_element, offset, tempos):
+        """
+        Reads a direction, and the tempo it marks.
+
+        :param direction_element: The ElementTree element of the direction.
+        :param offset: The offset of the direction in its measure.
+        :param tempos: The list of (offset, quarter note BPM) pairs to add the tempo to.
+        :return: The end of the objects music21 inserts for the direction in the measure.
+        """
+
+        highest_time = Fraction(0)
+        direction_offset = Fraction(0)
+
+        if direction_element.find('offset') is not None:
+            direction_offset = Fraction(direction_element.findtext('offset').strip()) / self.divisions
+
+        # Dynamics and words are shifted by the offset of the direction, the other marks are not.
+        if direction_element.find('direction-type/dynamics/*') is not None or \
+                direction_element.find('direction-type/words') is not None:
+            highest_time = max(offset + direction_offset, highest_time)
+
+        for tag in ('segno', 'coda', 'metronome'):
+            if direction_element.find('direction-type/' + tag) is not None:
+                highest_time = max(offset, highest_time)
+
+        metronome = direction_element.find('direction-type/metronome')
+
+        if metronome is not None:
+            tempos.append((offset, _read_tempo(metronome)))
+
+        return highest_time
+
+
+def _sort_elements(elements):
+    """
+    Orders the elements of a voice by offset, keeping the elements at the same offset in the order they were read.
+
+    :param elements: A list of MusicXMLElement instances.
+    :return: The sorted list.
+    """
+
+    return sorted(elements, key=lambda element: element.offset)
+
+
+def _read_measure_number(number_text, last_measure_number):
+    """
+    Reads the number of a measure, the way mxToMeasure does.
+
+    :param number_text: The number attribute of the measure, or None.
+    :param last_measure_number: The number of the previous measure.
+    :return: The measure number, 0 when it has none.
+    """
+
+    if number_text is None:
+        return 0
+
+    number, suffix = common.getNumFromStr(number_text)
+    number = int(number) if number not in (None, '') else 0
+
+    # Measures numbered with an X suffix continue the previous measure.
+    if suffix == 'X' and number != last_measure_number + 1:
+        return last_measure_number
+
+    return number
+
+
+def _read_time_signature(time_element):
+    """
+    Reads a time element.
+
+    :param time_element: The ElementTree element of the time signature.
+    :return: The ratio string of the time signature.
+    """
+
+    beats = [element.text.strip() for element in time_element.findall('beats') if element.text is not None]
+    beat_types = [element.text.strip() for element in time_element.findall('beat-type') if element.text is not None]
+
+    if len(beats) != 1 or len(beat_types) != 1 or not beats[0].isdigit() or not beat_types[0].isdigit():
+        raise _UnsupportedFeature("A time signature is not a single fraction")
+
+    return '%d/%d' % (int(beats[0]), int(beat_types[0]))
+
+
+def _bar_quarter_length(time_signature):
+    """
+    Finds the length of a bar of a time signature.
+
+    :param time_signature: The ratio string of the time signature.
+    :return: The length in quarter lengths, as a Fraction.
+    """
+
+    numerator, denominator = (int(value) for value in time_signature.split('/'))
+
+    return Fraction(4 * numerator, denominator)
+
+
+def _read_pitch(note_element):
+    """
+    Reads the pitch of a note, the way mxToPitch does.
+
+    :param note_element: The ElementTree element of the note.
+    :return: A (pitch class, octave) pair, with the octave as it is written.
+    """
+
+    pitch_element = note_element.find('pitch')
+    accidental = note_element.find('accidental')
+
+    if pitch_element is None:
+        raise _UnsupportedFeature("A note has no pitch")
+
+    try:
+        pitch_class = STEP_PITCH_CLASSES[pitch_element.findtext('step', '').strip()]
+
+        if accidental is not None:
+            alter = ACCIDENTAL_ALTERS[(accidental.text or '').strip()]
+        else:
+            alter = float(pitch_element.findtext('alter', '0'))
+    except KeyError:
+        raise _UnsupportedFeature("A note has an unknown step or accidental")
+
+    if alter != int(alter):
+        raise _UnsupportedFeature("A note is microtonal")
+
+    return (pitch_class + int(alter)) % 12, int(pitch_element.findtext('octave'))
+
+
+def _read_tie(note_element):
+    """
+    Reads the tie of a note, the way mxToTie does.
+
+    :param note_element: The ElementTree element of the note.
+    :return: The type of the tie, or None when the note has none.
+    """
+
+    types = [tie.get('type') for tie in note_element.findall('tie')]
+
+    if len(types) == 0:
+        return None
+
+    if len(types) == 1:
+        return types[0]
+
+    if types == ['stop', 'start']:
+        return 'continue'
+
+    # Other arrangements keep the type of a new tie.
+    return 'start'
+
+
+def _read_tempo(metronome_element):
+    """
+    Reads the tempo of a metronome mark, the way mxToTempoIndication does.
+
+    :param metronome_element: The ElementTree element of the metronome mark.
+    :return: The quarter note BPM.
+    """
+
+    beat_units = metronome_element.findall('beat-unit')
+    per_minute = metronome_element.findtext('per-minute', '').strip()
+
+    if len(beat_units) > 1 or per_minute == '':
+        raise _UnsupportedFeature("A metronome mark is not a tempo")
+
+    mark = tempo.MetronomeMark()
+    mark.number = float(per_minute)
+
+    if len(beat_units) == 1:
+        referent = duration.Duration(type=fromMxObjects.musicXMLTypeToType(beat_units[0].text.strip()))
+        referent.dots = len(metronome_element.findall('beat-unit-dot'))
+        mark.referent = referent
+
+    return mark.getQuarterBPM()
+
+
+# The durations of notes without a type, by their written duration.
+_raw_quarter_lengths = {}
+
+
+def _read_raw_quarter_length(quarter_length):
+    """
+    Finds the duration music21 gives a note without a type, from its written duration.
+
+    :param quarter_length: The written duration, as a float.
+    :return: The duration in quarter lengths, as a Fraction.
+    """
+
+    if quarter_length not in _raw_quarter_lengths:
+        raw = duration.Duration()
+        raw.quarterLength = quarter_length
+        cooked = duration.Duration()
+
+        try:
+            cooked.components = raw.components
+        except duration.DurationException:
+            # music21 falls back to a quarter note.
+            pass
+
+        _raw_quarter_lengths[quarter_length] = to_exact_quarter_length(cooked.quarterLength)
+
+    return _raw_quarter_lengths[quarter_length]
+
+
+def _read_part_name(score_part_element):
+    """
+    Finds the music21 id of a part, the best of its names.
+
+    :param score_part_element: The ElementTree element of the score part.
+    :return: The name, or None when the part has none.
+    """
+
+    for path in ('part-name', 'part-abbreviation', 'score-instrument/instrument-name',
+                 'score-instrument/instrument-abbreviation'):
+        element = score_part_element.find(path)
+
+        if element is not None:
+            return (element.text or '').strip().replace('\n', ' ')
+
+    return None
+
+
+def read_musicxml_parts(path):
+    """
+    Reads the parts of a partwise MusicXML file, as music21 imports them, one measure at a time.
+
+    Each measure is dropped from the parsed tree once it is read, so that only the notes,
+    chords and rests of the file are held in memory, without any music21 object.
+
+    :param path: The path of the MusicXML file.
+    :return: A list of MusicXMLPart instances in the order of the part list, or None when
+    the file uses a feature that music21 imports in ways the direct conversion does not follow.
+    """
+
+    names = {}
+    part_ids = []
+    parts = {}
+
+    root = None
+    part_element = None
+    reader = None
+
+    try:
+        for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+
+                    if root.tag != 'score-partwise':
+                        raise _UnsupportedFeature("The file is not a partwise score")
+
+                if element.tag == 'part' and part_element is None:
+                    part_element = element
+                    reader = _PartReader(MusicXMLPart())
+
+                continue
+
+            if element.tag == 'score-part':
+                part_ids.append(element.get('id'))
+                names[element.get('id')] = _read_part_name(element)
+            elif element.tag == 'measure' and part_element is not None:
+                reader.read_measure(element)
+                part_element.remove(element)
+            elif element is part_element:
+                parts[element.get('id')] = reader.part
+                root.remove(element)
+                part_element = None
+    except (ElementTree.ParseError, ValueError, _UnsupportedFeature):
+        # Malformed values are left to music21 to report.
+        return None
+
+    if any(part_id not in parts for part_id in part_ids):
+        return None
+
+    for part_id in part_ids:
+        parts[part_id].name = names[part_id]
+
+    return [parts[part_id] for part_id in part_ids]
+
+
+def is_direct_conversion_supported(parts):
+    """
+    Checks whether the parts of a MusicXML file encode the same without music21 as with it.
+
+    :param parts: The MusicXMLPart instances of the parts, as returned by read_musicxml_parts.
+    :return: True if the parts can be encoded directly.
+    """
+
+    return parts is not None and len(parts) > 0 and all(len(part.measures) > 0 for part in parts)
+
+
+def find_part_ids(parts):
+    """
+    Finds the vmf part ids of the parts of a MusicXML file, as convert_voices_to_parts assigns them.
+
+    Parts split into voices keep their own position. The other parts are looked up by name,
+    so parts with the same name share the id of the last of them.
+
+    :param parts: The MusicXMLPart instances of the parts.
+    :return: A list with the vmf part id of each part.
+    """
+
+    last_ids = {}
+
+    for part_id, part in enumerate(parts):
+        if part.name and not part.has_voices:
+            last_ids[part.name] = part_id
+
+    return [part_id if not part.name or part.has_voices else last_ids[part.name]
+            for part_id, part in enumerate(parts)]
+
+
+def iter_part_voices(part):
+    """
+    Walks the parts music21 splits a part into, one per voice.
+
+    The first voice holds the measures without voices. The others only hold the measures
+    with enough voices, laid out one after the other.
+
+    :param part: The MusicXMLPart to split.
+    :return: A generator over (padding, elements) pairs, with the pickup padding of each voice
+    or None, and the list of its MusicXMLElement instances.
+    """
+
+    for voice_number in range(part.number_of_voices):
+        padding = None
+        elements = []
+        first_measure = True
+
+        for measure in part.measures:
+            if measure.has_voices:
+                if voice_number >= len(measure.voices):
+                    continue
+            elif voice_number > 0:
+                continue
+
+            # The pickup of the voice is that of its first measure.
+            if first_measure and (measure.number == 0 or measure.padding > 0):
+                padding = measure.padding
+
+            first_measure = False
+            elements.extend(measure.voices[voice_number] if measure.has_voices else measure.voices[0])
+
+        yield padding, elements
+
+
+def build_musicxml_vmf_header(parts, tick_value, tick_grid=None):
+    """
+    Builds the header of the VMF encoding of the parts of a MusicXML file.
+    The header is the same as build_vmf_header gives for the imported score.
+
+    :param parts: The MusicXMLPart instances of the parts.
+    :param tick_value: The tick value, as a fraction of a quarter note.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :return: A dictionary containing the VMF header.
+    """
+
+    header = {}
+
+    header['tick_value'] = str(to_exact_quarter_length(tick_value))
+    header['number_of_voices'] = sum(part.number_of_voices for part in parts)
+    header['number_of_parts'] = len(parts)
+
+    events = {'time_signature': [], 'key_signature': [], 'tempo': []}
+
+    for part in parts:
+        for measure in part.measures:
+            if measure.time_signature is not None:
+                events['time_signature'].append((measure.offset, measure.time_signature))
+
+            if measure.key_signature is not None:
+                events['key_signature'].append((measure.offset, measure.key_signature))
+
+            # Splitting a measure into voices drops its tempos.
+            if not measure.has_voices:
+                events['tempo'].extend((measure.offset + offset, bpm) for offset, bpm in measure.tempos)
+
+    for name in ('time_signature', 'key_signature', 'tempo'):
+        # The events are ordered by offset across the parts, and the last one at an offset wins.
+        header[name] = {}
+
+        for offset, value in sorted(events[name], key=lambda event: event[0]):
+            header[name][str(float(offset))] = value
+
+    if tick_grid is not None and not tick_grid.is_uniform:
+        header['tick_values'] = tick_grid.to_dict()
+
+    return header
+
+
+def iter_voice_elements(elements):
+    """
+    Yields the elements of a voice in the form iter_element_runs takes.
+
+    :param elements: The MusicXMLElement instances of the voice.
+    :return: A generator over (quarter length, velocity, pitches, tied) tuples.
+    """
+
+    for element in elements:
+        # MusicXML notes have no velocity.
+        yield element.quarter_length, None, element.pitches, element.tied
+
+
+def encode_musicxml_file(path, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK, max_ticks=None,
+                         max_bytes=None, coarsen=False):
+    """
+    Reads a MusicXML file and sets up the lazy encoding of its body, without building a music21 score.
+
+    The result is the same as encoding the score music21 parses from the file. Files using
+    features the direct conversion does not follow, such as several staves per part, grace
+    notes or chord symbols, and compressed files are parsed and encoded through music21 instead.
+
+    :param path: The path of the MusicXML file.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a file over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    :return: A tuple of the header dictionary and a generator over the rows of the body,
+    or over its voices in the voice layout.
+    """
+
+    if body_encoding not in (BODY_ENCODING_PLAIN, BODY_ENCODING_RLE):
+        raise ValueError("Body encoding is not supported")
+
+    if body_layout not in (BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE):
+        raise ValueError("Body layout is not supported")
+
+    parts = read_musicxml_parts(path)
+
+    if not is_direct_conversion_supported(parts):
+        return vmf_converter_core.encode_score(converter.parse(path), body_encoding, body_layout,
+                                               max_ticks=max_ticks, max_bytes=max_bytes, coarsen=coarsen)
+
+    values = []
+    largest_chord = 1
+
+    for part in parts:
+        for measure in part.measures:
+            if measure.padding > 0:
+                values.append(measure.padding)
+
+            for voice in measure.voices:
+                for element in voice:
+                    values.append(measure.offset + element.offset)
+                    values.append(element.quarter_length)
+
+                    if element.pitches is not None:
+                        largest_chord = max(len(element.pitches), largest_chord)
+
+    tick_value = vmf_converter_core.fraction_gcd(values)
+
+    # A file without any durations only needs whole quarter notes.
+    if tick_value == 0:
+        tick_value = Fraction(1)
+
+    voices = []
+
+    for part_id, part in zip(find_part_ids(parts), parts):
+        voices.extend((part_id, padding, elements) for padding, elements in iter_part_voices(part))
+
+    tick_grid = TickGrid.uniform(tick_value)
+    header = build_musicxml_vmf_header(parts, tick_value)
+
+    # The elements of a voice are laid out one after the other, after its pickup padding.
+    extent = ([(padding or 0) + sum(element.quarter_length for element in elements)
+               for part_id, padding, elements in voices],
+              sum(len(elements) + (padding is not None) for part_id, padding, elements in voices))
+
+    if max_ticks is not None or max_bytes is not None:
+        tick_grid = vmf_converter_core.fit_tick_grid(extent, tick_grid, tick_value, largest_chord, header,
+                                                     body_encoding, max_ticks, max_bytes, coarsen)
+        header = build_musicxml_vmf_header(parts, tick_grid.tick_values[0], tick_grid)
+
+    if body_encoding == BODY_ENCODING_RLE:
+        header['body_encoding'] = BODY_ENCODING_RLE
+
+    # Every voice runs to the end of the longest one.
+    number_of_ticks = vmf_converter_core.count_body_ticks(extent[0], tick_grid)
+
+    if body_layout == BODY_LAYOUT_VOICE:
+        header['body_layout'] = BODY_LAYOUT_VOICE
+
+        return header, _iter_musicxml_voices(voices, largest_chord, body_encoding, tick_grid, number_of_ticks)
+
+    body = _iter_musicxml_body(voices, largest_chord, tick_grid, number_of_ticks)
+
+    if body_encoding == BODY_ENCODING_RLE:
+        body = vmf_converter_core.iter_run_length_encoded_body(body)
+
+    return header, body
+
+
+def _iter_voice_runs(voice, largest_chord, tick_grid, number_of_ticks):
+    """
+    Yields the runs of ticks encoding a voice.
+
+    :param voice: A (part id, padding, elements) tuple.
+    :param largest_chord: The size of the largest chord of the file.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body.
+    :return: A generator over the runs of ticks of the voice, as iter_element_runs yields them.
+    """
+
+    part_id, padding, elements = voice
+
+    return vmf_converter_core.iter_element_runs(iter_voice_elements(elements), largest_chord, part_id, tick_grid,
+                                                padding, number_of_ticks)
+
+
+def _iter_musicxml_body(voices, largest_chord, tick_grid, number_of_ticks):
+    """
+    Encodes the body of the voices of a MusicXML file one row at a time, as iter_vmf_body does.
+
+    :param voices: The (part id, padding, elements) tuples of the voices.
+    :param largest_chord: The size of the largest chord of the file.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body.
+    :return: A generator over the rows of the body, each a list with one tick per voice.
+    """
+
+    voice_ticks = [vmf_converter_core.iter_run_ticks(_iter_voice_runs(voice, largest_chord, tick_grid,
+                                                                      number_of_ticks))
+                   for voice in voices]
+
+    for tick in zip(*voice_ticks):
+        yield list(tick)
+
+
+def _iter_musicxml_voices(voices, largest_chord, body_encoding, tick_grid, number_of_ticks):
+    """
+    Encodes the body of the voices of a MusicXML file in the voice layout, as iter_vmf_voices does.
+
+    :param voices: The (part id, padding, elements) tuples of the voices.
+    :param largest_chord: The size of the largest chord of the file.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body.
+    :return: A generator over the voices of the body, each a list of its ticks or runs.
+    """
+
+    for voice in voices:
+        runs = _iter_voice_runs(voice, largest_chord, tick_grid, number_of_ticks)
+
+        if body_encoding == BODY_ENCODING_RLE:
+            yield list(vmf_converter_core.iter_run_length_encoded_runs(runs))
+        else:
+            yield list(vmf_converter_core.iter_run_ticks(runs))
+
+
+def convert_musicxml_file_to_vmf(path, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK,
+                                 max_ticks=None, max_bytes=None, coarsen=False):
+    """
+    Converts a MusicXML file to VMF without building a music21 score.
+
+    :param path: The path of the MusicXML file.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a file over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    :return: A dictionary containing the VMF data structure, the same as convert_score_to_vmf
+    gives for the score music21 parses from the file.
+    """
+
+    header, body = encode_musicxml_file(path, body_encoding, body_layout, max_ticks, max_bytes, coarsen)
+
+    return {u'header': header, u'body': list(body)}
+
+
+def write_musicxml_file_as_vmf(path, file, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK,
+                               max_ticks=None, max_bytes=None, coarsen=False):
+    """
+    Converts a MusicXML file to VMF without building a music21 score, and streams it to a file object.
+
+    :param path: The path of the MusicXML file.
+    :param file: A text file object to write to.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a file over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    """
+
+    header, body = encode_musicxml_file(path, body_encoding, body_layout, max_ticks, max_bytes, coarsen)
+
+    vmf_converter_core.dump_vmf(header, body, file)
@@ -0,0 +1,663 @@
+"""Streaming rendering of VMF data to MusicXML, measure by measure, without building a music21 score."""
+from fractions import Fraction
+import io
+
+from vmf_converter.core.dynamic_converter import DynamicConverter
+from vmf_converter.core.tick_grid import TickGrid, lcm
+from vmf_converter.core.vmf_document import VMFDocument
+
+# The declaration and document type of the written files.
+MUSICXML_PROLOG = ('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+                   '<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 3.0 Partwise//EN" '
+                   '"http://www.musicxml.org/dtds/partwise.dtd">\n')
+
+# The MusicXML note types, keyed by their quarter length.
+NOTE_TYPES = {
+    Fraction(8): 'breve',
+    Fraction(4): 'whole',
+    Fraction(2): 'half',
+    Fraction(1): 'quarter',
+    Fraction(1, 2): 'eighth',
+    Fraction(1, 4): '16th',
+    Fraction(1, 8): '32nd',
+    Fraction(1, 16): '64th',
+    Fraction(1, 32): '128th',
+    Fraction(1, 64): '256th',
+    Fraction(1, 128): '512th',
+    Fraction(1, 256): '1024th'
+}
+# The quarter lengths of the note types, longest first.
+NOTE_TYPE_LENGTHS = sorted(NOTE_TYPES, reverse=True)
+
+# The (step, alter) spelling of each pitch class, the same as music21 gives by default.
+DEFAULT_SPELLINGS = (('C', 0), ('C', 1), ('D', 0), ('E', -1), ('E', 0), ('F', 0),
+                     ('F', 1), ('G', 0), ('G', 1), ('A', 0), ('B', -1), ('B', 0))
+# The spellings of the pitch classes in keys with sharps.
+SHARP_SPELLINGS = (('C', 0), ('C', 1), ('D', 0), ('D', 1), ('E', 0), ('F', 0),
+                   ('F', 1), ('G', 0), ('G', 1), ('A', 0), ('A', 1), ('B', 0))
+# The spellings of the pitch classes in keys with flats.
+FLAT_SPELLINGS = (('C', 0), ('D', -1), ('D', 0), ('E', -1), ('E', 0), ('F', 0),
+                  ('G', -1), ('G', 0), ('A', -1), ('A', 0), ('B', -1), ('B', 0))
+# The index of each step in the octave, for the heights of the pitches.
+STEP_INDEXES = {'C': 0, 'D': 1, 'E': 2, 'F': 3, 'G': 4, 'A': 5, 'B': 6}
+
+# The MusicXML elements of the VMF articulations.
+ARTICULATION_ELEMENTS = {
+    3: 'staccato',
+    4: 'staccatissimo',
+    5: 'strong-accent',
+    6: 'accent',
+    7: 'tenuto'
+}
+
+# The (sign, line, octave change) of the clefs chosen from the average height of the pitches of a part.
+TREBLE_8VA_CLEF = ('G', 2, 1)
+TREBLE_CLEF = ('G', 2, 0)
+BASS_CLEF = ('F', 4, 0)
+BASS_8VB_CLEF = ('F', 4, -1)
+
+# The velocity MusicXML takes as 100 percent dynamics, a forte.
+FORTE_VELOCITY = 90
+
+
+def find_note_types(quarter_length):
+    """
+    Splits a duration into the note types that write it, tied together when there are several.
+
+    Durations that are not a sum of plain note types are written as tuplets. The actual number
+    of notes is the odd part of the denominator of the duration, played in the time of the
+    largest power of two below it.
+
+    :param quarter_length: The duration, as a Fraction of a quarter note.
+    :return: A list of (quarter length, type, dots, tuplet) tuples, with the type None for parts
+    shorter than a 1024th, and the tuplet an (actual notes, normal notes) pair or None.
+    """
+
+    actual_notes = quarter_length.denominator
+
+    while actual_notes % 2 == 0:
+        actual_notes //= 2
+
+    if actual_notes == 1:
+        tuplet = None
+        ratio = Fraction(1)
+    else:
+        normal_notes = 2 ** (actual_notes.bit_length() - 1)
+        tuplet = (actual_notes, normal_notes)
+        ratio = Fraction(normal_notes, actual_notes)
+
+    note_types = []
+    # The remaining duration, as written without the tuplet.
+    remaining = quarter_length / ratio
+
+    while remaining > 0:
+        length = next((length for length in NOTE_TYPE_LENGTHS if length <= remaining), None)
+
+        if length is None:
+            note_types.append((remaining * ratio, None, 0, tuplet))
+            break
+
+        # Each dot adds half of the previous value.
+        written = length
+        dots = 0
+        while dots < 2 and written + length / 2 ** (dots + 1) <= remaining:
+            dots += 1
+            written += length / 2 ** dots
+
+        note_types.append((written * ratio, NOTE_TYPES[length], dots, tuplet))
+        remaining -= written
+
+    return note_types
+
+
+def find_divisions(tick_grid, measures):
+    """
+    Finds the MusicXML divisions of VMF data, on which every tick and barline falls on a whole division.
+
+    :param tick_grid: The TickGrid of the VMF body.
+    :param measures: The measures of the data, as returned by iter_measures.
+    :return: The number of divisions per quarter note.
+    """
+
+    divisions = 1
+
+    values = [value for offset, tick_value in zip(tick_grid.offsets, tick_grid.tick_values)
+              for value in (offset, tick_value)]
+    values += [measure[2] for measure in measures]
+
+    for value in values:
+        denominator = Fraction(value).denominator
+        divisions = lcm(divisions, denominator)
+
+    return divisions
+
+
+def iter_measures(header, end):
+    """
+    Lays out the measures of VMF data from the time signatures of its header, in the same way as read_vmf.
+
+    :param header: The header dictionary of the data.
+    :param end: The offset of the end of the body, as a Fraction.
+    :return: A generator over (measure number, start offset, end offset, time signature) tuples,
+    with the time signature the ratio string of a new meter or None.
+    """
+
+    meters = sorted((Fraction(offset), ratio_string) for offset, ratio_string in header['time_signature'].items())
+
+    if len(meters) == 0 or meters[0][0] > 0:
+        raise ValueError("No time signature at the start of the VMF data")
+
+    number = find_first_measure_number(header)
+    start = Fraction(0)
+    meter_index = -1
+
+    while True:
+        # A measure starting after a time signature change takes the new time signature.
+        time_signature = None
+        while meter_index + 1 < len(meters) and meters[meter_index + 1][0] <= start:
+            meter_index += 1
+            time_signature = meters[meter_index][1]
+
+        measure_end = start + _bar_length(meters[meter_index][1])
+
+        yield number, start, measure_end, time_signature
+
+        if measure_end >= end:
+            break
+
+        number += 1
+        start = measure_end
+
+
+def find_first_measure_number(header):
+    """
+    Finds the number of the measure at the first tick of VMF data, from its measure index.
+
+    :param header: The header dictionary of the VMF data.
+    :return: The measure number, 1 when the header has no measure index.
+    """
+
+    for number, (offset, tick_number) in header.get('measure_index', {}).items():
+        if tick_number == 0:
+            return int(number)
+
+    return 1
+
+
+def iter_decoded_elements(ticks):
+    """
+    Walks the ticks of a voice and yields its notes, chords and rests, in the same way as read_vmf decodes them.
+
+    An onset starts a new note. A sustain continues the element in progress, or starts a note
+    tied to the part before the voice when it starts in the middle of a note. A rest ends a note.
+
+    :param ticks: An iterable over the ticks of the voice.
+    :return: A generator over (first tick, stop tick, tick, tied) tuples, with the tick the one
+    starting the note, or None for a rest, and tied True for a note tied to the part before the voice.
+    """
+
+    current = None
+    tick_number = -1
+
+    for tick_number, tick in enumerate(ticks):
+        if tick[0] == 1:
+            if current is not None:
+                yield current[0], tick_number, current[1], current[2]
+
+            current = (tick_number, tick, False)
+        elif current is None:
+            current = (tick_number, tick, True) if tick[0] == 2 else (tick_number, None, False)
+        elif tick[0] == 0 and current[1] is not None:
+            yield current[0], tick_number, current[1], current[2]
+
+            current = (tick_number, None, False)
+
+    if current is not None:
+        yield current[0], tick_number + 1, current[1], current[2]
+
+
+def find_clef(voices):
+    """
+    Chooses the clef of a part from the pitches of its voices, the same way as read_vmf does.
+
+    :param voices: The voices of the part, each an iterable over its ticks.
+    :return: The (sign, line, octave change) of the clef.
+    """
+
+    total_height = 0
+    number_of_pitches = 0
+
+    for voice in voices:
+        for first_tick, stop_tick, tick, tied in iter_decoded_elements(voice):
+            if tick is None:
+                continue
+
+            for pitch_class, octave in _tick_pitches(tick):
+                step = DEFAULT_SPELLINGS[pitch_class][0]
+                height = 7 * octave + STEP_INDEXES[step] + 1
+
+                if height > 33:
+                    height += 3
+                elif height < 24:
+                    height -= 3
+
+                total_height += height
+                number_of_pitches += 1
+
+    average_height = 29 if number_of_pitches == 0 else total_height / number_of_pitches
+
+    if average_height > 52:
+        return TREBLE_8VA_CLEF
+    elif average_height > 28:
+        return TREBLE_CLEF
+    elif average_height > 10:
+        return BASS_CLEF
+    else:
+        return BASS_8VB_CLEF
+
+
+class _VoiceCursor:
+    """
+    Splits the elements of a voice at the barlines, one measure at a time.
+
+    Only the element crossing the last barline is kept between measures, so the memory used does
+    not grow with the length of the voice.
+    """
+
+    def __init__(self, ticks, tick_grid):
+        """
+        :param ticks: An iterable over the ticks of the voice.
+        :param tick_grid: The TickGrid giving the offset of each tick.
+        """
+
+        self.elements = iter_decoded_elements(ticks)
+        self.tick_grid = tick_grid
+        # The part of the element in progress that is not written yet.
+        self.pending = None
+
+    def take(self, measure_end):
+        """
+        Takes the parts of the elements up to a barline.
+
+        :param measure_end: The offset of the barline.
+        :return: A list of (start offset, end offset, tick, tie stop, tie start, first) tuples, with
+        the tick None for a rest, and first True for the part an element starts with.
+        """
+
+        pieces = []
+
+        while True:
+            if self.pending is None:
+                element = next(self.elements, None)
+
+                if element is None:
+                    break
+
+                first_tick, stop_tick, tick, tied = element
+                self.pending = (self.tick_grid.offset(first_tick), self.tick_grid.offset(stop_tick), tick, tied, True)
+
+            start, end, tick, tie_stop, first = self.pending
+
+            if start >= measure_end:
+                break
+
+            if end > measure_end:
+                # Notes are tied over the barline. Rests are only split.
+                tied = tick is not None
+                pieces.append((start, measure_end, tick, tie_stop, tied, first))
+                self.pending = (measure_end, end, tick, tied, False)
+                break
+
+            pieces.append((start, end, tick, tie_stop, False, first))
+            self.pending = None
+
+        return pieces
+
+
+def build_measure(part_number, measure, pieces_of_voices, header, divisions, clef=None, last=False):
+    """
+    Builds a measure of a part.
+
+    :param part_number: The index of the part. The tempos are written in the first part only.
+    :param measure: The (measure number, start offset, end offset, time signature) of the measure.
+    :param pieces_of_voices: The pieces of each voice of the part in the measure, as taken by a _VoiceCursor.
+    :param header: The header dictionary of the VMF data.
+    :param divisions: The number of divisions per quarter note.
+    :param clef: The (sign, line, octave change) of the clef of the part in its first measure, or None.
+    :param last: Whether the measure is the last one, which ends with a final barline.
+    :return: The lines of the measure element.
+    """
+
+    number, start, end, time_signature = measure
+
+    lines = ['    <measure number="%d">' % number]
+
+    key_signature = None
+    for offset, sharps in header['key_signature'].items():
+        if start <= Fraction(offset) < end:
+            key_signature = sharps
+
+    lines += _build_attributes(divisions if clef is not None else None, key_signature, time_signature, clef)
+
+    if part_number == 0:
+        for offset, bpm in sorted((Fraction(offset), bpm) for offset, bpm in header['tempo'].items()):
+            if start <= offset < end:
+                lines += _build_tempo(bpm, int((offset - start) * divisions))
+
+    spellings = _find_spellings(_key_in_effect(header, end))
+    written = 0
+
+    for voice_number, pieces in enumerate(pieces_of_voices):
+        if written > 0:
+            lines += ['      <backup>', '        <duration>%d</duration>' % written, '      </backup>']
+
+        written = 0
+
+        for piece in pieces:
+            lines += _build_piece(piece, voice_number + 1, start, end, spellings, divisions)
+            written += int((piece[1] - piece[0]) * divisions)
+
+    if last:
+        lines += ['      <barline location="right">', '        <bar-style>light-heavy</bar-style>',
+                  '      </barline>']
+
+    lines.append('    </measure>')
+
+    return lines
+
+
+def write_document_as_musicxml(document, file):
+    """
+    Renders a VMF document to a MusicXML file, writing it one measure at a time.
+
+    Each part holds its voices as MusicXML voices. Measures follow the time signatures of the
+    header, and notes crossing a barline are split and tied. Note types, dots and tuplets are
+    derived from the lengths of the runs of ticks. Pitches are spelled with the accidentals of
+    the key signature in effect. Dynamics are written as the dynamics attribute of the notes.
+
+    Only one measure of each voice is held in memory at once, so long scores are written in
+    constant memory, apart from the header.
+
+    :param document: The VMFDocument to render. A range of ticks starts at its first measure.
+    :param file: A text file object to write to.
+    """
+
+    header = document.plain_header()
+
+    tick_grid = TickGrid.from_header(header)
+    measures = list(iter_measures(header, tick_grid.offset(len(document))))
+    divisions = find_divisions(tick_grid, measures)
+
+    parts = document.parts()
+
+    file.write(MUSICXML_PROLOG)
+    file.write('<score-partwise version="3.0">\n')
+    file.write('  <part-list>\n')
+
+    for part_number in range(len(parts)):
+        file.write('    <score-part id="P%d">\n' % (part_number + 1))
+        file.write('      <part-name>Part %d</part-name>\n' % (part_number + 1))
+        file.write('    </score-part>\n')
+
+    file.write('  </part-list>\n')
+
+    for part_number, part in enumerate(parts):
+        file.write('  <part id="P%d">\n' % (part_number + 1))
+
+        clef = find_clef(part.voices())
+        cursors = [_VoiceCursor(voice, tick_grid) for voice in part.voices()]
+
+        for measure_number, measure in enumerate(measures):
+            pieces_of_voices = [cursor.take(measure[2]) for cursor in cursors]
+
+            lines = build_measure(part_number, measure, pieces_of_voices, header, divisions,
+                                  clef if measure_number == 0 else None, measure_number == len(measures) - 1)
+
+            file.write('\n'.join(lines))
+            file.write('\n')
+
+        file.write('  </part>\n')
+
+    file.write('</score-partwise>\n')
+
+
+def convert_document_to_musicxml(document):
+    """
+    Renders a VMF document to a MusicXML file.
+
+    :param document: The VMFDocument to render.
+    :return: The contents of the MusicXML file as a string.
+    """
+
+    file = io.StringIO()
+
+    write_document_as_musicxml(document, file)
+
+    return file.getvalue()
+
+
+def convert_vmf_to_musicxml(vmf):
+    """
+    Renders VMF data to a MusicXML file, without building a music21 score.
+
+    :param vmf: A dictionary with the header and body of the VMF data, in any encoding and layout.
+    :return: The contents of the MusicXML file as a string.
+    """
+
+    return convert_document_to_musicxml(VMFDocument.from_dict(vmf))
+
+
+def write_vmf_as_musicxml(vmf, file):
+    """
+    Renders VMF data to a MusicXML file and writes it to a file object, one measure at a time.
+
+    :param vmf: A dictionary with the header and body of the VMF data, in any encoding and layout.
+    :param file: A text file object to write to.
+    """
+
+    write_document_as_musicxml(VMFDocument.from_dict(vmf), file)
+
+
+def _bar_length(ratio_string):
+    """
+    Finds the length of the measures of a time signature.
+
+    :param ratio_string: The ratio string of the time signature, such as 3/4 or 3+2/8.
+    :return: The length of a measure, as a Fraction of a quarter note.
+    """
+
+    numerator, denominator = ratio_string.split('/')
+
+    return Fraction(4 * sum(int(beats) for beats in numerator.split('+')), int(denominator))
+
+
+def _key_in_effect(header, offset):
+    """
+    Finds the key signature in effect before an offset.
+
+    :param header: The header dictionary of the VMF data.
+    :param offset: The offset, as a Fraction.
+    :return: The sharps of the key signature, 0 when there is none.
+    """
+
+    key_signatures = sorted((Fraction(key_offset), sharps) for key_offset, sharps in header['key_signature'].items()
+                            if Fraction(key_offset) < offset)
+
+    return key_signatures[-1][1] if len(key_signatures) > 0 else 0
+
+
+def _find_spellings(sharps):
+    """
+    Finds the spellings of the pitch classes in a key.
+
+    :param sharps: The sharps of the key signature, negative for flats.
+    :return: A tuple of the (step, alter) of each pitch class.
+    """
+
+    if sharps > 0:
+        return SHARP_SPELLINGS
+    elif sharps < 0:
+        return FLAT_SPELLINGS
+
+    return DEFAULT_SPELLINGS
+
+
+def _tick_pitches(tick):
+    """
+    Lists the pitches of a tick.
+
+    :param tick: The tick.
+    :return: A list of (pitch class, octave) pairs, before the padding, which is -1.
+    """
+
+    return [(tick[i], tick[i + 1]) for i in range(3, len(tick) - 1, 2) if tick[i] != -1]
+
+
+def _build_attributes(divisions, key_signature, time_signature, clef):
+    """
+    Builds the attributes of a measure.
+
+    :param divisions: The number of divisions per quarter note, or None.
+    :param key_signature: The sharps of a new key signature, or None.
+    :param time_signature: The ratio string of a new time signature, or None.
+    :param clef: The (sign, line, octave change) of a new clef, or None.
+    :return: The lines of the attributes element, none when nothing changes.
+    """
+
+    lines = []
+
+    if divisions is not None:
+        lines.append('        <divisions>%d</divisions>' % divisions)
+
+    if key_signature is not None:
+        lines += ['        <key>', '          <fifths>%d</fifths>' % key_signature, '        </key>']
+
+    if time_signature is not None:
+        beats, beat_type = time_signature.split('/')
+        lines += ['        <time>', '          <beats>%s</beats>' % beats,
+                  '          <beat-type>%s</beat-type>' % beat_type, '        </time>']
+
+    if clef is not None:
+        sign, line, octave_change = clef
+        lines += ['        <clef>', '          <sign>%s</sign>' % sign, '          <line>%d</line>' % line]
+
+        if octave_change != 0:
+            lines.append('          <clef-octave-change>%d</clef-octave-change>' % octave_change)
+
+        lines.append('        </clef>')
+
+    if len(lines) == 0:
+        return lines
+
+    return ['      <attributes>'] + lines + ['      </attributes>']
+
+
+def _build_tempo(bpm, offset):
+    """
+    Builds the direction of a tempo.
+
+    :param bpm: The quarter note BPM.
+    :param offset: The offset of the tempo in the measure, in divisions.
+    :return: The lines of the direction element.
+    """
+
+    per_minute = ('%.2f' % bpm).rstrip('0').rstrip('.')
+
+    lines = ['      <direction placement="above">', '        <direction-type>', '          <metronome>',
+             '            <beat-unit>quarter</beat-unit>', '            <per-minute>%s</per-minute>' % per_minute,
+             '          </metronome>', '        </direction-type>']
+
+    if offset != 0:
+        lines.append('        <offset>%d</offset>' % offset)
+
+    lines += ['        <sound tempo="%s"/>' % per_minute, '      </direction>']
+
+    return lines
+
+
+def _build_piece(piece, voice_number, measure_start, measure_end, spellings, divisions):
+    """
+    Builds the notes writing the part of an element in a measure.
+
+    :param piece: The (start offset, end offset, tick, tie stop, tie start, first) of the part.
+    :param voice_number: The MusicXML voice number.
+    :param measure_start: The offset of the start of the measure.
+    :param measure_end: The offset of the end of the measure.
+    :param spellings: The (step, alter) of each pitch class, as returned by _find_spellings.
+    :param divisions: The number of divisions per quarter note.
+    :return: The lines of the note elements.
+    """
+
+    start, end, tick, tie_stop, tie_start, first = piece
+
+    if tick is None:
+        if start == measure_start and end == measure_end:
+            return ['      <note>', '        <rest measure="yes"/>',
+                    '        <duration>%d</duration>' % int((end - start) * divisions),
+                    '        <voice>%d</voice>' % voice_number, '      </note>']
+
+        pitches = [None]
+        note_open = '      <note>'
+    else:
+        pitches = _tick_pitches(tick)
+        note_open = '      <note dynamics="%.2f">' % (
+            100.0 * DynamicConverter.vmf_to_velocity(tick[1]) / FORTE_VELOCITY)
+
+    lines = []
+    note_types = find_note_types(end - start)
+
+    for type_number, (quarter_length, note_type, dots, tuplet) in enumerate(note_types):
+        stops = tick is not None and (type_number > 0 or tie_stop)
+        starts = tick is not None and (type_number < len(note_types) - 1 or tie_start)
+        articulation = None
+        if tick is not None and first and type_number == 0:
+            articulation = ARTICULATION_ELEMENTS.get(tick[2])
+
+        for pitch_number, pitch in enumerate(pitches):
+            lines.append(note_open)
+
+            if pitch_number > 0:
+                lines.append('        <chord/>')
+
+            if pitch is None:
+                lines.append('        <rest/>')
+            else:
+                step, alter = spellings[pitch[0]]
+                lines += ['        <pitch>', '          <step>%s</step>' % step]
+                if alter != 0:
+                    lines.append('          <alter>%d</alter>' % alter)
+                lines += ['          <octave>%d</octave>' % pitch[1], '        </pitch>']
+
+            lines.append('        <duration>%d</duration>' % int(quarter_length * divisions))
+
+            if stops:
+                lines.append('        <tie type="stop"/>')
+            if starts:
+                lines.append('        <tie type="start"/>')
+
+            lines.append('        <voice>%d</voice>' % voice_number)
+
+            if note_type is not None:
+                lines.append('        <type>%s</type>' % note_type)
+
+            lines += ['        <dot/>'] * dots
+
+            if tuplet is not None:
+                lines += ['        <time-modification>', '          <actual-notes>%d</actual-notes>' % tuplet[0],
+                          '          <normal-notes>%d</normal-notes>' % tuplet[1], '        </time-modification>']
+
+            notations = []
+            if stops:
+                notations.append('          <tied type="stop"/>')
+            if starts:
+                notations.append('          <tied type="start"/>')
+            if articulation is not None:
+                notations += ['          <articulations>', '            <%s/>' % articulation,
+                              '          </articulations>']
+
+            if len(notations) > 0:
+                lines += ['        <notations>'] + notations + ['        </notations>']
+
+            lines.append('      </note>')
+
+    return lines
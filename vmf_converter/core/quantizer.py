@@ -0,0 +1,256 @@
+"""Quantization of performance scores to a grid, ahead of VMF encoding."""
+from fractions import Fraction
+import itertools
+import math
+
+from music21.note import GeneralNote, NotRest
+
+from vmf_converter.core.score_index import ScoreIndex
+from vmf_converter.core.tick_grid import lcm, to_exact_quarter_length
+
+# The default grids, as divisors of a quarter note: sixteenths and eighth note triplets.
+# This is the convention of music21's Stream.quantize.
+DEFAULT_DIVISORS = (4, 3)
+
+
+class QuantizationReport:
+    """
+    The grid chosen by a quantization and the displacement of the notes it snapped.
+
+    Displacements are in quarter lengths. Rests are snapped too but are not counted.
+    """
+
+    def __init__(self, divisors, number_of_ticks, onset_displacements, duration_displacements, number_of_dropped=0):
+        """
+        :param divisors: The divisors of the quarter note of the chosen grids.
+        :param number_of_ticks: The number of ticks of the score on the chosen grids.
+        :param onset_displacements: The absolute displacement of the onset of each note.
+        :param duration_displacements: The absolute change of the duration of each note.
+        :param number_of_dropped: The number of notes and chords dropped because they snapped onto the next onset.
+        """
+
+        self.divisors = tuple(divisors)
+        self.number_of_ticks = number_of_ticks
+        self.onset_displacements = onset_displacements
+        self.duration_displacements = duration_displacements
+        self.number_of_dropped = number_of_dropped
+
+    @property
+    def tick_value(self):
+        """
+        The tick value of the chosen grids, as a Fraction.
+        """
+
+        return Fraction(1, _lcm(self.divisors))
+
+    @property
+    def number_of_notes(self):
+        """
+        The number of notes and chords snapped.
+        """
+
+        return len(self.onset_displacements)
+
+    @property
+    def mean_onset_displacement(self):
+        """
+        The mean displacement of the onsets of the notes.
+        """
+
+        return _mean(self.onset_displacements)
+
+    @property
+    def max_onset_displacement(self):
+        """
+        The largest displacement of the onset of a note.
+        """
+
+        return max(self.onset_displacements or [0.0])
+
+    @property
+    def mean_duration_displacement(self):
+        """
+        The mean change of the durations of the notes.
+        """
+
+        return _mean(self.duration_displacements)
+
+    @property
+    def max_duration_displacement(self):
+        """
+        The largest change of the duration of a note.
+        """
+
+        return max(self.duration_displacements or [0.0])
+
+    def __str__(self):
+        return 'Quantized %d notes to 1/%s grids (%d ticks): onsets moved %.4f on average, %.4f at most; ' \
+               'durations changed %.4f on average, %.4f at most.' % (
+                   self.number_of_notes, ', 1/'.join(str(divisor) for divisor in self.divisors), self.number_of_ticks,
+                   self.mean_onset_displacement, self.max_onset_displacement,
+                   self.mean_duration_displacement, self.max_duration_displacement)
+
+
+def quantize_score(score, divisors=DEFAULT_DIVISORS, max_ticks=None):
+    """
+    Snaps the onsets and ends of the notes, chords and rests of a score to a grid, in place.
+
+    Every non-empty subset of the divisors is a candidate: its grids are the multiples of one
+    over each divisor, and events snap to the nearest point of any of them. The candidate with
+    the least total displacement whose ticks fit in the budget is chosen, the one with fewer
+    ticks on a tie. Each candidate costs one pass over the events, so there should be few divisors.
+
+    An element that would shrink to nothing keeps one step of the finest chosen grid, but never
+    reaches past the snapped onset of the next element of its stream, so that the elements after
+    it keep their places. An element whose onset snaps onto that of the next one is dropped.
+
+    The ticks counted against the budget include the padding of a pickup measure.
+
+    :param score: The music21 score to quantize.
+    :param divisors: The divisors of the quarter note of the grids to choose from.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :return: A QuantizationReport of the chosen grids.
+    """
+
+    events = []
+    _collect_events(score, (), events)
+
+    # The encoder places the elements after the pickup padding.
+    padding = max([to_exact_quarter_length(value) for value in ScoreIndex.for_score(score).paddings] + [Fraction(0)])
+    end = padding + max([onset + duration for container, element, onset, duration in events] + [Fraction(0)])
+
+    best = None
+
+    for size in range(1, len(divisors) + 1):
+        for candidate in itertools.combinations(divisors, size):
+            number_of_ticks = int(math.ceil(end * _lcm(candidate)))
+
+            if max_ticks is not None and number_of_ticks > max_ticks:
+                continue
+
+            error = sum(abs(_snap(onset, candidate) - onset) + abs(_snap(onset + duration, candidate) - onset - duration)
+                        for container, element, onset, duration in events)
+
+            if best is None or (error, number_of_ticks) < best[:2]:
+                best = (error, number_of_ticks, candidate)
+
+    if best is None:
+        raise ValueError("No grid fits the tick budget")
+
+    error, number_of_ticks, candidate = best
+    step = Fraction(1, max(candidate))
+
+    snapped_onsets = [_snap(onset, candidate) for container, element, onset, duration in events]
+    next_onsets = _find_next_onsets(events, snapped_onsets)
+
+    onset_displacements = []
+    duration_displacements = []
+    number_of_dropped = 0
+
+    for (container, element, onset, duration), snapped_onset, next_onset in zip(events, snapped_onsets, next_onsets):
+        snapped_duration = max(_snap(onset + duration, candidate) - snapped_onset, step)
+
+        if next_onset is not None:
+            snapped_duration = min(snapped_duration, next_onset - snapped_onset)
+
+        if duration == 0:
+            # Grace notes stay without duration.
+            snapped_duration = duration
+        elif snapped_duration <= 0:
+            container.remove(element)
+
+            if isinstance(element, NotRest):
+                number_of_dropped += 1
+
+            continue
+
+        container.setElementOffset(element, to_exact_quarter_length(container.elementOffset(element)) +
+                                   snapped_onset - onset)
+        element.duration.quarterLength = snapped_duration
+
+        if isinstance(element, NotRest):
+            onset_displacements.append(float(abs(snapped_onset - onset)))
+            duration_displacements.append(float(abs(snapped_duration - duration)))
+
+    # Offsets were set directly, so the streams have to be sorted and their caches cleared.
+    for container in {id(container): container for container, element, onset, duration in events}.values():
+        container._elementsChanged()
+
+    score._elementsChanged()
+
+    return QuantizationReport(candidate, number_of_ticks, onset_displacements, duration_displacements,
+                              number_of_dropped)
+
+
+def _collect_events(container, container_offsets, events):
+    """
+    Collects the notes, chords and rests of a stream and of its substreams.
+
+    :param container: The stream to visit.
+    :param container_offsets: The offsets of the enclosing streams.
+    :param events: The list to append (container, element, onset, duration) tuples to, with
+    the onset counted from the start of the score.
+    """
+
+    for element in container.elements:
+        offset = to_exact_quarter_length(container.elementOffset(element))
+
+        if element.isStream:
+            _collect_events(element, container_offsets + (offset,), events)
+        elif isinstance(element, GeneralNote):
+            events.append((container, element, offset + sum(container_offsets),
+                           to_exact_quarter_length(element.duration.quarterLength)))
+
+
+def _find_next_onsets(events, snapped_onsets):
+    """
+    Finds, for each event, the snapped onset of the next later event of the same stream.
+
+    :param events: The (container, element, onset, duration) tuples, in stream order.
+    :param snapped_onsets: The snapped onset of each event.
+    :return: A list of the snapped onset of the next event, or None for the last event of a stream.
+    """
+
+    next_onsets = [None] * len(events)
+    # The indices of the events of each stream still waiting for a later onset.
+    pending = {}
+
+    for index, (container, element, onset, duration) in enumerate(events):
+        waiting = pending.setdefault(id(container), [])
+
+        # Events at the same onset sound together, so only a later one bounds them.
+        while len(waiting) > 0 and events[waiting[0]][2] < onset:
+            next_onsets[waiting.pop(0)] = snapped_onsets[index]
+
+        waiting.append(index)
+
+    return next_onsets
+
+
+def _snap(value, divisors):
+    """
+    Snaps a value to the nearest point of the grids of some divisors, the first grid on a tie.
+
+    :param value: The value to snap, as a Fraction.
+    :param divisors: The divisors of the quarter note of the grids.
+    :return: The snapped value, as a Fraction.
+    """
+
+    return min((Fraction(round(value * divisor), divisor) for divisor in divisors),
+               key=lambda point: abs(point - value))
+
+
+def _lcm(values):
+    result = 1
+
+    for value in values:
+        result = lcm(result, value)
+
+    return result
+
+
+def _mean(values):
+    if len(values) == 0:
+        return 0.0
+
+    return sum(values) / len(values)
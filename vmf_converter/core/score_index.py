@@ -0,0 +1,125 @@
+"""Single-pass index of the score properties needed for VMF encoding."""
+from music21.chord import Chord
+from music21.key import KeySignature
+from music21.meter import TimeSignature
+from music21.note import GeneralNote
+from music21.stream import Measure, Part
+from music21.tempo import MetronomeMark
+
+
+class ScoreIndex:
+    """
+    Collects everything the VMF encoder needs to know about a score in one traversal.
+
+    The index is stored in the score's own cache, so it stays valid exactly as long as
+    music21's cached flat representation does, and is rebuilt once the score changes.
+    """
+
+    CACHE_KEY = 'vmfScoreIndex'
+
+    def __init__(self, score):
+        """
+        Builds the index by walking the score once.
+
+        :param score: The music21 score to index.
+        """
+
+        # The set of quarter lengths of all notes, chords and rests.
+        self.durations = set()
+        # The set of offsets of all notes, chords and rests in the flattened score.
+        self.offsets = set()
+        # The set of non-zero pickup paddings of the measures.
+        self.paddings = set()
+        # The largest chord cardinality, 0 when the score has no chords.
+        self.largest_chord = 0
+        # The number of voices of each part, in part order.
+        self.voices_per_part = []
+        # (offset, element) pairs of the meter, key and tempo events.
+        self.time_signatures = []
+        self.key_signatures = []
+        self.tempos = []
+
+        self.__visit(score, ())
+
+        # Order the events by offset the same way a flat stream would.
+        for events in (self.time_signatures, self.key_signatures, self.tempos):
+            events.sort(key=lambda event: event[0])
+
+    @classmethod
+    def for_score(cls, score):
+        """
+        Gets the index of a score, reusing the cached index when the score is unmodified.
+
+        :param score: The music21 score to index.
+        :return: The ScoreIndex of the score.
+        """
+
+        index = score._cache.get(cls.CACHE_KEY)
+
+        if index is None:
+            index = cls(score)
+            score._cache[cls.CACHE_KEY] = index
+
+        return index
+
+    @property
+    def number_of_voices(self):
+        """
+        The total number of voices across all parts.
+        """
+
+        return sum(self.voices_per_part)
+
+    def __visit(self, container, container_offsets):
+        """
+        Records the elements of a stream and recurses into its substreams.
+
+        :param container: The stream to visit.
+        :param container_offsets: The offsets of the enclosing streams, innermost first.
+        """
+
+        for element in container.elements:
+            offset = container.elementOffset(element)
+
+            if element.isStream:
+                # Only the parts directly in the score carry voices.
+                if not container_offsets and isinstance(element, Part):
+                    self.__count_voices(element)
+
+                if isinstance(element, Measure) and element.paddingLeft > 0:
+                    self.paddings.add(element.paddingLeft)
+
+                self.__visit(element, (offset,) + container_offsets)
+                continue
+
+            # Sum innermost first, as flattening the score does.
+            for container_offset in container_offsets:
+                offset = offset + container_offset
+
+            if isinstance(element, GeneralNote):
+                self.durations.add(element.duration.quarterLength)
+                self.offsets.add(offset)
+
+                if isinstance(element, Chord):
+                    self.largest_chord = max(element.multisetCardinality, self.largest_chord)
+            elif isinstance(element, TimeSignature):
+                self.time_signatures.append((offset, element))
+            elif isinstance(element, KeySignature):
+                self.key_signatures.append((offset, element))
+            elif isinstance(element, MetronomeMark):
+                self.tempos.append((offset, element))
+
+    def __count_voices(self, part):
+        """
+        Records the largest number of voices found in any measure of a part.
+
+        :param part: The part to scan.
+        """
+
+        voices_in_part = 0
+
+        for current_measure in part.getElementsByClass(Measure):
+            # If there is only 1 voice, then we have 0 voice objects.
+            voices_in_part = max(voices_in_part, len(current_measure.voices), 1)
+
+        self.voices_per_part.append(voices_in_part)
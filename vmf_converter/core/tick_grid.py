@@ -0,0 +1,177 @@
+"""Mapping between tick numbers and offsets, for tick values that change between sections."""
+from bisect import bisect_right
+from fractions import Fraction
+
+# The largest denominator of an exact quarter length. Anything finer is float noise.
+MAX_QUARTER_LENGTH_DENOMINATOR = 1024
+
+
+def to_exact_quarter_length(quarter_length):
+    """
+    Converts a music21 quarter length or offset to an exact fraction.
+    Floats are snapped to the nearest fraction with a small denominator, which drops float noise.
+
+    :param quarter_length: The quarter length, as a float, int, string or Fraction.
+    :return: The quarter length as a Fraction.
+    """
+
+    if isinstance(quarter_length, Fraction):
+        return quarter_length
+
+    return Fraction(quarter_length).limit_denominator(MAX_QUARTER_LENGTH_DENOMINATOR)
+
+
+def gcd(a, b):
+    """
+    Finds the greatest common divisor of two integers, by Euclid's algorithm.
+    math.gcd is only available from Python 3.5.
+
+    :param a: An integer.
+    :param b: An integer.
+    :return: The non-negative greatest common divisor, or 0 if both integers are 0.
+    """
+
+    while b != 0:
+        a, b = b, a % b
+
+    return abs(a)
+
+
+def lcm(a, b):
+    """
+    Finds the least common multiple of two positive integers.
+
+    :param a: A positive integer.
+    :param b: A positive integer.
+    :return: The least common multiple.
+    """
+
+    return a * b // gcd(a, b)
+
+
+class TickGrid:
+    """
+    The ticks of a VMF body, as sections starting at given offsets, each with its own tick value.
+
+    A body with a single tick value has a single section starting at offset 0.
+    """
+
+    def __init__(self, sections):
+        """
+        Creates a grid from its sections.
+
+        :param sections: A list of (offset, tick value) pairs, in quarter lengths. The first
+        section starts at offset 0, and each one ends on a whole tick of the previous one.
+        """
+
+        sections = sorted((to_exact_quarter_length(offset), to_exact_quarter_length(tick_value))
+                          for offset, tick_value in sections)
+
+        if len(sections) == 0 or sections[0][0] != 0:
+            raise ValueError("Tick grid does not start at offset 0")
+
+        self.offsets = [offset for offset, tick_value in sections]
+        self.tick_values = [tick_value for offset, tick_value in sections]
+
+        # The tick number at the start of each section.
+        self.start_ticks = [0]
+
+        for i in range(1, len(sections)):
+            section_ticks = (self.offsets[i] - self.offsets[i - 1]) / self.tick_values[i - 1]
+
+            if section_ticks.denominator != 1:
+                raise ValueError("Section does not start on a tick of the previous section")
+
+            self.start_ticks.append(self.start_ticks[-1] + int(section_ticks))
+
+    @classmethod
+    def uniform(cls, tick_value):
+        """
+        Creates a grid with the same tick value throughout.
+
+        :param tick_value: The tick value, in quarter lengths.
+        :return: A TickGrid instance.
+        """
+
+        return cls([(0, tick_value)])
+
+    @classmethod
+    def from_header(cls, header):
+        """
+        Creates the grid of a VMF header, from its tick_values table if it has one.
+
+        :param header: The header dictionary.
+        :return: A TickGrid instance.
+        """
+
+        if 'tick_values' in header:
+            return cls([(offset, Fraction(tick_value)) for offset, tick_value in header['tick_values'].items()])
+
+        return cls.uniform(Fraction(header['tick_value']))
+
+    @property
+    def is_uniform(self):
+        """
+        Whether the grid has a single tick value.
+        """
+
+        return len(self.offsets) == 1
+
+    def to_dict(self):
+        """
+        Converts the grid to the tick_values table of a VMF header.
+
+        :return: A dictionary of tick value strings keyed by offset strings.
+        """
+
+        return {str(float(offset)): str(tick_value) for offset, tick_value in zip(self.offsets, self.tick_values)}
+
+    def offset(self, tick_number):
+        """
+        Finds the offset of the start of a tick.
+
+        :param tick_number: The index of the tick.
+        :return: The offset in quarter lengths, as a Fraction.
+        """
+
+        section = bisect_right(self.start_ticks, tick_number) - 1
+
+        return self.offsets[section] + (tick_number - self.start_ticks[section]) * self.tick_values[section]
+
+    def tick_number(self, offset):
+        """
+        Finds the tick an offset falls in.
+
+        :param offset: The offset in quarter lengths.
+        :return: The index of the tick.
+        """
+
+        offset = to_exact_quarter_length(offset)
+        section = bisect_right(self.offsets, offset) - 1
+
+        return self.start_ticks[section] + int((offset - self.offsets[section]) // self.tick_values[section])
+
+    def from_tick(self, tick_number):
+        """
+        Gets the grid of the ticks from a given tick on, with offsets counted from that tick.
+
+        :param tick_number: The index of the first tick.
+        :return: A TickGrid instance.
+        """
+
+        section = bisect_right(self.start_ticks, tick_number) - 1
+        start = self.offset(tick_number)
+
+        return TickGrid([(0, self.tick_values[section])] +
+                        [(offset - start, tick_value)
+                         for offset, tick_value in zip(self.offsets[section + 1:], self.tick_values[section + 1:])])
+
+    def __eq__(self, other):
+        return isinstance(other, TickGrid) and self.offsets == other.offsets and self.tick_values == other.tick_values
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<TickGrid %s>' % ', '.join('%s: %s' % (offset, tick_value)
+                                          for offset, tick_value in zip(self.offsets, self.tick_values))
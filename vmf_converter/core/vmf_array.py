@@ -0,0 +1,85 @@
+"""Encoding of scores as NumPy tick tensors."""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from vmf_converter.core import vmf_converter_core
+from vmf_converter.core.dynamic_converter import DynamicConverter
+from vmf_converter.core.tick_grid import TickGrid
+from vmf_converter.core.vmf_header import VMFHeader
+
+
+def encode_to_array(score):
+    """
+    Encodes a score as a contiguous array of ticks instead of nested lists.
+
+    The array has the shape (ticks, voices, row_width) and holds the same values as the
+    body returned by convert_score_to_vmf. It is int8 when every value fits, int16 otherwise.
+
+    :param score: The music21 score to encode. It is modified in place, as for convert_score_to_vmf.
+    :return: A tuple of the array and the VMFHeader of the encoding.
+    """
+
+    if numpy is None:
+        raise ImportError("encode_to_array requires numpy")
+
+    smallest_note, largest_chord, number_of_parts, id_map = vmf_converter_core.prepare_score_for_vmf(score)
+
+    row_width = vmf_converter_core.FIRST_PITCH_INDEX + 2 * largest_chord + 1
+
+    # Like the list body, every voice runs to the end of the longest one.
+    number_of_ticks = vmf_converter_core.count_body_ticks(vmf_converter_core.scan_score_extent(score)[0],
+                                                          TickGrid.uniform(smallest_note))
+
+    # The runs hold one entry per element, so they are cheap to keep compared to the ticks.
+    voices = [list(vmf_converter_core.iter_part_runs(part, smallest_note, largest_chord, id_map[part.id],
+                                                     number_of_ticks=number_of_ticks))
+              for part in score.parts]
+
+    # Use the narrowest type that holds every value.
+    largest_value = max([abs(value) for runs in voices for run in runs for value in run[2]] or [0])
+    dtype = numpy.int8 if largest_value <= numpy.iinfo(numpy.int8).max else numpy.int16
+
+    array = numpy.empty((number_of_ticks, len(voices), row_width), dtype=dtype)
+
+    for voice_number, runs in enumerate(voices):
+        current_tick = 0
+
+        for n_frames, first_tick, tick in runs:
+            if current_tick >= number_of_ticks:
+                break
+
+            if n_frames == 0:
+                continue
+
+            end_tick = min(current_tick + n_frames, number_of_ticks)
+
+            # Fill the whole run at once, then overwrite its first tick.
+            array[current_tick:end_tick, voice_number] = tick
+            array[current_tick, voice_number] = first_tick
+
+            current_tick = end_tick
+
+    header = VMFHeader.from_dict(vmf_converter_core.build_vmf_header(score, smallest_note, number_of_parts))
+
+    return array, header
+
+
+def decode_velocities(array):
+    """
+    Decodes the dynamics of an array of ticks to midi velocities, all at once.
+
+    :param array: An array of ticks of shape (ticks, voices, row_width), as returned by encode_to_array.
+    :return: An int16 array of shape (ticks, voices), with the velocity of each tick or 0 where the voice is silent.
+    """
+
+    if numpy is None:
+        raise ImportError("decode_velocities requires numpy")
+
+    sounding = array[:, :, 0] != 0
+
+    # Silent ticks have no dynamic, so they are decoded as mf and cleared afterwards.
+    dynamics = numpy.where(sounding, array[:, :, vmf_converter_core.DYNAMIC_BIT], 1)
+
+    return numpy.where(sounding, DynamicConverter.vmf_to_velocities(dynamics), 0).astype(numpy.int16)
@@ -0,0 +1,214 @@
+"""Memory-mappable binary container for VMF data (.vmfb)."""
+import json
+import mmap
+import struct
+
+from vmf_converter.core.vmf_header import BODY_ENCODING_RLE, BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE
+
+
+# Every binary VMF file starts with these bytes.
+MAGIC = b'VMFB'
+VERSION = 1
+
+# Magic, version, type code of the values, number of ticks, number of voices,
+# width of a tick and length of the JSON header. All little-endian.
+PREAMBLE = struct.Struct('<4sHcxIIII')
+
+# The records start on a boundary of this many bytes.
+ALIGNMENT = 8
+
+# Type codes of the tick values, from narrowest to widest, with their ranges.
+TYPE_CODES = ((b'b', -2 ** 7, 2 ** 7 - 1), (b'h', -2 ** 15, 2 ** 15 - 1))
+
+
+def is_vmf_binary_file(path):
+    """
+    Checks whether a file is a binary VMF file.
+
+    :param path: The path of the file to check.
+    :return: True if the file starts with the binary VMF magic bytes.
+    """
+
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_vmf_binary_file(vmf, path):
+    """
+    Writes VMF data to a binary VMF file.
+
+    The file holds a small preamble and the JSON header, followed by one fixed-width
+    record per tick with the rows of all voices packed one after another. Bodies in
+    the voice layout are transposed into that form.
+
+    :param vmf: A dictionary with the header and body of the VMF data.
+    :param path: The path of the file to write.
+    """
+
+    header = dict(vmf['header'])
+    body = vmf['body']
+
+    run_length_encoded = header.pop('body_encoding', None) == BODY_ENCODING_RLE
+
+    # The records always hold one row per tick.
+    if header.pop('body_layout', BODY_LAYOUT_TICK) == BODY_LAYOUT_VOICE:
+        if run_length_encoded:
+            body = [[tick for repeat_count, tick in voice for i in range(repeat_count)] for voice in body]
+
+        body = [list(row) for row in zip(*body)]
+    elif run_length_encoded:
+        body = [row for repeat_count, row in body for i in range(repeat_count)]
+
+    number_of_ticks = len(body)
+    number_of_voices = len(body[0]) if number_of_ticks > 0 else header['number_of_voices']
+    row_width = len(body[0][0]) if number_of_ticks > 0 and number_of_voices > 0 else 0
+
+    # Use the narrowest type that holds every value.
+    smallest = min([min(row) for tick in body for row in tick] or [0])
+    largest = max([max(row) for tick in body for row in tick] or [0])
+
+    for type_code, minimum, maximum in TYPE_CODES:
+        if minimum <= smallest and largest <= maximum:
+            break
+    else:
+        raise ValueError("Tick values do not fit in a binary VMF file")
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-(PREAMBLE.size + len(header_bytes)) % ALIGNMENT)
+
+    record = struct.Struct('<%d%s' % (number_of_voices * row_width, type_code.decode('ascii')))
+
+    with open(path, 'wb') as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, type_code, number_of_ticks, number_of_voices,
+                                 row_width, len(header_bytes)))
+        file.write(header_bytes)
+
+        # Pack one tick at a time to avoid another copy of the body.
+        for tick in body:
+            file.write(record.pack(*[value for row in tick for value in row]))
+
+
+class VMFBinaryFile:
+    """
+    Read-only view of a binary VMF file, memory-mapped for random access.
+
+    Indexing or iterating yields ticks, each one a list with the row of every voice,
+    in the same form as the ticks of the body of a JSON VMF file.
+    """
+
+    def __init__(self, path):
+        """
+        Opens and maps a binary VMF file. Only the preamble and header are read.
+
+        :param path: The path of the file to open.
+        """
+
+        self.__file = open(path, 'rb')
+        self.__map = None
+
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            self.close()
+            raise ValueError("File is not a binary VMF file")
+
+        if len(self.__map) < PREAMBLE.size:
+            self.close()
+            raise ValueError("File is not a binary VMF file")
+
+        magic, version, type_code, number_of_ticks, number_of_voices, row_width, header_length = \
+            PREAMBLE.unpack_from(self.__map, 0)
+
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("File is not a binary VMF file")
+
+        if version != VERSION:
+            self.close()
+            raise ValueError("Binary VMF version is not supported")
+
+        self.number_of_ticks = number_of_ticks
+        self.number_of_voices = number_of_voices
+        self.row_width = row_width
+
+        header_end = PREAMBLE.size + header_length
+        self.header = json.loads(self.__map[PREAMBLE.size:header_end].decode('utf-8'))
+
+        self.__records_offset = header_end
+        self.__row = struct.Struct('<%d%s' % (row_width, type_code.decode('ascii')))
+        self.__tick = struct.Struct('<%d%s' % (row_width * number_of_voices, type_code.decode('ascii')))
+
+    def tick(self, tick_number):
+        """
+        Reads the rows of all voices at a tick.
+
+        :param tick_number: The index of the tick.
+        :return: A list with the row of each voice.
+        """
+
+        values = self.__tick.unpack_from(self.__map, self.__tick_offset(tick_number))
+
+        return [list(values[i:i + self.row_width]) for i in range(0, len(values), self.row_width)]
+
+    def voice_tick(self, tick_number, voice_number):
+        """
+        Reads the row of a single voice at a tick.
+
+        :param tick_number: The index of the tick.
+        :param voice_number: The index of the voice.
+        :return: The row of the voice, as a list.
+        """
+
+        if not 0 <= voice_number < self.number_of_voices:
+            raise IndexError("Voice number out of range")
+
+        offset = self.__tick_offset(tick_number) + voice_number * self.__row.size
+
+        return list(self.__row.unpack_from(self.__map, offset))
+
+    def voice(self, voice_number):
+        """
+        Reads the rows of a single voice, one tick at a time.
+
+        :param voice_number: The index of the voice.
+        :return: A generator over the rows of the voice.
+        """
+
+        for tick_number in range(self.number_of_ticks):
+            yield self.voice_tick(tick_number, voice_number)
+
+    def close(self):
+        """
+        Unmaps and closes the file.
+        """
+
+        if self.__map is not None:
+            self.__map.close()
+
+        self.__file.close()
+
+    def __tick_offset(self, tick_number):
+        if not 0 <= tick_number < self.number_of_ticks:
+            raise IndexError("Tick number out of range")
+
+        return self.__records_offset + tick_number * self.__tick.size
+
+    def __len__(self):
+        return self.number_of_ticks
+
+    def __getitem__(self, tick_number):
+        if tick_number < 0:
+            tick_number += self.number_of_ticks
+
+        return self.tick(tick_number)
+
+    def __iter__(self):
+        for tick_number in range(self.number_of_ticks):
+            yield self.tick(tick_number)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
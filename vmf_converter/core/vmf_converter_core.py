@@ -1,18 +1,25 @@
 """Main logic for parsing a VMF file."""
+import bisect
 from fractions import Fraction
+import itertools
 import json
+import multiprocessing
+import os
 
-from music21 import note, chord, stream, meter, key, tempo
-from music21.chord import Chord
-from music21.common import approximateGCD
+from music21 import note, chord, clef, stream, meter, key, tempo, tie
 from music21.key import KeySignature
 from music21.meter import TimeSignature
 from music21.note import Note, Rest
-from music21.pitch import Pitch
-from music21.stream import Score, Part, Stream, Voice
+from music21.stream import Measure, Score, Part, Stream, Voice
 
-from vmf_converter.core.articulation_converter import ArticulationConverter
 from vmf_converter.core.dynamic_converter import DynamicConverter
+from vmf_converter.core.element_factory import ElementFactory
+from vmf_converter.core.score_index import ScoreIndex
+from vmf_converter.core.tick_grid import TickGrid, gcd, lcm, to_exact_quarter_length
+from vmf_converter.core.vmf_binary import VMFBinaryFile, is_vmf_binary_file
+from vmf_converter.core.vmf_cost import VMFCost
+from vmf_converter.core.vmf_header import BODY_ENCODING_PLAIN, BODY_ENCODING_RLE, BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE
+from vmf_converter.core.vmf_stream import read_vmf_stream
 
 
 # The first note bit is at position 3.
@@ -20,13 +27,18 @@ INDEX_OF_FIRST_NOTE_BIT = 3
 # Part id is the last bit.
 INDEX_OF_PART_ID_BIT = -1
 
-# Precision for rounding roubles.
-PRECISION = 0.000000000000001
 BASIC_TICK_LENGTH = 6
 FIRST_PITCH_INDEX = 3
 DYNAMIC_BIT = 1
 ARTICULATION_BIT = 2
 
+# The parts of the score being encoded, in a worker process of an encoding pool. It is only set in the workers.
+_worker_parts = None
+# The VMF data being decoded, in a worker process of a decoding pool. It is only set in the workers.
+_worker_vmf = None
+# The number of ticks or runs, over all voices, below which decoding on a pool costs more than it saves.
+PARALLEL_DECODE_MIN_RUNS = 20000
+
 def find_number_of_notes_in_tick(tick):
     """
     Finds the number of notes in a tick.
@@ -39,170 +51,709 @@ def find_number_of_notes_in_tick(tick):
     # Remove all bit pairs with -1 from the count.
     return (len(tick[3:-1]) / 2) - (tick[3:-1].count(-1) / 2)
 
-def read_vmf_string(vmf_string):
+def run_length_encode_body(body):
+    """
+    Collapses runs of identical rows of a VMF body into [repeat_count, row] pairs.
+
+    :param body: The rows of a plain VMF body.
+    :return: The rows of a run-length encoded VMF body.
+    """
+
+    return list(iter_run_length_encoded_body(body))
+
+def iter_run_length_encoded_body(body):
+    """
+    Collapses runs of identical rows of a VMF body into [repeat_count, row] pairs, lazily.
+
+    :param body: An iterable over the rows of a plain VMF body.
+    :return: A generator over the rows of the run-length encoded VMF body.
+    """
+
+    for row, run in itertools.groupby(body):
+        yield [sum(1 for i in run), row]
+
+def run_length_decode_body(body):
+    """
+    Expands the [repeat_count, row] pairs of a run-length encoded VMF body.
+    Repeated rows are shared, not copied.
+
+    :param body: The rows of a run-length encoded VMF body.
+    :return: A generator over the rows of the plain VMF body.
+    """
+
+    for repeat_count, row in body:
+        for i in range(repeat_count):
+            yield row
+
+def read_meters(time_signatures):
+    """
+    Reads the time signatures of a VMF header.
+
+    :param time_signatures: The time signature strings of the header, keyed by offset.
+    :return: A list of (offset, time signature string, bar length) tuples sorted by offset,
+    with the offsets and bar lengths as Fractions of a quarter note.
+    """
+
+    meters = []
+
+    for offset, time_signature_str in time_signatures.items():
+        bar_length = TimeSignature(time_signature_str).barDuration.quarterLength
+        meters.append((Fraction(offset), time_signature_str, Fraction(bar_length)))
+
+    return sorted(meters, key=lambda meter_entry: meter_entry[0])
+
+class _MeasureBuilder:
+    """
+    Builds the measures of one voice as its elements are decoded.
+
+    Measures are laid out from the time signatures in the same way as makeMeasures:
+    each one takes the time signature in effect at its start, and elements go in the
+    measure they start in, without being split at barlines.
+    """
+
+    def __init__(self, voice, meters, first_measure_number=1):
+        """
+        :param voice: The music21 voice to add the measures to.
+        :param meters: The time signatures, as returned by read_meters.
+        :param first_measure_number: The number of the first measure.
+        """
+
+        if len(meters) == 0 or meters[0][0] > 0:
+            raise ValueError("No time signature at the start of the VMF data")
+
+        self.voice = voice
+        self.meters = meters
+        self.first_measure_number = first_measure_number
+        self.measures = []
+
+        # The index of the time signature of the last measure.
+        self.meter_index = -1
+        # The start and end of the last measure.
+        self.measure_start = Fraction(0)
+        self.measure_end = Fraction(0)
+        # The end of the last element.
+        self.highest_time = Fraction(0)
+
+        # The sum of the heights of the pitches, and their number, to choose the clef.
+        self.total_height = 0
+        self.number_of_pitches = 0
+
+        self.add_measure()
+
+    def add(self, offset, element):
+        """
+        Adds an element to the measure it starts in, creating measures up to it.
+
+        :param offset: The offset of the element in the voice, as a Fraction.
+        :param element: The element to add.
+        """
+
+        while offset >= self.measure_end:
+            self.add_measure()
+
+        self.measures[-1].insert(offset - self.measure_start, element)
+
+        self.highest_time = max(self.highest_time, offset + Fraction(element.quarterLength))
+
+        if isinstance(element, note.NotRest):
+            for pitch in element.pitches:
+                height = pitch.diatonicNoteNum
+                if height > 33:
+                    height += 3
+                elif height < 24:
+                    height -= 3
+
+                self.total_height += height
+                self.number_of_pitches += 1
+
+    def add_measure(self):
+        """
+        Appends a measure to the voice, after the last one.
+        """
+
+        measure = Measure()
+        measure.number = self.first_measure_number + len(self.measures)
+
+        self.measure_start = self.measure_end
+
+        # A measure starting after a time signature change takes the new time signature.
+        meter_index = self.meter_index
+        while meter_index + 1 < len(self.meters) and self.meters[meter_index + 1][0] <= self.measure_start:
+            meter_index += 1
+
+        if meter_index != self.meter_index:
+            self.meter_index = meter_index
+            measure.timeSignature = TimeSignature(self.meters[meter_index][1])
+
+        self.measure_end = self.measure_start + self.meters[meter_index][2]
+
+        self.voice.insert(self.measure_start, measure)
+        self.measures.append(measure)
+
+    def finish(self):
+        """
+        Adds measures up to the end of the last element, and sets the clef and final barline.
+        """
+
+        while self.measure_end < self.highest_time:
+            self.add_measure()
+
+        self.measures[0].clef = self.__best_clef()
+        self.measures[-1].rightBarline = 'final'
+
+    def __best_clef(self):
+        """
+        Chooses the clef that fits the pitches of the voice, the same way as Stream.bestClef.
+
+        :return: A music21 clef.
+        """
+
+        if self.number_of_pitches == 0:
+            average_height = 29
+        else:
+            average_height = self.total_height / self.number_of_pitches
+
+        if average_height > 52:
+            return clef.Treble8vaClef()
+        elif average_height > 28:
+            return clef.TrebleClef()
+        elif average_height > 10:
+            return clef.BassClef()
+        else:
+            return clef.Bass8vbClef()
+
+class _VoiceDecoder:
+    """
+    Decodes the ticks of one voice into the notes, chords and rests they encode.
+
+    Ticks are only counted while an element is in progress. Its duration is found once,
+    exactly, when the element ends, so the cost is per element rather than per tick.
+
+    A voice that starts in the middle of a note, as a range of ticks may, starts with the
+    rest of that note, tied to the part before the range.
+
+    The decoded elements are handed to a callback as plain values rather than music21 objects,
+    so that voices can be decoded in worker processes.
+    """
+
+    def __init__(self, tick_grid, add_element):
+        """
+        :param tick_grid: The TickGrid giving the offset of each tick.
+        :param add_element: The function called with the offset, quarter length, tick and tie of
+        each decoded element, in the form _ElementBuilder.add takes them.
+        """
+
+        self.tick_grid = tick_grid
+        self.add_element = add_element
+        # The tick starting the element in progress, None for a rest, and whether it is tied to the part before.
+        self.current_element = None
+        self.number_of_ticks = 0
+        # The first tick of the element in progress.
+        self.start_tick = 0
+
+    def feed(self, tick, repeat_count=1):
+        """
+        Decodes the next ticks of the voice.
+
+        :param tick: The tick to decode.
+        :param repeat_count: The number of consecutive times the tick occurs.
+        """
+
+        if tick[0] == 1:
+            # Each repetition of an onset is a new element of one tick.
+            for i in range(repeat_count):
+                self.append_current_element()
+                self.current_element = (tick, False)
+                self.number_of_ticks = 1
+        elif tick[0] == 2 and self.current_element is None:
+            # The note started before the first tick, so carry it over.
+            self.current_element = (tick, True)
+            self.number_of_ticks = repeat_count
+        elif tick[0] == 2:
+            # extend previous note
+            self.number_of_ticks += repeat_count
+        elif self.current_element is not None and self.current_element[0] is None:
+            # extend previous rest.
+            self.number_of_ticks += repeat_count
+        else:
+            self.append_current_element()
+
+            # create new rest
+            self.current_element = (None, False)
+            self.number_of_ticks = repeat_count
+
+    def finish(self):
+        """
+        Appends the last element in progress.
+        """
+
+        self.append_current_element()
+        self.current_element = None
+        self.number_of_ticks = 0
+
+    def append_current_element(self):
+        """
+        Hands the element in progress to the callback, if there is one.
+        """
+
+        current_element = self.current_element
+
+        if current_element is not None:
+            # Find the duration of all of its ticks at once. The tick value may change
+            # within the element, so it spans the offsets of its first and last ticks.
+            offset = self.tick_grid.offset(self.start_tick)
+            quarter_length = self.tick_grid.offset(self.start_tick + self.number_of_ticks) - offset
+
+            self.add_element(offset, quarter_length, current_element[0], current_element[1])
+
+            self.start_tick += self.number_of_ticks
+
+class _ElementBuilder:
+    """
+    Creates the music21 notes, chords and rests decoded from the ticks of a voice, and adds them to its measures.
+    """
+
+    def __init__(self, measures, element_factory):
+        """
+        :param measures: The _MeasureBuilder of the voice to add the elements to.
+        :param element_factory: The ElementFactory creating the notes and chords.
+        """
+
+        self.measures = measures
+        self.element_factory = element_factory
+
+    def add(self, offset, quarter_length, tick, tied):
+        """
+        Creates a decoded element and adds it to the measure it starts in.
+
+        :param offset: The offset of the element in the voice, as a Fraction.
+        :param quarter_length: The duration of the element, as a Fraction.
+        :param tick: The tick the element starts with, or None for a rest.
+        :param tied: Whether the element is tied to the part before the first tick.
+        """
+
+        if tick is None:
+            element = Rest()
+        else:
+            element = self.create_element(tick)
+
+            if tied:
+                element.tie = tie.Tie('stop')
+
+        element.quarterLength = quarter_length
+
+        self.measures.add(offset, element)
+
+    def finish(self):
+        """
+        Completes the measures of the voice.
+        """
+
+        self.measures.finish()
+
+    def create_element(self, tick):
+        """
+        Creates the note or chord starting at an onset tick.
+
+        :param tick: The onset tick.
+        :return: A music21 note or chord, without its duration.
+        """
+
+        # Find how many notes to write. This will always be an int.
+        number_of_notes = int(find_number_of_notes_in_tick(tick))
+
+        if number_of_notes == 1:
+            # create a new note
+            element = self.element_factory.note(tick[3], tick[4])
+        else:
+            # The (pitch class, octave) pairs of the chord.
+            # From the beginning to the end of the pitch section of the tick.
+            pitch_keys = tuple((tick[i], tick[i + 1])
+                               for i in range(FIRST_PITCH_INDEX, FIRST_PITCH_INDEX + 2 * number_of_notes, 2))
+
+            # create a new chord with these pitches.
+            element = self.element_factory.chord(pitch_keys)
+
+        # set the velocity of the note.
+        element.volume.velocity = DynamicConverter.vmf_to_velocity(tick[DYNAMIC_BIT])
+        # set the articulation
+        if tick[ARTICULATION_BIT] != 0:
+            element.articulations.append(self.element_factory.articulation(tick[ARTICULATION_BIT]))
+
+        return element
+
+def read_vmf_string(vmf_string, processes=1):
     """
     Reads VMF data from a string to a Score Stream.
 
     :param vmf_string: The contents of the VMF file as a string.
+    :param processes: The number of worker processes decoding the voices concurrently, 1 to decode
+    them in this process, or None for one per CPU. Small bodies are always decoded in this process.
     :return: A music21 score instance containing the music in the VMF file.
     """
 
-    parts_converted = {}
+    return read_vmf(json.loads(vmf_string), processes=processes)
+
+def find_first_measure_number(header):
+    """
+    Finds the number of the measure at the first tick of VMF data, from its measure index.
+
+    :param header: The header dictionary of the VMF data.
+    :return: The measure number, 1 when the header has no measure index.
+    """
+
+    for number, (offset, tick_number) in header.get('measure_index', {}).items():
+        if tick_number == 0:
+            return int(number)
+
+    return 1
+
+class _ScoreAssembler:
+    """
+    Places decoded voices in the parts of a score, in the order the voices come in the body.
+
+    The first voice of each part id takes the next part of the score, and the later ones
+    are added to that part as new voices.
+    """
+
+    def __init__(self, header, meters):
+        """
+        :param header: The header dictionary of the VMF data.
+        :param meters: The time signatures, as returned by read_meters.
+        """
+
+        self.header = header
+        self.meters = meters
+        self.first_measure_number = find_first_measure_number(header)
+        self.score = Score()
+
+        # The part of each part id.
+        self.parts_converted = {}
+        # The measure builder of each voice.
+        self.measures = {}
+
+        # create the parts and first measure.
+        for part_number in range(header['number_of_parts']):
+            part = Part()
+            voice = Voice()
+
+            part.append(voice)
+
+            self.score.append(part)
+
+    def add_voice(self, part_id, decode=True):
+        """
+        Finds the part of the next voice of the body, and adds the voice to it.
+
+        :param part_id: The part id of the voice.
+        :param decode: False to only account for the voice without adding it to the score.
+        :return: The _MeasureBuilder of the voice, or None if it is not decoded.
+        """
+
+        # Get the parent part if it exists.
+        try:
+            current_part = self.parts_converted[part_id]
+        except KeyError:
+            # Add it to our dictionary otherwise.
+            current_part = self.score.parts[len(self.parts_converted)]
+
+            self.parts_converted[part_id] = current_part
+
+        if not decode:
+            return None
 
-    vmf = json.loads(vmf_string)
+        voice = current_part.voices[-1]
 
-    # create a score
-    score = Score()
+        if voice in self.measures:
+            # add a new voice and write to it.
+            voice = Voice()
+            current_part.append(voice)
+
+            # The time signature is already in the first measure.
+            initial_key_signature = KeySignature(self.header['key_signature']['0.0'])
+            self.measures[voice] = _MeasureBuilder(voice, self.meters, self.first_measure_number)
+            self.measures[voice].add(Fraction(0), initial_key_signature)
+        else:
+            self.measures[voice] = _MeasureBuilder(voice, self.meters, self.first_measure_number)
+
+        return self.measures[voice]
+
+    def finish(self, remove_empty_parts=False):
+        """
+        Completes the voices that were not decoded, and adds the tempos and key signatures.
+
+        :param remove_empty_parts: True to leave out the parts without any decoded voice.
+        :return: The music21 score.
+        """
+
+        for part in list(self.score.parts):
+            if remove_empty_parts and not any(voice in self.measures for voice in part.voices):
+                self.score.remove(part)
+                continue
+
+            for voice in part.voices:
+                # Voices without any ticks still get a measure.
+                if voice not in self.measures:
+                    _MeasureBuilder(voice, self.meters, self.first_measure_number).finish()
+
+            for offset, t in sorted(self.header['tempo'].items()):
+                mm = tempo.MetronomeMark(number=t, referent=note.Note(type='quarter'))
+                voice.insert(offset, mm)
+
+            for offset, ks in sorted(self.header['key_signature'].items()):
+                voice.insert(offset, KeySignature(ks))
+
+        return self.score
+
+def read_vmf(vmf, element_factory=None, voice_numbers=None, processes=1):
+    """
+    Reads VMF data to a Score Stream.
+
+    :param vmf: A dictionary with the header and body of the VMF data. The body
+    may be any iterable over the ticks, such as a VMFBinaryFile, and is read once.
+    :param element_factory: The ElementFactory creating the notes and chords. A new one is used by default.
+    :param voice_numbers: The indexes of the voices to decode, or None for all of them.
+    Parts without any of these voices are left out of the score.
+    :param processes: The number of worker processes decoding the voices concurrently, 1 to decode
+    them in this process, or None for one per CPU. Small bodies, and bodies that are not lists,
+    are always decoded in this process. The score is the same either way.
+    :return: A music21 score instance containing the music in the VMF data.
+    """
+
+    if element_factory is None:
+        element_factory = ElementFactory()
+
+    header = vmf['header']
 
     # Get the initial data
-    number_of_parts = vmf['header']['number_of_parts']
-    number_of_voices = vmf['header']['number_of_voices']
-    smallest_note = float(Fraction(vmf['header']['tick_value']))
+    number_of_voices = header['number_of_voices']
+    tick_grid = TickGrid.from_header(header)
+    meters = read_meters(header['time_signature'])
+    run_length_encoded = header.get('body_encoding', BODY_ENCODING_PLAIN) == BODY_ENCODING_RLE
 
-    # create the parts and first measure.
-    for voice_number in range(number_of_parts):
-        part = Part()
-        voice = Voice()
+    if voice_numbers is None:
+        voice_numbers = range(number_of_voices)
 
-        part.append(voice)
+    voice_numbers = set(voice_numbers)
 
-        score.append(part)
+    assembler = _ScoreAssembler(header, meters)
 
     # get the body of the vmf
     body = vmf['body']
 
-    part_number = 0
+    if can_decode_in_parallel(vmf, processes):
+        # The voices are decoded by the workers, and their elements built here in the order of the body.
+        for part_id, elements in decode_voices_in_parallel(vmf, voice_numbers, processes):
+            measures = assembler.add_voice(part_id, elements is not None)
 
-    # We do this because we want to do each part at a time.
-    for voice_number in range(number_of_voices):
-        # Get all ticks for a given part.
-        part = [tick[voice_number] for tick in body]
+            if measures is None:
+                continue
 
-        current_element = None
-        current_voice = None
+            builder = _ElementBuilder(measures, element_factory)
 
-        # iterate over each tick
-        for tick in part:
+            for offset, quarter_length, tick, tied in elements:
+                builder.add(offset, quarter_length, tick, tied)
 
-            if current_voice is None:
-                # Get the parent part if it exists.
-                try:
-                    current_part = parts_converted[tick[-1]]
+            builder.finish()
+    elif header.get('body_layout', BODY_LAYOUT_TICK) == BODY_LAYOUT_VOICE:
+        # Decode one voice at a time. The ticks of the voices that are not requested are not read.
+        for voice_number, voice_body in enumerate(body):
+            # Runs of identical ticks are decoded at once, so plain voices are grouped into runs too.
+            runs = iter(voice_body if run_length_encoded else ((1, tick) for tick in voice_body))
 
-                    # add a new voice and write to it.
-                    voice = Voice()
+            first_run = next(runs, None)
 
-                    initial_key_signature = KeySignature(vmf['header']['key_signature']['0.0'])
-                    initial_time_signature = TimeSignature(vmf['header']['time_signature']['0.0'])
+            if first_run is None:
+                continue
 
-                    voice.append(initial_key_signature)
-                    voice.append(initial_time_signature)
+            # The first tick of the voice tells which part it belongs to.
+            measures = assembler.add_voice(first_run[1][INDEX_OF_PART_ID_BIT], voice_number in voice_numbers)
 
-                    current_part.append(voice)
+            if measures is None:
+                continue
 
-                except KeyError:
-                    # Add it to our dictionary otherwise.
-                    current_part = score.parts[part_number]
-                    part_number += 1
+            builder = _ElementBuilder(measures, element_factory)
+            decoder = _VoiceDecoder(tick_grid, builder.add)
 
-                    parts_converted[tick[-1]] = current_part
+            decoder.feed(first_run[1], first_run[0])
 
-                # Get the last voice.
-                current_voice = current_part.voices[-1]
+            for repeat_count, tick in runs:
+                decoder.feed(tick, repeat_count)
 
-            if tick[0] == 1:
-                if current_element is not None:
-                    # check for precision and adjust
-                    rounded = round(current_element.quarterLength)
-                    if abs(current_element.quarterLength - rounded) < PRECISION:
-                        current_element.quarterLength = rounded
+            decoder.finish()
+            builder.finish()
+    else:
+        # Runs of identical ticks are decoded at once, so plain bodies are grouped into runs too.
+        runs = body if run_length_encoded else ((1, row) for row in body)
 
-                    # append to the part
-                    current_voice.append(current_element)
+        decoders = None
 
-                # Find how many notes to write. This will always be an int.
-                number_of_notes = int(find_number_of_notes_in_tick(tick))
+        # Decode all voices in a single pass over the ticks, so the body can be streamed.
+        for repeat_count, row in runs:
 
-                if number_of_notes == 1:
-                    # create a new note
-                    current_element = Note(Pitch(pitchClass=tick[3], octave=tick[4]))
-                else:
-                    pitches = []
+            if decoders is None:
+                decoders = []
 
-                    # create the pitches.
-                    # From the beginning to the end of the pitch section of the tick.
-                    for i in range(FIRST_PITCH_INDEX, FIRST_PITCH_INDEX + 2 * number_of_notes, 2):
-                        pitch = Pitch(pitchClass=tick[i], octave=tick[i + 1])
-                        pitches.append(pitch)
+                # The first tick of each voice tells which part it belongs to.
+                for voice_number in range(number_of_voices):
+                    measures = assembler.add_voice(row[voice_number][INDEX_OF_PART_ID_BIT],
+                                                   voice_number in voice_numbers)
 
-                    # create a new chord with these pitches.
-                    current_element = Chord(pitches)
+                    if measures is not None:
+                        builder = _ElementBuilder(measures, element_factory)
+                        decoders.append((voice_number, _VoiceDecoder(tick_grid, builder.add), builder))
 
+            for voice_number, decoder, builder in decoders:
+                decoder.feed(row[voice_number], repeat_count)
 
-                # set the velocity of the note.
-                current_element.volume.velocity = DynamicConverter.vmf_to_velocity(tick[DYNAMIC_BIT])
-                # set the articulation
-                if tick[ARTICULATION_BIT] != 0:
-                    current_element.articulations.append(
-                        ArticulationConverter.vmf_to_articulation(tick[ARTICULATION_BIT]))
+        # Append the last elements in progress.
+        for voice_number, decoder, builder in decoders or []:
+            decoder.finish()
+            builder.finish()
 
-                # set the value for this tick.
-                current_element.quarterLength = smallest_note
-            elif tick[0] == 2:
-                # extend previous note
-                current_element.quarterLength += smallest_note
+    return assembler.finish(remove_empty_parts=len(voice_numbers) < number_of_voices)
 
-            elif tick[0] == 0 and (isinstance(current_element, note.Note) or current_element is None):
-                if current_element is not None:
-                    # check for precision and adjust
-                    rounded = round(current_element.quarterLength)
-                    if abs(current_element.quarterLength - rounded) < PRECISION:
-                        current_element.quarterLength = rounded
+def iter_voice_runs(vmf, voice_number):
+    """
+    Walks the ticks of one voice of VMF data held in lists, in any encoding and layout.
 
-                    # append to the part
-                    current_voice.append(current_element)
+    :param vmf: A dictionary with the header and body of the VMF data.
+    :param voice_number: The index of the voice.
+    :return: A generator over the (repeat_count, tick) runs of the voice.
+    """
 
-                # create new rest
-                current_element = Rest()
+    header = vmf['header']
+    body = vmf['body']
+    run_length_encoded = header.get('body_encoding', BODY_ENCODING_PLAIN) == BODY_ENCODING_RLE
 
-                # Set the value for this tick.
-                current_element.quarterLength = smallest_note
+    if header.get('body_layout', BODY_LAYOUT_TICK) == BODY_LAYOUT_VOICE:
+        voice_body = body[voice_number]
 
-            elif tick[0] == 0 and isinstance(current_element, note.Rest):
-                # extend previous rest.
-                current_element.quarterLength += smallest_note
+        return iter(voice_body if run_length_encoded else ((1, tick) for tick in voice_body))
 
-        # Append the last element in progress.
-        if current_element is not None:
-            # check for precision and adjust
-            rounded = round(current_element.quarterLength)
-            if abs(current_element.quarterLength - rounded) < PRECISION:
-                current_element.quarterLength = rounded
+    runs = body if run_length_encoded else ((1, row) for row in body)
 
-            # append to the part
-            current_voice.append(current_element)
+    return ((repeat_count, row[voice_number]) for repeat_count, row in runs)
 
-    # create the stream for time signature changes
-    time_signature_stream = Stream()
+def can_decode_in_parallel(vmf, processes):
+    """
+    Checks whether the voices of VMF data are decoded on a pool of worker processes.
 
-    for offset, time_signature_str in sorted(vmf['header']['time_signature'].items()):
-        time_signature = TimeSignature(time_signature_str)
-        time_signature_stream.append(time_signature)
-        time_signature_stream[-1].offset = float(offset)
+    The workers are forked so that they share the body instead of receiving a pickled copy,
+    so platforms without fork decode serially. So do bodies that are not lists, which may be
+    streamed, and bodies under PARALLEL_DECODE_MIN_RUNS, where starting the pool costs more
+    than it saves.
 
-    # finish up the file.
-    for part in score.parts:
-        for voice in part.voices:
-            voice.makeMeasures(inPlace=True, meterStream=time_signature_stream)
+    :param vmf: A dictionary with the header and body of the VMF data.
+    :param processes: The number of worker processes, 1 for none, or None for one per CPU.
+    :return: True if the voices are decoded in parallel.
+    """
+
+    header = vmf['header']
+    body = vmf['body']
+
+    if processes == 1 or header['number_of_voices'] < 2 or not isinstance(body, list):
+        return False
+
+    if find_fork_context() is None:
+        return False
+
+    if header.get('body_layout', BODY_LAYOUT_TICK) == BODY_LAYOUT_VOICE:
+        number_of_runs = sum(len(voice_body) for voice_body in body)
+    else:
+        number_of_runs = len(body) * header['number_of_voices']
+
+    return number_of_runs >= PARALLEL_DECODE_MIN_RUNS
+
+def decode_voices_in_parallel(vmf, voice_numbers, processes=None):
+    """
+    Decodes the voices of VMF data concurrently, one voice per task of a pool of forked processes.
+
+    The workers return the elements of their voices as plain values, which are cheap to send
+    back, unlike music21 objects.
+
+    :param vmf: A dictionary with the header and body of the VMF data, with the body in lists.
+    :param voice_numbers: The set of the indexes of the voices to decode.
+    :param processes: The number of worker processes, or None for one per CPU. There are never
+    more workers than voices to decode.
+    :return: A list with the part id of each voice of the body that has ticks, in order, and
+    its elements as (offset, quarter length, tick, tied) tuples, or None if it is not decoded.
+    """
+
+    header = vmf['header']
+
+    part_ids = []
+
+    # The first tick of each voice tells which part it belongs to. Voices without ticks are left out.
+    for voice_number in range(header['number_of_voices']):
+        first_run = next(iter_voice_runs(vmf, voice_number), None)
+
+        if first_run is not None:
+            part_ids.append((voice_number, first_run[1][INDEX_OF_PART_ID_BIT]))
+
+    decoded = [voice_number for voice_number, part_id in part_ids if voice_number in voice_numbers]
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    # The data reaches the workers through the initializer, which forked workers inherit instead of unpickling.
+    pool = find_fork_context().Pool(max(1, min(processes, len(decoded))), _init_decode_worker, (vmf,))
+
+    try:
+        voices = dict(zip(decoded, pool.map(_decode_voice_task, decoded)))
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return [(part_id, voices.get(voice_number)) for voice_number, part_id in part_ids]
+
+def find_fork_context():
+    """
+    Finds the multiprocessing context whose workers are forked, and so share the memory of this process.
+
+    :return: The context, or None on platforms without fork.
+    """
+
+    # Before Python 3.4, the processes of a pool are always forked on POSIX systems.
+    if not hasattr(multiprocessing, 'get_all_start_methods'):
+        return multiprocessing if os.name == 'posix' else None
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+
+    return multiprocessing.get_context('fork')
+
+def _init_decode_worker(vmf):
+    """
+    Keeps the VMF data of a decoding pool in one of its worker processes.
+
+    :param vmf: A dictionary with the header and body of the VMF data.
+    """
+
+    global _worker_vmf
+
+    _worker_vmf = vmf
+
+def _decode_voice_task(voice_number):
+    """
+    Decodes a voice of the VMF data held by a worker process.
 
-        for offset, t in sorted(vmf['header']['tempo'].items()):
-            mm = tempo.MetronomeMark(number=t, referent=note.Note(type='quarter'))
-            voice.insert(offset, mm)
+    :param voice_number: The index of the voice.
+    :return: The elements of the voice, as (offset, quarter length, tick, tied) tuples.
+    """
+
+    elements = []
+
+    decoder = _VoiceDecoder(TickGrid.from_header(_worker_vmf['header']),
+                            lambda offset, quarter_length, tick, tied: elements.append(
+                                (offset, quarter_length, tick, tied)))
+
+    for repeat_count, tick in iter_voice_runs(_worker_vmf, voice_number):
+        decoder.feed(tick, repeat_count)
 
-        for offset, ks in sorted(vmf['header']['key_signature'].items()):
-            voice.insert(offset, KeySignature(ks))
+    decoder.finish()
 
-    return score
+    return elements
 
 def read_vmf_file(vmf_score):
     """
@@ -212,10 +763,33 @@ def read_vmf_file(vmf_score):
     :return: A music21 score instance containing the music in the VMF file.
     """
 
+    if is_vmf_binary_file(vmf_score):
+        with VMFBinaryFile(vmf_score) as binary_file:
+            return read_vmf({'header': binary_file.header, 'body': binary_file})
+
+    # Decode the rows as they are parsed instead of loading the whole document.
     with open(vmf_score, 'r') as file:
-        file_contents = file.read()
+        header, rows = read_vmf_stream(file)
+
+        return read_vmf({'header': header, 'body': rows})
 
-        return read_vmf_string(file_contents)
+def fraction_gcd(values):
+    """
+    Finds the greatest common divisor of fractions, the largest fraction of which they are all multiples.
+
+    :param values: An iterable over Fractions.
+    :return: The greatest common divisor as a Fraction, or 0 if all the values are 0.
+    """
+
+    numerator = 0
+    denominator = 1
+
+    for value in values:
+        # For reduced fractions, gcd(a/b, c/d) = gcd(a, c) / lcm(b, d).
+        numerator = gcd(numerator, value.numerator)
+        denominator = lcm(denominator, value.denominator)
+
+    return Fraction(numerator, denominator)
 
 def scan_score_durations(score):
     """
@@ -223,18 +797,26 @@ def scan_score_durations(score):
     This scan determines the smallest note value necessary to accurately
     encode the score in vmf.
 
+    The tick is the greatest common divisor of all the durations and offsets of
+    the notes and rests and of the pickup paddings, computed exactly, so it is
+    the coarsest grid on which every one of them falls.
+
     :param score: The input score stream to analyze.
-    :return: An integer denoting the smallest fraction of a quarter note
+    :return: A Fraction denoting the smallest fraction of a quarter note
     necessary to accurately encode the score in vmf.
     """
-    # Flatten the score into one stream and extract the notes and rests.
-    notes_and_rests = score.flat.notesAndRests
 
-    # Set comprehension: Get a set of durations in the measure.
-    durations = {element.duration.quarterLength for element in notes_and_rests}
+    index = ScoreIndex.for_score(score)
+
+    values = [to_exact_quarter_length(value) for value in itertools.chain(index.durations, index.offsets, index.paddings)]
+
+    tick_value = fraction_gcd(values)
 
-    # We need a list, not a set. Convert here. The GCD is the largest common subdivision we can use.
-    return approximateGCD(list(durations))
+    # A score without any durations only needs whole quarter notes.
+    if tick_value == 0:
+        return Fraction(1)
+
+    return tick_value
 
 
 def scan_score_for_largest_chord(score):
@@ -246,17 +828,8 @@ def scan_score_for_largest_chord(score):
     :return: An integer denoting the size of the largest chord.
     """
 
-    # Flatten the score into one stream and extract the chords.
-    chords = [element for element in score.flat.notes.elements if isinstance(element, chord.Chord)]
-
-    largest_size = 0
-
-    # Find the largest chord size.
-    for current_chord in chords:
-        largest_size = max(current_chord.multisetCardinality, largest_size)
-
     # If there are no chords, largest size comes out as 0.
-    return max(largest_size, 1)
+    return max(ScoreIndex.for_score(score).largest_chord, 1)
 
 
 def convert_voices_to_parts(score, id_map):
@@ -293,6 +866,10 @@ def convert_voices_to_parts(score, id_map):
 
         next_part_id += 1
 
+    # Leave the score untouched when no part has voices, so that its cached index stays valid.
+    if len(parts_to_insert) == 0:
+        return
+
     new_parts = list(score.parts)
 
     # Iterate over the parts_to_insert in reverse, otherwise
@@ -317,28 +894,60 @@ def scan_score_for_number_of_voices(score):
     :return: The number of parts in the score.
     """
 
-    number_of_parts = 0
+    return ScoreIndex.for_score(score).number_of_voices
 
-    for part in score.parts:
-        voices_in_part = 0
-        for current_measure in part.getElementsByClass(stream.Measure):
-            voices_in_measure = len(current_measure.voices)
 
-            # If there is only 1 voice, then we have 0 voice objects.
-            if voices_in_measure == 0:
-                voices_in_measure = 1
+def build_vmf_header(score, smallest_note, number_of_parts, tick_grid=None):
+    """
+    Builds the header of a VMF file from the score index.
+
+    :param score: The music21 score being converted.
+    :param smallest_note: The tick value, as a fraction of a quarter note.
+    :param number_of_parts: The number of parts in the original score.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :return: A dictionary containing the VMF header.
+    """
+
+    index = ScoreIndex.for_score(score)
+
+    header = {}
 
-            voices_in_part = max(voices_in_part, voices_in_measure)
-        number_of_parts += voices_in_part
+    # Get a string of the fraction representation. The tick value is exact (ie 1/3).
+    header['tick_value'] = str(to_exact_quarter_length(smallest_note))
+    header['number_of_voices'] = index.number_of_voices
+    header['number_of_parts'] = number_of_parts
+
+    header['time_signature'] = {}
+
+    # Get the time signatures.
+    for offset, time_signature in index.time_signatures:
+        header['time_signature'][str(offset)] = time_signature.ratioString
 
-    return number_of_parts
+    header['key_signature'] = {}
 
-def convert_score_to_vmf(score):
+    # Get the key signatures
+    for offset, key_signature in index.key_signatures:
+        header['key_signature'][str(offset)] = key_signature.sharps
+
+    header['tempo'] = {}
+
+    for offset, t in index.tempos:
+        header['tempo'][str(offset)] = t.getQuarterBPM()
+
+    # A single section is the same as a global tick value.
+    if tick_grid is not None and not tick_grid.is_uniform:
+        header['tick_values'] = tick_grid.to_dict()
+
+    return header
+
+def prepare_score_for_vmf(score):
     """
-    Converts a MIDI file to an vmf file.
+    Scans a score and brings it into the shape the VMF encoder expects.
+    Polyphonic voices are replaced by parts and parts without measures are measured.
 
-    :param score: The music21 score to convert to VMF.
-    :return: A dictionary containing the VMF data structure.
+    :param score: The music21 score to prepare. It is modified in place.
+    :return: A tuple of the tick value, the size of the largest chord, the number of
+    parts in the original score and the mapping of music21 ids to vmf part ids.
     """
 
     # Mapping of music21 id to vmf ids
@@ -355,183 +964,836 @@ def convert_score_to_vmf(score):
 
     convert_voices_to_parts(score, id_map)
 
+    for part in score.parts:
+        # Some sequencers don't create measures.
+        if len(part.getElementsByClass('Measure')) == 0:
+            part.makeMeasures(inPlace=True)
+
+            # The part changed underneath the score, so its cached index is stale.
+            score._elementsChanged()
+
+    return smallest_note, largest_chord, number_of_parts, id_map
+
+
+def find_pickup_padding(part):
+    """
+    Finds the padding encoded before the first element of a part, for its pickup measure.
+
+    :param part: The measured music21 part.
+    :return: The padding in quarter lengths as a Fraction, or None if the part has no pickup measure.
+    """
+
+    first_measure = part.getElementsByClass('Measure')[0]
+
+    if first_measure.number == 0 or first_measure.paddingLeft > 0:
+        return to_exact_quarter_length(first_measure.paddingLeft)
+
+    return None
+
+
+def iter_part_spans(part):
+    """
+    Walks a part and yields the offsets spanned by its pickup padding and by each of its encoded elements.
+
+    :param part: The measured music21 part.
+    :return: A generator over (start, end) pairs of Fractions, counted from the start of the body.
+    """
+
+    position = find_pickup_padding(part)
+
+    if position is None:
+        position = Fraction(0)
+    else:
+        yield Fraction(0), position
+
+    for element in part.flat:
+        if isinstance(element, (note.Note, chord.Chord, note.Rest)):
+            start = position
+            position += to_exact_quarter_length(element.duration.quarterLength)
+
+            yield start, position
+
+
+def scan_score_tick_sections(score):
+    """
+    Scans a prepared score for the coarsest tick value of each of its sections.
+
+    Sections start at the measures of the parts. The tick value of a section is the greatest
+    common divisor of its length and of the offsets, within it, of the starts and ends of the
+    elements overlapping it. Consecutive sections with the same tick value are merged, so a
+    single tuplet only refines the grid of the measures it is in.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :return: A list of (offset, tick value) pairs of Fractions, starting at offset 0. The
+    offsets count from the start of the body, pickup padding included.
+    """
+
+    boundaries = {Fraction(0)}
+    # The (start, end) offsets of the padding and elements of every part.
+    spans = []
+
+    for part in score.parts:
+        padding = find_pickup_padding(part) or Fraction(0)
+
+        for measure in part.getElementsByClass('Measure'):
+            boundaries.add(padding + to_exact_quarter_length(measure.offset))
+
+        spans.extend(iter_part_spans(part))
+
+    end = max([span_end for span_start, span_end in spans] + [Fraction(0)])
+
+    # A score without any durations only needs whole quarter notes.
+    if end == 0:
+        return [(Fraction(0), Fraction(1))]
+
+    starts = sorted(boundary for boundary in boundaries if boundary < end)
+    stops = starts[1:] + [end]
+
+    # Every section is a whole number of its ticks long.
+    values = [[stop - start] for start, stop in zip(starts, stops)]
+
+    for span_start, span_end in spans:
+        # Add the span to each section it overlaps, or to the one it starts in if it is empty.
+        section = bisect.bisect_right(starts, span_start) - 1
+
+        while True:
+            values[section].append(span_start - starts[section])
+
+            if span_end <= stops[section]:
+                values[section].append(span_end - starts[section])
+                break
+
+            section += 1
+            span_start = starts[section]
+
+    sections = []
+
+    for start, section_values in zip(starts, values):
+        tick_value = fraction_gcd(section_values)
+
+        if len(sections) == 0 or sections[-1][1] != tick_value:
+            sections.append((start, tick_value))
+
+    return sections
+
+
+def select_tick_grid(score, smallest_note, adaptive_resolution=False):
+    """
+    Selects the tick grid of a prepared score.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :param smallest_note: The tick value of the whole score, as a fraction of a quarter note.
+    :param adaptive_resolution: Whether the tick value may change between measures.
+    :return: A TickGrid instance.
+    """
+
+    if adaptive_resolution:
+        return TickGrid(scan_score_tick_sections(score))
+
+    return TickGrid.uniform(smallest_note)
+
+
+def build_measure_index(score, tick_grid):
+    """
+    Builds the index of the measures of a prepared score, for seeking into the body.
+
+    The measures are those of the first part. A pickup measure starts at offset 0, with its padding.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :param tick_grid: The TickGrid of the body.
+    :return: A dictionary mapping measure number strings to [offset, tick number] pairs, in the
+    form of the measure_index of a VMF header.
+    """
+
+    measure_index = {}
+
+    if len(score.parts) == 0:
+        return measure_index
+
+    part = score.parts[0]
+    padding = find_pickup_padding(part) or Fraction(0)
+
+    for measure in part.getElementsByClass('Measure'):
+        # Repeated numbers keep the first measure.
+        if str(measure.number) in measure_index:
+            continue
+
+        offset = Fraction(0) if len(measure_index) == 0 else padding + to_exact_quarter_length(measure.offset)
+
+        measure_index[str(measure.number)] = [float(offset), tick_grid.tick_number(offset)]
+
+    return measure_index
+
+
+def scan_score_extent(score):
+    """
+    Scans a prepared score for the extent of its body.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :return: A tuple of the list of the end offsets of the parts, as Fractions, and the number
+    of their encoded elements, pickup paddings included.
+    """
+
+    part_ends = []
+    number_of_elements = 0
+
+    for part in score.parts:
+        part_end = Fraction(0)
+
+        for span_start, part_end in iter_part_spans(part):
+            number_of_elements += 1
+
+        part_ends.append(part_end)
+
+    return part_ends, number_of_elements
+
+
+def count_body_ticks(part_ends, tick_grid):
+    """
+    Counts the ticks of a body, which runs to the end of its longest voice.
+
+    :param part_ends: The end offsets of the voices, as Fractions, as scan_score_extent returns them.
+    :param tick_grid: The TickGrid of the body.
+    :return: The number of ticks of every voice of the body.
+    """
+
+    return max([tick_grid.tick_number(part_end) for part_end in part_ends] + [0])
+
+
+def measure_vmf_cost(header, tick_grid, largest_chord, extent, body_encoding=BODY_ENCODING_PLAIN):
+    """
+    Predicts the size of the encoding of a prepared score on a tick grid.
+
+    :param header: The header dictionary of the encoding.
+    :param tick_grid: The TickGrid of the body.
+    :param largest_chord: The size of the largest chord in the score.
+    :param extent: The extent of the body, as returned by scan_score_extent.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :return: A VMFCost instance.
+    """
+
+    part_ends, number_of_elements = extent
+
+    # The encoder pads every voice to the same number of ticks.
+    number_of_ticks = count_body_ticks(part_ends, tick_grid)
+
+    # Each element is at most an onset run followed by a sustain run.
+    return VMFCost(number_of_ticks, header['number_of_voices'], largest_chord,
+                   number_of_runs=2 * number_of_elements,
+                   header_bytes=len(json.dumps(header)),
+                   body_encoding=body_encoding)
+
+
+def estimate_vmf_cost(score, body_encoding=BODY_ENCODING_PLAIN, adaptive_resolution=False):
+    """
+    Predicts the size of the VMF encoding of a score from its scan, without encoding any tick.
+    The score is prepared in place, as it is for encoding.
+
+    :param score: The music21 score to convert to VMF.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param adaptive_resolution: Whether the tick value may change between measures.
+    :return: A VMFCost instance, with the tick count, row width, JSON size and memory of the body.
+    """
+
+    smallest_note, largest_chord, number_of_parts, id_map = prepare_score_for_vmf(score)
+
+    tick_grid = select_tick_grid(score, smallest_note, adaptive_resolution)
+    header = build_vmf_header(score, tick_grid.tick_values[0], number_of_parts, tick_grid)
+
+    return measure_vmf_cost(header, tick_grid, largest_chord, scan_score_extent(score), body_encoding)
+
+
+def iter_coarser_tick_values(tick_value):
+    """
+    Walks the tick values coarser than a given one, from the finest, that keep its grid.
+
+    The multiples of the tick value that divide a quarter note come first, so that notes
+    on the quarter note grid stay exact. Doublings of the quarter note follow.
+
+    :param tick_value: The tick value, as a Fraction.
+    :return: An endless generator over the coarser tick values, as Fractions.
+    """
+
+    for factor in range(2, tick_value.denominator + 1):
+        if tick_value.denominator % factor == 0:
+            yield tick_value * factor
+
+    coarse_tick_value = tick_value * tick_value.denominator
+
+    while True:
+        coarse_tick_value *= 2
+
+        yield coarse_tick_value
+
+
+def fit_tick_grid(extent, tick_grid, smallest_note, largest_chord, header, body_encoding=BODY_ENCODING_PLAIN,
+                  max_ticks=None, max_bytes=None, coarsen=False):
+    """
+    Checks that the encoding of a score fits in a budget, before any tick is encoded.
+
+    A grid over the budget is replaced, when coarsen is set, by the finest uniform grid of
+    iter_coarser_tick_values that fits. Elements then start and end on the tick their offsets
+    fall in, and the ones shorter than a tick may be lost.
+
+    :param extent: The extent of the body, as returned by scan_score_extent.
+    :param tick_grid: The TickGrid selected for the body.
+    :param smallest_note: The tick value of the whole score, as a fraction of a quarter note.
+    :param largest_chord: The size of the largest chord in the score.
+    :param header: The header dictionary of the encoding on tick_grid.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest JSON size allowed, or None for no limit.
+    :param coarsen: Whether to fall back to a coarser grid instead of failing.
+    :return: The TickGrid to encode the body on.
+    """
+
+    cost = measure_vmf_cost(header, tick_grid, largest_chord, extent, body_encoding)
+
+    if not cost.exceeds(max_ticks, max_bytes):
+        return tick_grid
+
+    if coarsen:
+        for tick_value in iter_coarser_tick_values(to_exact_quarter_length(smallest_note)):
+            coarse_grid = TickGrid.uniform(tick_value)
+            coarse_cost = measure_vmf_cost(header, coarse_grid, largest_chord, extent, body_encoding)
+
+            if not coarse_cost.exceeds(max_ticks, max_bytes):
+                return coarse_grid
+
+            # The header alone is over the budget.
+            if coarse_cost.number_of_ticks <= 1:
+                break
+
+    raise ValueError("Encoding needs %d ticks and about %d bytes, over the budget" % (
+        cost.number_of_ticks, cost.json_bytes))
+
+
+def iter_part_runs(part, smallest_note, largest_chord, part_id, tick_grid=None, number_of_ticks=None):
+    """
+    Walks a part and yields the runs of ticks encoding each of its elements.
+
+    Each run is a tuple (n_frames, first_tick, tick), where first_tick is the first
+    tick of the run and tick is repeated for each of the remaining n_frames - 1 ticks.
+
+    :param part: The measured music21 part to encode.
+    :param smallest_note: The tick value, as a fraction of a quarter note.
+    :param largest_chord: The size of the largest chord in the score.
+    :param part_id: The vmf part id of the part.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    It overrides smallest_note.
+    :param number_of_ticks: The number of ticks of the body, as count_body_ticks returns it, or None.
+    :return: A generator over the runs of ticks of the part.
+    """
+
+    if tick_grid is None:
+        tick_grid = TickGrid.uniform(smallest_note)
+
+    return iter_element_runs(iter_part_elements(part), largest_chord, part_id, tick_grid, find_pickup_padding(part),
+                             number_of_ticks)
+
+
+def iter_part_elements(part):
+    """
+    Walks a part and yields the notes, chords and rests to encode, in the form iter_element_runs takes.
+
+    :param part: The measured music21 part.
+    :return: A generator over (quarter length, velocity, pitches, tied) tuples. The pitches are
+    (pitch class, octave) pairs, or None for a rest, and tied is whether a tie starts at the element.
+    """
+
+    for element in part.flat:
+        if isinstance(element, note.Note) or isinstance(element, chord.Chord):
+            yield (element.duration.quarterLength, element.volume.velocity,
+                   [(pitch.pitchClass, pitch.octave) for pitch in element.pitches],
+                   element.tie is not None and element.tie.type == 'start')
+
+        elif isinstance(element, note.Rest):
+            yield element.duration.quarterLength, None, None, False
+
+
+def iter_element_runs(elements, largest_chord, part_id, tick_grid, padding=None, number_of_ticks=None):
+    """
+    Yields the runs of ticks encoding a sequence of elements, laid out one after the other.
+
+    Each run is a tuple (n_frames, first_tick, tick), where first_tick is the first
+    tick of the run and tick is repeated for each of the remaining n_frames - 1 ticks.
+
+    :param elements: The elements, as (quarter length, velocity, pitches, tied) tuples in the
+    form iter_part_elements yields them.
+    :param largest_chord: The size of the largest chord in the score.
+    :param part_id: The vmf part id of the elements.
+    :param tick_grid: The TickGrid of the body.
+    :param padding: The padding of the pickup measure before the first element, or None.
+    :param number_of_ticks: The number of ticks of the body, or None. Elements ending before it
+    are followed by a rest up to it, so that every voice of the body has the same length.
+    :return: A generator over the runs of ticks of the elements.
+    """
+
     tie_active = False
 
-    parts = []
+    # The elements are counted in ticks from their offsets, since the tick value may change between them.
+    position = Fraction(0)
+    start_tick = 0
+
+    # Check for a pickup measure.
+    if padding is not None:
+        position = padding
+        start_tick = tick_grid.tick_number(position)
+
+        # Pad out the anacrusis, with all note positions empty and the part id last.
+        tick = [0, 1, 0] + [0, 0] * largest_chord + [part_id]
+
+        yield start_tick, tick, tick
+
+    for quarter_length, velocity, pitches, tied in elements:
+        position += to_exact_quarter_length(quarter_length)
+        end_tick = tick_grid.tick_number(position)
+        n_frames = end_tick - start_tick
+        start_tick = end_tick
+
+        if pitches is None:
+            # All note positions are empty, and the part id comes last.
+            tick = [0, 0, 0] + [0, 0] * largest_chord + [part_id]
+
+            yield n_frames, tick, tick
+            continue
+
+        dynamic = DynamicConverter.velocity_to_vmf(velocity)
+
+        tick = [2, dynamic, 0]
+
+        # add in each pitch.
+        for pitch_class, octave in pitches:
+            tick.append(pitch_class)
+            tick.append(octave)
+
+        # Pad remaining note positions for chords smaller than largest.
+        for i in range(largest_chord - len(pitches)):
+            tick.append(-1)
+            tick.append(-1)
+
+        # Finally, add the part id.
+        tick.append(part_id)
+
+        # A tied note continues the previous one instead of sounding again.
+        first_tick = list(tick)
+        if not tie_active:
+            first_tick[0] = 1
+
+        yield n_frames, first_tick, tick
+
+        # a tie can only begin or end at a new note.
+        if n_frames > 0:
+            tie_active = tied
+
+    # Pad out a voice shorter than the body with a rest.
+    if number_of_ticks is not None and start_tick < number_of_ticks:
+        tick = [0, 0, 0] + [0, 0] * largest_chord + [part_id]
+
+        yield number_of_ticks - start_tick, tick, tick
+
+
+def iter_part_ticks(part, smallest_note, largest_chord, part_id, tick_grid=None, number_of_ticks=None):
+    """
+    Encodes a part one tick at a time.
+
+    :param part: The measured music21 part to encode.
+    :param smallest_note: The tick value, as a fraction of a quarter note.
+    :param largest_chord: The size of the largest chord in the score.
+    :param part_id: The vmf part id of the part.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :param number_of_ticks: The number of ticks of the body, or None to end with the part.
+    :return: A generator with one tick per frame of the part.
+    """
+
+    return iter_run_ticks(iter_part_runs(part, smallest_note, largest_chord, part_id, tick_grid, number_of_ticks))
+
+
+def iter_run_ticks(runs):
+    """
+    Expands runs of ticks, as iter_element_runs yields them, into one tick per frame.
+
+    :param runs: The runs of ticks of a voice.
+    :return: A generator with one tick per frame of the voice.
+    """
+
+    for n_frames, first_tick, tick in runs:
+        if n_frames > 0:
+            yield list(first_tick)
+
+            for i in range(n_frames - 1):
+                yield list(tick)
+
+
+def iter_vmf_body(score, smallest_note, largest_chord, id_map, tick_grid=None, number_of_ticks=None):
+    """
+    Encodes the body of a prepared score one row at a time.
+    The parts are encoded in lockstep, so only the current row is held in memory.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :param smallest_note: The tick value, as a fraction of a quarter note.
+    :param largest_chord: The size of the largest chord in the score.
+    :param id_map: The mapping of music21 ids to vmf part ids.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :param number_of_ticks: The number of ticks of the body, or None to count them from the score.
+    Parts ending before it are padded with a rest.
+    :return: A generator over the rows of the body, each a list with one tick per voice.
+    """
+
+    if number_of_ticks is None:
+        number_of_ticks = count_body_ticks(scan_score_extent(score)[0], tick_grid or TickGrid.uniform(smallest_note))
+
+    parts = [iter_part_ticks(part, smallest_note, largest_chord, id_map[part.id], tick_grid, number_of_ticks)
+             for part in score.parts]
+
+    for tick in zip(*parts):
+        yield list(tick)
+
+
+def iter_part_run_length_encoded(part, smallest_note, largest_chord, part_id, tick_grid=None, number_of_ticks=None):
+    """
+    Encodes a part as [repeat_count, tick] runs, without expanding its ticks.
+    The runs are the same as run-length encoding the ticks of iter_part_ticks.
+
+    :param part: The measured music21 part to encode.
+    :param smallest_note: The tick value, as a fraction of a quarter note.
+    :param largest_chord: The size of the largest chord in the score.
+    :param part_id: The vmf part id of the part.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :param number_of_ticks: The number of ticks of the body, or None to end with the part.
+    :return: A generator over the runs of the part.
+    """
+
+    return iter_run_length_encoded_runs(iter_part_runs(part, smallest_note, largest_chord, part_id, tick_grid,
+                                                       number_of_ticks))
+
+
+def iter_run_length_encoded_runs(runs):
+    """
+    Merges runs of ticks, as iter_element_runs yields them, into [repeat_count, tick] runs.
+
+    :param runs: The runs of ticks of a voice.
+    :return: A generator over the runs of the voice, the same as run-length encoding its ticks.
+    """
+
+    current_run = None
+
+    for n_frames, first_tick, tick in runs:
+        if n_frames == 0:
+            continue
+
+        for repeat_count, row in ((1, first_tick), (n_frames - 1, tick)):
+            if repeat_count == 0:
+                continue
+
+            # Runs of elements with the same ticks, such as tied notes, are merged.
+            if current_run is not None and current_run[1] == row:
+                current_run[0] += repeat_count
+            else:
+                if current_run is not None:
+                    yield current_run
+
+                current_run = [repeat_count, list(row)]
+
+    if current_run is not None:
+        yield current_run
+
+
+def iter_vmf_voices(score, smallest_note, largest_chord, id_map, body_encoding=BODY_ENCODING_PLAIN, tick_grid=None,
+                    number_of_ticks=None):
+    """
+    Encodes the body of a prepared score in the voice layout, one voice at a time.
+    Each voice is encoded on its own, so nothing has to be transposed.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :param smallest_note: The tick value, as a fraction of a quarter note.
+    :param largest_chord: The size of the largest chord in the score.
+    :param id_map: The mapping of music21 ids to vmf part ids.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param tick_grid: The TickGrid of the body, when its tick value changes between sections.
+    :param number_of_ticks: The number of ticks of the body, or None to count them from the score.
+    Parts ending before it are padded with a rest, as in the tick layout.
+    :return: A generator over the voices of the body, each a list of its ticks or runs.
+    """
+
+    if number_of_ticks is None:
+        number_of_ticks = count_body_ticks(scan_score_extent(score)[0], tick_grid or TickGrid.uniform(smallest_note))
 
     for part in score.parts:
-        pitches = []
+        if body_encoding == BODY_ENCODING_RLE:
+            yield list(iter_part_run_length_encoded(part, smallest_note, largest_chord, id_map[part.id], tick_grid,
+                                                    number_of_ticks))
+        else:
+            yield list(iter_part_ticks(part, smallest_note, largest_chord, id_map[part.id], tick_grid,
+                                       number_of_ticks))
 
-        measures = part.getElementsByClass('Measure')
 
-        # Some sequencers don't create measures.
-        if len(measures) is 0:
-            part.makeMeasures(inPlace=True)
-            measures = part.getElementsByClass('Measure')
+def can_encode_in_parallel(score, processes):
+    """
+    Checks whether the parts of a prepared score can be encoded on a pool of worker processes.
 
-        # Check for a pickup measure.
-        first_measure = measures[0]
+    The workers are forked so that they share the parts of the score, which music21 cannot
+    pickle cheaply, so platforms without fork encode serially.
 
-        if first_measure.number is 0 or first_measure.paddingLeft > 0:
-            n_frames = first_measure.paddingLeft / smallest_note
-            # Pad out the anacrusis.
-            for i in range(int(n_frames)):
-                pitches.append([0, 1, 0])
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :param processes: The number of worker processes, 1 for none, or None for one per CPU.
+    :return: True if the parts are encoded in parallel.
+    """
 
-                # Pad remaining note positions:
-                for i in range(largest_chord):
-                    pitches[-1].append(0)
-                    pitches[-1].append(0)
+    return processes != 1 and len(score.parts) > 1 and find_fork_context() is not None
 
-                # Finally add the part id.
-                pitches[-1].append(id_map[part.id])
 
-        for element in part.flat:
-            if isinstance(element, note.Note):
+def encode_parts_in_parallel(score, largest_chord, id_map, tick_grid, number_of_ticks, processes=None):
+    """
+    Encodes the parts of a prepared score concurrently, one part per task of a pool of forked processes.
+
+    The scan results are computed once and handed to the workers, which return the runs of
+    their parts. The runs are the same as those of iter_part_run_length_encoded.
+
+    :param score: The music21 score, as returned by prepare_score_for_vmf.
+    :param largest_chord: The size of the largest chord in the score.
+    :param id_map: The mapping of music21 ids to vmf part ids.
+    :param tick_grid: The TickGrid of the body.
+    :param number_of_ticks: The number of ticks of the body, as count_body_ticks returns it.
+    :param processes: The number of worker processes, or None for one per CPU. There are never
+    more workers than parts.
+    :return: A list with the [repeat_count, tick] runs of each part, in order.
+    """
 
-                n_frames = element.duration.quarterLength / smallest_note
+    parts = list(score.parts)
 
-                for i in range(int(n_frames)):
+    if processes is None:
+        processes = multiprocessing.cpu_count()
 
-                    dynamic = DynamicConverter.velocity_to_vmf(element.volume.velocity)
+    tasks = [(part_number, largest_chord, id_map[part.id], tick_grid, number_of_ticks)
+             for part_number, part in enumerate(parts)]
 
-                    if i == 0:
-                        if not tie_active:
-                            pitches.append([1, dynamic, 0, element.pitchClass, element.octave])
-                        else:
-                            pitches.append([2, dynamic, 0, element.pitchClass, element.octave])
+    # The parts reach the workers through the initializer, which forked workers inherit instead of unpickling.
+    pool = find_fork_context().Pool(max(1, min(processes, len(parts))), _init_encode_worker, (parts,))
 
-                        # Pad remaining note positions for chords smaller than largest.
-                        for i in range(largest_chord - 1):
-                            pitches[-1].append(-1)
-                            pitches[-1].append(-1)
+    try:
+        return pool.map(_encode_part_task, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
 
-                        # Finally, add the part id.
-                        pitches[-1].append(id_map[part.id])
 
-                        # a tie can only begin or end at a new note.
-                        if element.tie is not None and element.tie.type == 'start':
-                            tie_active = True
-                        else:
-                            tie_active = False
-                    else:
-                        pitches.append([2, dynamic, 0, element.pitchClass, element.octave])
+def iter_parallel_vmf_body(part_runs):
+    """
+    Merges the runs of the parts encoded by encode_parts_in_parallel into the rows of the body.
 
-                        # Pad remaining note positions for chords smaller than largest.
-                        for i in range(largest_chord - 1):
-                            pitches[-1].append(-1)
-                            pitches[-1].append(-1)
+    :param part_runs: The [repeat_count, tick] runs of each part.
+    :return: A generator over the rows of the body, the same as iter_vmf_body yields them.
+    """
 
-                        # Add the part id
-                        pitches[-1].append(id_map[part.id])
+    parts = [iter_run_ticks((repeat_count, tick, tick) for repeat_count, tick in runs) for runs in part_runs]
 
-            elif isinstance(element, chord.Chord):
-                n_frames = element.duration.quarterLength / smallest_note
+    for tick in zip(*parts):
+        yield list(tick)
 
-                for i in range(int(n_frames)):
 
-                    dynamic = DynamicConverter.velocity_to_vmf(element.volume.velocity)
+def iter_parallel_vmf_voices(part_runs, body_encoding=BODY_ENCODING_PLAIN):
+    """
+    Lays out the runs of the parts encoded by encode_parts_in_parallel as the voices of the body.
 
-                    if i == 0:
-                        if not tie_active:
-                            current_chord = [1, dynamic, 0]
+    :param part_runs: The [repeat_count, tick] runs of each part.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :return: A generator over the voices of the body, the same as iter_vmf_voices yields them.
+    """
 
-                            # add in each pitch.
-                            for pitch in element.pitches:
-                                current_chord.append(pitch.pitchClass)
-                                current_chord.append(pitch.octave)
+    for runs in part_runs:
+        if body_encoding == BODY_ENCODING_RLE:
+            yield runs
+        else:
+            yield list(iter_run_ticks((repeat_count, tick, tick) for repeat_count, tick in runs))
 
-                            # Pad remaining note positions for chords smaller than largest.
-                            for i in range(largest_chord - element.multisetCardinality):
-                                current_chord.append(-1)
-                                current_chord.append(-1)
 
-                            # Add the part id.
-                            current_chord.append(id_map[part.id])
+def _init_encode_worker(parts):
+    """
+    Keeps the parts of the score of an encoding pool in one of its worker processes.
 
-                            pitches.append(current_chord)
-                        else:
-                            current_chord = [2, dynamic, 0]
+    :param parts: The list of the measured music21 parts of the score.
+    """
+
+    global _worker_parts
 
-                            # add in each pitch.
-                            for pitch in element.pitches:
-                                current_chord.append(pitch.pitchClass)
-                                current_chord.append(pitch.octave)
+    _worker_parts = parts
 
-                            # Pad remaining note positions for chords smaller than largest.
-                            for i in range(largest_chord - element.multisetCardinality):
-                                current_chord.append(-1)
-                                current_chord.append(-1)
 
-                            # Add the part id.
-                            current_chord.append(id_map[part.id])
+def _encode_part_task(task):
+    """
+    Encodes a part of the score held by a worker process.
 
-                            pitches.append(current_chord)
+    :param task: A tuple of the index of the part, the size of the largest chord, the vmf part id,
+    the TickGrid of the body and its number of ticks.
+    :return: The [repeat_count, tick] runs of the part.
+    """
 
-                        # a tie can only begin or end at a new chord.
-                        if element.tie is not None and element.tie.type == 'start':
-                            tie_active = True
-                        else:
-                            tie_active = False
-                    else:
-                        current_chord = [2, dynamic, 0]
+    part_number, largest_chord, part_id, tick_grid, number_of_ticks = task
 
-                        # add in each pitch.
-                        for pitch in element.pitches:
-                            current_chord.append(pitch.pitchClass)
-                            current_chord.append(pitch.octave)
+    part = _worker_parts[part_number]
 
-                        # Pad remaining note positions for chords smaller than largest.
-                        for i in range(largest_chord - element.multisetCardinality):
-                            current_chord.append(-1)
-                            current_chord.append(-1)
+    return list(iter_run_length_encoded_runs(iter_element_runs(iter_part_elements(part), largest_chord, part_id,
+                                                               tick_grid, find_pickup_padding(part),
+                                                               number_of_ticks)))
+
+
+def convert_score_to_vmf(score, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK,
+                         adaptive_resolution=False, max_ticks=None, max_bytes=None, coarsen=False, measure_index=False,
+                         processes=1):
+    """
+    Converts a MIDI file to an vmf file.
 
-                        # add the part id.
-                        current_chord.append(id_map[part.id])
+    :param score: The music21 score to convert to VMF.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param adaptive_resolution: Whether the tick value may change between measures, so that a fine
+    tuplet only refines the grid of the measures it is in.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a score over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    :param measure_index: Whether the header indexes the first tick of each measure, so that
+    a range of measures can be decoded without the rest of the body.
+    :param processes: The number of worker processes encoding the parts concurrently, 1 to encode
+    them in this process, or None for one per CPU. The output is the same either way.
+    :return: A dictionary containing the VMF data structure.
+    """
 
-                        pitches.append(current_chord)
+    header, body = encode_score(score, body_encoding, body_layout, adaptive_resolution, max_ticks, max_bytes, coarsen,
+                                measure_index, processes)
 
-            elif isinstance(element, note.Rest):
-                n_frames = element.duration.quarterLength / smallest_note
+    return {u'header': header, u'body': list(body)}
 
-                for i in range(int(n_frames)):
-                    pitches.append([0, 0, 0])
 
-                    # Pad remaining note positions:
-                    for i in range(largest_chord - 1):
-                        pitches[-1].append(0)
-                        pitches[-1].append(0)
+def write_vmf(score, file, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK,
+              adaptive_resolution=False, max_ticks=None, max_bytes=None, coarsen=False, measure_index=False,
+              processes=1):
+    """
+    Converts a score to VMF and streams it to a file object.
 
-                    # Finally add the part id.
-                    pitches[-1].append(id_map[part.id])
+    The header is written first and the body rows follow as they are encoded, so
+    memory use does not grow with the length of the score. The output is the same
+    as serializing the result of convert_score_to_vmf with json.dumps.
 
-        parts.append(pitches)
+    :param score: The music21 score to convert to VMF.
+    :param file: A text file object to write to.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice. The voice
+    layout is written one voice at a time.
+    :param adaptive_resolution: Whether the tick value may change between measures, so that a fine
+    tuplet only refines the grid of the measures it is in.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a score over the budget falls back to a coarser grid instead of
+    raising a ValueError.
+    :param measure_index: Whether the header indexes the first tick of each measure, so that
+    a range of measures can be decoded without the rest of the body.
+    :param processes: The number of worker processes encoding the parts concurrently, 1 to encode
+    them in this process, or None for one per CPU. The output is the same either way.
+    """
 
-    vmf_file = {u'header': {}, u'body': [list(tick) for tick in zip(*parts)]}
+    header, body = encode_score(score, body_encoding, body_layout, adaptive_resolution, max_ticks, max_bytes, coarsen,
+                                measure_index, processes)
+
+    dump_vmf(header, body, file)
+
+
+def dump_vmf(header, body, file):
+    """
+    Streams a VMF header and the rows of its body to a file object, as JSON.
+
+    :param header: The header dictionary.
+    :param body: An iterable over the rows of the body, or over its voices in the voice layout.
+    :param file: A text file object to write to.
+    """
+
+    file.write('{"header": ')
+    file.write(json.dumps(header))
+    file.write(', "body": [')
+
+    separator = ''
+
+    for row in body:
+        file.write(separator)
+        file.write(json.dumps(row))
+        separator = ', '
+
+    file.write(']}')
+
+
+def encode_score(score, body_encoding=BODY_ENCODING_PLAIN, body_layout=BODY_LAYOUT_TICK, adaptive_resolution=False,
+                 max_ticks=None, max_bytes=None, coarsen=False, measure_index=False, processes=1):
+    """
+    Prepares a score and sets up the lazy encoding of its body.
+
+    :param score: The music21 score to convert to VMF.
+    :param body_encoding: The encoding of the VMF body, plain or run-length encoded.
+    :param body_layout: The layout of the VMF body, by tick or by voice.
+    :param adaptive_resolution: Whether the tick value may change between measures, so that a fine
+    tuplet only refines the grid of the measures it is in.
+    :param max_ticks: The largest number of ticks allowed, or None for no limit.
+    :param max_bytes: The largest predicted JSON size allowed, or None for no limit.
+    :param coarsen: Whether a score over the budget falls back to a coarser grid instead of
+    raising a ValueError. The budget is checked before any tick is encoded.
+    :param measure_index: Whether the header indexes the first tick of each measure.
+    :param processes: The number of worker processes encoding the parts concurrently, 1 to encode
+    them lazily in this process, or None for one per CPU.
+    :return: A tuple of the header dictionary and a generator over the rows of the body,
+    or over its voices in the voice layout.
+    """
+
+    if body_encoding not in (BODY_ENCODING_PLAIN, BODY_ENCODING_RLE):
+        raise ValueError("Body encoding is not supported")
+
+    if body_layout not in (BODY_LAYOUT_TICK, BODY_LAYOUT_VOICE):
+        raise ValueError("Body layout is not supported")
+
+    smallest_note, largest_chord, number_of_parts, id_map = prepare_score_for_vmf(score)
+
+    tick_grid = select_tick_grid(score, smallest_note, adaptive_resolution)
 
     # Prepare the header.
-    # Get a string of the fraction representation.
-    # Limiting the denominator to get clean values (ie 1/3). The
-    # limit of 64 ends up being a 256th note which is never really used.
-    vmf_file['header']['tick_value'] = str(Fraction(smallest_note).limit_denominator(64))
-    vmf_file['header']['number_of_voices'] = scan_score_for_number_of_voices(score)
-    vmf_file['header']['number_of_parts'] = number_of_parts
+    header = build_vmf_header(score, tick_grid.tick_values[0], number_of_parts, tick_grid)
 
-    vmf_file['header']['time_signature'] = {}
+    extent = scan_score_extent(score)
 
-    # Get the time signatures.
-    for time_signature in score.flat.getElementsByClass(meter.TimeSignature):
-        vmf_file['header']['time_signature'][str(time_signature.offset)] = time_signature.ratioString
+    if max_ticks is not None or max_bytes is not None:
+        budget_grid = fit_tick_grid(extent, tick_grid, smallest_note, largest_chord, header,
+                                    body_encoding, max_ticks, max_bytes, coarsen)
 
-    vmf_file['header']['key_signature'] = {}
+        if budget_grid != tick_grid:
+            tick_grid = budget_grid
+            header = build_vmf_header(score, tick_grid.tick_values[0], number_of_parts, tick_grid)
 
-    # Get the key signatures
-    for key_signature in score.flat.getElementsByClass(key.KeySignature):
-        vmf_file['header']['key_signature'][str(key_signature.offset)] = key_signature.sharps
+    smallest_note = tick_grid.tick_values[0]
+
+    if measure_index:
+        header['measure_index'] = build_measure_index(score, tick_grid)
+
+    if body_encoding == BODY_ENCODING_RLE:
+        header['body_encoding'] = BODY_ENCODING_RLE
+
+    if body_layout == BODY_LAYOUT_VOICE:
+        header['body_layout'] = BODY_LAYOUT_VOICE
+
+    # Every voice runs to the end of the longest one.
+    number_of_ticks = count_body_ticks(extent[0], tick_grid)
+
+    if can_encode_in_parallel(score, processes):
+        part_runs = encode_parts_in_parallel(score, largest_chord, id_map, tick_grid, number_of_ticks, processes)
+
+        if body_layout == BODY_LAYOUT_VOICE:
+            return header, iter_parallel_vmf_voices(part_runs, body_encoding)
 
-    vmf_file['header']['tempo'] = {}
+        body = iter_parallel_vmf_body(part_runs)
+    elif body_layout == BODY_LAYOUT_VOICE:
+        return header, iter_vmf_voices(score, smallest_note, largest_chord, id_map, body_encoding, tick_grid,
+                                       number_of_ticks)
+    else:
+        body = iter_vmf_body(score, smallest_note, largest_chord, id_map, tick_grid, number_of_ticks)
 
-    for t in score.flat.getElementsByClass(tempo.MetronomeMark):
-        vmf_file['header']['tempo'][str(t.offset)] = t.getQuarterBPM()
+    if body_encoding == BODY_ENCODING_RLE:
+        body = iter_run_length_encoded_body(body)
 
-    return vmf_file
+    return header, body
@@ -0,0 +1,117 @@
+"""Predicted size of the VMF encoding of a score, computed before any tick is encoded."""
+from fractions import Fraction
+import struct
+import sys
+
+from vmf_converter.core.vmf_header import BODY_ENCODING_PLAIN, BODY_ENCODING_RLE
+
+# The average number of characters of a tick value in JSON, measured on the test fixtures.
+# Most values are single digits.
+AVERAGE_DIGITS_PER_VALUE = 1.2
+# The characters separating the items of a JSON list.
+SEPARATOR_BYTES = len(', ')
+# The characters of a VMF document besides its header and body.
+DOCUMENT_BYTES = len('{"header": , "body": []}')
+# The characters of the repeat count of a run, with its brackets and separator.
+RUN_COUNT_BYTES = len('[100, ]')
+# The values of a tick besides its pitches: state, dynamic, articulation and part id.
+BASIC_TICK_WIDTH = 4
+# The size of an item of a Python list.
+POINTER_BYTES = struct.calcsize('P')
+# The size of an empty Python list.
+LIST_BYTES = sys.getsizeof([])
+
+
+class VMFCost:
+    """
+    The predicted size of the VMF encoding of a score.
+
+    The body sizes are for rows held in memory by tick, as built by convert_score_to_vmf.
+    The small integers of the ticks are shared by Python, so only the lists count.
+    Run-length encoded sizes are upper bounds, with two runs per element.
+    """
+
+    def __init__(self, number_of_ticks, number_of_voices, largest_chord, number_of_runs=None, header_bytes=0,
+                 body_encoding=BODY_ENCODING_PLAIN):
+        """
+        :param number_of_ticks: The number of ticks of the longest voice.
+        :param number_of_voices: The number of voices.
+        :param largest_chord: The size of the largest chord.
+        :param number_of_runs: An upper bound on the number of runs of the body, or None for one per tick.
+        :param header_bytes: The size of the JSON header.
+        :param body_encoding: The encoding of the body, plain or run-length encoded.
+        """
+
+        self.number_of_ticks = number_of_ticks
+        self.number_of_voices = number_of_voices
+        self.largest_chord = largest_chord
+        self.number_of_runs = number_of_ticks if number_of_runs is None else number_of_runs
+        self.header_bytes = header_bytes
+        self.body_encoding = body_encoding
+
+    @property
+    def row_width(self):
+        """
+        The number of values in the tick of a voice.
+        """
+
+        return BASIC_TICK_WIDTH + 2 * self.largest_chord
+
+    @property
+    def number_of_rows(self):
+        """
+        The number of rows of the body, or of runs when it is run-length encoded.
+        """
+
+        if self.body_encoding == BODY_ENCODING_RLE:
+            return min(self.number_of_runs, self.number_of_ticks)
+
+        return self.number_of_ticks
+
+    @property
+    def json_bytes(self):
+        """
+        The predicted size of the JSON document.
+        """
+
+        # Count exactly, since scores with a microscopic tick value have more ticks than a float can hold.
+        tick_bytes = self.row_width * (Fraction(AVERAGE_DIGITS_PER_VALUE) + SEPARATOR_BYTES) + 2
+        row_bytes = self.number_of_voices * tick_bytes + 2
+
+        if self.body_encoding == BODY_ENCODING_RLE:
+            row_bytes += RUN_COUNT_BYTES
+
+        return round(self.header_bytes + DOCUMENT_BYTES + self.number_of_rows * row_bytes)
+
+    @property
+    def peak_memory(self):
+        """
+        The predicted memory used by the rows of the body, in bytes.
+        """
+
+        tick_memory = LIST_BYTES + POINTER_BYTES * self.row_width
+        row_memory = POINTER_BYTES + LIST_BYTES + POINTER_BYTES * self.number_of_voices + \
+            self.number_of_voices * tick_memory
+
+        if self.body_encoding == BODY_ENCODING_RLE:
+            row_memory += LIST_BYTES + 2 * POINTER_BYTES
+
+        return self.number_of_rows * row_memory
+
+    def exceeds(self, max_ticks=None, max_bytes=None):
+        """
+        Checks the cost against a budget.
+
+        :param max_ticks: The largest number of ticks allowed, or None for no limit.
+        :param max_bytes: The largest JSON size allowed, or None for no limit.
+        :return: True if the encoding is over the budget.
+        """
+
+        if max_ticks is not None and self.number_of_ticks > max_ticks:
+            return True
+
+        return max_bytes is not None and self.json_bytes > max_bytes
+
+    def __repr__(self):
+        return '<VMFCost ticks=%d voices=%d row_width=%d json_bytes=%d peak_memory=%d>' % (
+            self.number_of_ticks, self.number_of_voices, self.row_width, self.json_bytes, self.peak_memory)
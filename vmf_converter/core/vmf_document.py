@@ -0,0 +1,540 @@
+"""Lightweight access to VMF data without building music21 objects."""
+from bisect import bisect_right
+from fractions import Fraction
+import json
+
+from vmf_converter.core.tick_grid import TickGrid, to_exact_quarter_length
+from vmf_converter.core.vmf_binary import VMFBinaryFile, is_vmf_binary_file
+from vmf_converter.core.vmf_header import VMFHeader, BODY_ENCODING_RLE, BODY_LAYOUT_VOICE
+
+# Part id is the last bit.
+INDEX_OF_PART_ID_BIT = -1
+
+
+class VMFDocument:
+    """
+    The header and ticks of VMF data, with views over voices, parts and tick ranges.
+
+    Views and slices refer to the ticks of the document rather than copying them, and
+    nothing here imports music21. Converting to a music21 score is done explicitly with to_score.
+    """
+
+    def __init__(self, header, body, start=0, stop=None):
+        """
+        Creates a document over the body of VMF data.
+
+        :param header: The VMFHeader of the data.
+        :param body: The body of the data, in the encoding and layout described by the header, or a VMFBinaryFile.
+        :param start: The first tick of the document within the body.
+        :param stop: The tick after the last tick of the document, or None for the end of the body.
+        """
+
+        self.header = header
+
+        if isinstance(body, (VMFBinaryFile, _ListSource, _RunLengthSource, _VoiceMajorSource)):
+            self.__source = body
+        elif header.body_layout == BODY_LAYOUT_VOICE:
+            if header.body_encoding == BODY_ENCODING_RLE:
+                self.__source = _VoiceMajorSource([_RunLengthSource(voice) for voice in body])
+            else:
+                self.__source = _VoiceMajorSource([_ListSource(voice) for voice in body])
+        elif header.body_encoding == BODY_ENCODING_RLE:
+            self.__source = _RunLengthSource(body)
+        else:
+            self.__source = _ListSource(body)
+
+        self.start = start
+        self.stop = len(self.__source) if stop is None else stop
+
+    @classmethod
+    def from_dict(cls, vmf):
+        """
+        Creates a document from VMF data in its dictionary form.
+
+        :param vmf: A dictionary with the header and body of the VMF data.
+        :return: A VMFDocument instance.
+        """
+
+        return cls(VMFHeader.from_dict(vmf['header']), vmf['body'])
+
+    @classmethod
+    def from_string(cls, vmf_string):
+        """
+        Creates a document from the contents of a VMF file.
+
+        :param vmf_string: The contents of the VMF file as a string.
+        :return: A VMFDocument instance.
+        """
+
+        return cls.from_dict(json.loads(vmf_string))
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Opens a VMF file, either JSON or binary. Binary files are memory-mapped and
+        stay open until the document is closed.
+
+        :param path: The path of the file to open.
+        :return: A VMFDocument instance.
+        """
+
+        if is_vmf_binary_file(path):
+            binary_file = VMFBinaryFile(path)
+
+            return cls(VMFHeader.from_dict(binary_file.header), binary_file)
+
+        with open(path, 'r') as file:
+            return cls.from_dict(json.load(file))
+
+    @property
+    def number_of_ticks(self):
+        """
+        The number of ticks in the document.
+        """
+
+        return self.stop - self.start
+
+    @property
+    def part_ids(self):
+        """
+        The part ids of the document, in the order of their first voice.
+        """
+
+        part_ids = []
+
+        for voice_number in range(self.header.number_of_voices):
+            part_id = self.voice_part_id(voice_number)
+
+            if part_id not in part_ids:
+                part_ids.append(part_id)
+
+        return part_ids
+
+    def voice_part_id(self, voice_number):
+        """
+        Finds the part a voice belongs to.
+
+        :param voice_number: The index of the voice.
+        :return: The part id of the voice, or None if the body has no ticks.
+        """
+
+        if len(self.__source) == 0:
+            return None
+
+        return self.__source.voice_tick(0, voice_number)[INDEX_OF_PART_ID_BIT]
+
+    def voice(self, voice_number):
+        """
+        Gets a view over the ticks of a single voice.
+
+        :param voice_number: The index of the voice.
+        :return: A VoiceView instance.
+        """
+
+        if not 0 <= voice_number < self.header.number_of_voices:
+            raise IndexError("Voice number out of range")
+
+        return VoiceView(self.__source, voice_number, self.start, self.stop)
+
+    def voices(self):
+        """
+        Gets views over the ticks of every voice.
+
+        :return: A list of VoiceView instances.
+        """
+
+        return [self.voice(voice_number) for voice_number in range(self.header.number_of_voices)]
+
+    def part(self, part_id):
+        """
+        Gets a view over the ticks of the voices of a part.
+
+        :param part_id: The part id, as found in the last bit of the ticks.
+        :return: A PartView instance.
+        """
+
+        voice_numbers = [voice_number for voice_number in range(self.header.number_of_voices)
+                         if self.voice_part_id(voice_number) == part_id]
+
+        if len(voice_numbers) == 0:
+            raise KeyError("Part id not found")
+
+        return PartView(self.__source, part_id, voice_numbers, self.start, self.stop)
+
+    def parts(self):
+        """
+        Gets views over the ticks of every part.
+
+        :return: A list of PartView instances.
+        """
+
+        return [self.part(part_id) for part_id in self.part_ids]
+
+    def ticks(self, start, stop):
+        """
+        Gets a document over a range of ticks of this document, without copying them.
+
+        :param start: The first tick of the range.
+        :param stop: The tick after the last tick of the range.
+        :return: A VMFDocument instance.
+        """
+
+        start, stop = _clamp_range(start, stop, self.number_of_ticks)
+
+        return VMFDocument(self.header, self.__source, self.start + start, self.start + stop)
+
+    def measures(self, first, last=None):
+        """
+        Gets a document over the ticks of a range of measures, from the measure index of the header.
+        Measure numbers refer to the whole body, whatever the range of this document.
+
+        :param first: The number of the first measure.
+        :param last: The number of the last measure, included, or None for the first measure only.
+        :return: A VMFDocument instance.
+        """
+
+        measure_index = self.header.measure_index
+
+        if len(measure_index) == 0:
+            raise ValueError("VMF data has no measure index")
+
+        if last is None:
+            last = first
+
+        if first not in measure_index or last not in measure_index:
+            raise KeyError("Measure number not found")
+
+        start = measure_index[first][1]
+        last_start = measure_index[last][1]
+
+        # The range ends where the next measure in the body starts.
+        stop = min([tick_number for offset, tick_number in measure_index.values() if tick_number > last_start] +
+                   [len(self.__source)])
+
+        return VMFDocument(self.header, self.__source, start, max(start, stop))
+
+    def offsets(self, start, stop):
+        """
+        Gets a document over the ticks of a range of offsets. Offsets are counted from the
+        start of the whole body, whatever the range of this document.
+
+        :param start: The offset of the start of the range, in quarter lengths.
+        :param stop: The offset of the end of the range, in quarter lengths.
+        :return: A VMFDocument instance over the ticks the range overlaps.
+        """
+
+        tick_grid = TickGrid.from_header(self.header.to_dict())
+        start_tick = tick_grid.tick_number(start)
+        stop_tick = tick_grid.tick_number(stop)
+
+        # A range ending inside a tick includes it.
+        if tick_grid.offset(stop_tick) < to_exact_quarter_length(stop):
+            stop_tick += 1
+
+        start_tick, stop_tick = _clamp_range(start_tick, stop_tick, len(self.__source))
+
+        return VMFDocument(self.header, self.__source, start_tick, stop_tick)
+
+    def to_score(self):
+        """
+        Converts the document to a music21 score. This is the only step that imports music21.
+
+        A range of ticks starts with the meter, key and tempo in effect at its first tick, and
+        with the notes sounding there, tied to the part before the range.
+
+        :return: A music21 score instance containing the music in the document.
+        """
+
+        from vmf_converter.core import vmf_converter_core
+
+        return vmf_converter_core.read_vmf({'header': self.plain_header(), 'body': iter(self)})
+
+    def to_midi(self):
+        """
+        Renders the document to a Standard MIDI File, without building a music21 score.
+
+        :return: The bytes of the MIDI file.
+        """
+
+        from vmf_converter.core import midi_writer
+
+        return midi_writer.convert_document_to_midi(self)
+
+    def to_musicxml(self):
+        """
+        Renders the document to a MusicXML file, without building a music21 score.
+
+        :return: The contents of the MusicXML file as a string.
+        """
+
+        from vmf_converter.core import musicxml_writer
+
+        return musicxml_writer.convert_document_to_musicxml(self)
+
+    def to_dict(self):
+        """
+        Converts the document to VMF data in its dictionary form, with a plain body.
+
+        :return: A dictionary with the header and body of the VMF data.
+        """
+
+        return {'header': self.plain_header(), 'body': list(self)}
+
+    def plain_header(self):
+        """
+        Gets the header dictionary of the document's ticks, as a plain body by tick.
+
+        :return: The header dictionary.
+        """
+
+        header = self.header.to_dict()
+        header.pop('body_encoding', None)
+        header.pop('body_layout', None)
+
+        if self.start == 0:
+            return header
+
+        # The offsets of a tick range are counted from its first tick.
+        start_offset = TickGrid.from_header(header).offset(self.start)
+
+        if 'tick_values' in header:
+            tick_grid = TickGrid.from_header(header).from_tick(self.start)
+
+            header['tick_value'] = str(tick_grid.tick_values[0])
+            header['tick_values'] = tick_grid.to_dict()
+
+        for field in ('time_signature', 'key_signature', 'tempo'):
+            header[field] = _rebase_offsets(header[field], start_offset)
+
+        if 'measure_index' in header:
+            header['measure_index'] = {number: [offset - float(start_offset), tick_number - self.start]
+                                       for number, (offset, tick_number) in header['measure_index'].items()
+                                       if self.start <= tick_number < self.stop}
+
+        return header
+
+    def close(self):
+        """
+        Closes the underlying binary file, if there is one.
+        """
+
+        if isinstance(self.__source, VMFBinaryFile):
+            self.__source.close()
+
+    def __len__(self):
+        return self.number_of_ticks
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("Tick slices do not support steps")
+
+            return self.ticks(index.start, index.stop)
+
+        return self.__source.tick(self.start + _check_index(index, self.number_of_ticks))
+
+    def __iter__(self):
+        for tick_number in range(self.start, self.stop):
+            yield self.__source.tick(tick_number)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class VoiceView:
+    """
+    Read-only view over the ticks of one voice of a VMF document.
+    """
+
+    def __init__(self, source, voice_number, start, stop):
+        self.voice_number = voice_number
+        self.start = start
+        self.stop = stop
+        self.__source = source
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("Tick slices do not support steps")
+
+            start, stop = _clamp_range(index.start, index.stop, len(self))
+
+            return VoiceView(self.__source, self.voice_number, self.start + start, self.start + stop)
+
+        return self.__source.voice_tick(self.start + _check_index(index, len(self)), self.voice_number)
+
+    def __iter__(self):
+        for tick_number in range(self.start, self.stop):
+            yield self.__source.voice_tick(tick_number, self.voice_number)
+
+
+class PartView:
+    """
+    Read-only view over the ticks of the voices of one part of a VMF document.
+    Each tick is a list with the row of every voice of the part.
+    """
+
+    def __init__(self, source, part_id, voice_numbers, start, stop):
+        self.part_id = part_id
+        self.voice_numbers = voice_numbers
+        self.start = start
+        self.stop = stop
+        self.__source = source
+
+    def voices(self):
+        """
+        Gets views over the ticks of every voice of the part.
+
+        :return: A list of VoiceView instances.
+        """
+
+        return [VoiceView(self.__source, voice_number, self.start, self.stop) for voice_number in self.voice_numbers]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("Tick slices do not support steps")
+
+            start, stop = _clamp_range(index.start, index.stop, len(self))
+
+            return PartView(self.__source, self.part_id, self.voice_numbers, self.start + start, self.start + stop)
+
+        tick_number = self.start + _check_index(index, len(self))
+
+        return [self.__source.voice_tick(tick_number, voice_number) for voice_number in self.voice_numbers]
+
+    def __iter__(self):
+        for tick_number in range(self.start, self.stop):
+            yield [self.__source.voice_tick(tick_number, voice_number) for voice_number in self.voice_numbers]
+
+
+class _ListSource:
+    """
+    Access to the ticks of a plain body.
+    """
+
+    def __init__(self, body):
+        self.body = body
+
+    def tick(self, tick_number):
+        return self.body[tick_number]
+
+    def voice_tick(self, tick_number, voice_number):
+        return self.body[tick_number][voice_number]
+
+    def __len__(self):
+        return len(self.body)
+
+
+class _RunLengthSource:
+    """
+    Access to the ticks of a run-length encoded body, without expanding it.
+    """
+
+    def __init__(self, body):
+        self.body = body
+
+        # The first tick of each run.
+        self.starts = []
+
+        number_of_ticks = 0
+
+        for repeat_count, row in body:
+            self.starts.append(number_of_ticks)
+            number_of_ticks += repeat_count
+
+        self.number_of_ticks = number_of_ticks
+
+    def tick(self, tick_number):
+        if not 0 <= tick_number < self.number_of_ticks:
+            raise IndexError("Tick number out of range")
+
+        return self.body[bisect_right(self.starts, tick_number) - 1][1]
+
+    def voice_tick(self, tick_number, voice_number):
+        return self.tick(tick_number)[voice_number]
+
+    def __len__(self):
+        return self.number_of_ticks
+
+
+class _VoiceMajorSource:
+    """
+    Access to the ticks of a body in the voice layout, with one source per voice.
+    """
+
+    def __init__(self, voices):
+        self.voices = voices
+
+    def tick(self, tick_number):
+        return [voice.tick(tick_number) for voice in self.voices]
+
+    def voice_tick(self, tick_number, voice_number):
+        return self.voices[voice_number].tick(tick_number)
+
+    def __len__(self):
+        return len(self.voices[0]) if len(self.voices) > 0 else 0
+
+
+def _check_index(index, length):
+    """
+    Resolves a negative index and checks that an index is in range.
+
+    :param index: The index to check.
+    :param length: The length of the sequence.
+    :return: The non-negative index.
+    """
+
+    if index < 0:
+        index += length
+
+    if not 0 <= index < length:
+        raise IndexError("Tick number out of range")
+
+    return index
+
+
+def _rebase_offsets(mapping, start_offset):
+    """
+    Counts the events of a header map from a new start, keeping the one in effect there.
+
+    :param mapping: A map of the header dictionary, keyed by offset strings.
+    :param start_offset: The offset of the new start, as a Fraction.
+    :return: The map from the new start, with the event in effect there at offset 0.
+    """
+
+    events = sorted((Fraction(float(offset)), value) for offset, value in mapping.items())
+
+    rebased = {}
+
+    for offset, value in events:
+        if offset <= start_offset:
+            rebased = {'0.0': value}
+        else:
+            rebased[str(float(offset - start_offset))] = value
+
+    return rebased
+
+
+def _clamp_range(start, stop, length):
+    """
+    Resolves the bounds of a slice the way list slicing does.
+
+    :param start: The start of the slice, or None.
+    :param stop: The stop of the slice, or None.
+    :param length: The length of the sequence.
+    :return: The resolved (start, stop) pair.
+    """
+
+    start, stop, step = slice(start, stop).indices(length)
+
+    return start, max(start, stop)
@@ -0,0 +1,128 @@
+"""Typed representation of the header of a VMF file."""
+from fractions import Fraction
+
+# Encodings of the VMF body, flagged by the header's body_encoding field.
+# The plain encoding has one row per tick and is used when the field is absent.
+BODY_ENCODING_PLAIN = 'plain'
+# The run-length encoding stores [repeat_count, row] pairs for runs of identical rows.
+BODY_ENCODING_RLE = 'rle'
+
+# Layouts of the VMF body, flagged by the header's body_layout field.
+# The tick layout has one row per tick holding every voice, and is used when the field is absent.
+BODY_LAYOUT_TICK = 'tick'
+# The voice layout has one list per voice holding all of its ticks, or its runs when run-length encoded.
+BODY_LAYOUT_VOICE = 'voice'
+
+
+class VMFHeader:
+    """
+    The header of a VMF file, with typed fields.
+
+    The meter, key, tempo and tick value maps are keyed by their offset in quarter lengths, as floats.
+    The measure index is keyed by measure number.
+    """
+
+    def __init__(self, tick_value, number_of_voices, number_of_parts,
+                 time_signature=None, key_signature=None, tempo=None, body_encoding=BODY_ENCODING_PLAIN,
+                 body_layout=BODY_LAYOUT_TICK, tick_values=None, measure_index=None):
+        """
+        Creates a header.
+
+        :param tick_value: The duration of a tick as a fraction of a quarter note.
+        :param number_of_voices: The number of voices in the body.
+        :param number_of_parts: The number of parts the voices belong to.
+        :param time_signature: A mapping of offsets to time signature ratio strings.
+        :param key_signature: A mapping of offsets to the number of sharps of the key signature.
+        :param tempo: A mapping of offsets to quarter note BPMs.
+        :param body_encoding: The encoding of the body.
+        :param body_layout: The layout of the body.
+        :param tick_values: A mapping of offsets to the tick values of the sections starting there,
+        when the tick value changes within the body.
+        :param measure_index: A mapping of measure numbers to the (offset, tick number) pairs of their starts.
+        """
+
+        self.tick_value = Fraction(tick_value)
+        self.number_of_voices = number_of_voices
+        self.number_of_parts = number_of_parts
+        self.time_signature = dict(time_signature or {})
+        self.key_signature = dict(key_signature or {})
+        self.tempo = dict(tempo or {})
+        self.body_encoding = body_encoding
+        self.body_layout = body_layout
+        self.tick_values = {offset: Fraction(tick_value) for offset, tick_value in (tick_values or {}).items()}
+        self.measure_index = {int(number): (float(offset), int(tick_number))
+                              for number, (offset, tick_number) in (measure_index or {}).items()}
+
+    @classmethod
+    def from_dict(cls, header):
+        """
+        Creates a header from its dictionary form in a VMF file.
+
+        :param header: The header dictionary.
+        :return: A VMFHeader instance.
+        """
+
+        return cls(tick_value=Fraction(header['tick_value']),
+                   number_of_voices=header['number_of_voices'],
+                   number_of_parts=header['number_of_parts'],
+                   time_signature=cls.__parse_offsets(header.get('time_signature', {})),
+                   key_signature=cls.__parse_offsets(header.get('key_signature', {})),
+                   tempo=cls.__parse_offsets(header.get('tempo', {})),
+                   body_encoding=header.get('body_encoding', BODY_ENCODING_PLAIN),
+                   body_layout=header.get('body_layout', BODY_LAYOUT_TICK),
+                   tick_values=cls.__parse_offsets(header.get('tick_values', {})),
+                   measure_index=header.get('measure_index', {}))
+
+    def to_dict(self):
+        """
+        Converts the header to its dictionary form in a VMF file.
+
+        :return: The header dictionary.
+        """
+
+        header = {
+            'tick_value': str(self.tick_value),
+            'number_of_voices': self.number_of_voices,
+            'number_of_parts': self.number_of_parts,
+            'time_signature': self.__format_offsets(self.time_signature),
+            'key_signature': self.__format_offsets(self.key_signature),
+            'tempo': self.__format_offsets(self.tempo)
+        }
+
+        # The plain encoding is implied when the field is absent.
+        if self.body_encoding != BODY_ENCODING_PLAIN:
+            header['body_encoding'] = self.body_encoding
+
+        # So is the tick layout.
+        if self.body_layout != BODY_LAYOUT_TICK:
+            header['body_layout'] = self.body_layout
+
+        # And a single tick value throughout.
+        if len(self.tick_values) > 0:
+            header['tick_values'] = {str(float(offset)): str(tick_value)
+                                     for offset, tick_value in self.tick_values.items()}
+
+        # The measure index is optional.
+        if len(self.measure_index) > 0:
+            header['measure_index'] = {str(number): [offset, tick_number]
+                                       for number, (offset, tick_number) in self.measure_index.items()}
+
+        return header
+
+    def __eq__(self, other):
+        return isinstance(other, VMFHeader) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<VMFHeader tick_value=%s voices=%d parts=%d>' % (
+            self.tick_value, self.number_of_voices, self.number_of_parts)
+
+    @staticmethod
+    def __parse_offsets(mapping):
+        return {float(offset): value for offset, value in mapping.items()}
+
+    @staticmethod
+    def __format_offsets(mapping):
+        return {str(float(offset)): value for offset, value in mapping.items()}
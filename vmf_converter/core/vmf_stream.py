@@ -0,0 +1,246 @@
+"""Incremental reading of VMF JSON files, one body row at a time."""
+import json
+
+
+# Characters skipped between JSON tokens.
+WHITESPACE = ' \t\n\r'
+
+
+class VMFStreamReader:
+    """
+    Reads a VMF JSON document from a file object without loading it whole.
+
+    The header is parsed as soon as the reader is created, and the body rows are then
+    decoded one at a time as they are iterated. Only the standard library is used.
+
+    A body in the voice layout holds one array per voice, which is decoded one tick at a
+    time, so that no single JSON value spans more of the file than a tick or a row.
+    """
+
+    def __init__(self, file, chunk_size=65536):
+        """
+        Creates a reader and parses everything up to the first body row.
+
+        :param file: A text file object positioned at the start of a VMF document.
+        :param chunk_size: The number of characters to read from the file at a time.
+        """
+
+        self.__file = file
+        self.__chunk_size = chunk_size
+        self.__buffer = ''
+        self.__position = 0
+        self.__end_of_file = False
+        self.__decoder = json.JSONDecoder()
+
+        # Rows found before the header, when the body is not written last.
+        self.__buffered_rows = None
+
+        self.header = None
+
+        self.__expect('{')
+
+        while self.header is None:
+            key = self.__next_key()
+
+            if key is None:
+                raise ValueError("VMF document has no header")
+
+            if key == 'header':
+                self.header = self.__next_value()
+            elif key == 'body':
+                # The header comes later, so the rows have to be kept until it is found.
+                self.__buffered_rows = list(self.__iter_body())
+            else:
+                self.__next_value()
+
+        if self.__buffered_rows is None:
+            # Position the reader on the first row of the body.
+            while True:
+                key = self.__next_key()
+
+                if key is None:
+                    raise ValueError("VMF document has no body")
+
+                if key == 'body':
+                    break
+
+                self.__next_value()
+
+    def rows(self):
+        """
+        Decodes the body rows one at a time.
+
+        :return: A generator over the rows of the body.
+        """
+
+        if self.__buffered_rows is not None:
+            rows = self.__buffered_rows
+            self.__buffered_rows = []
+
+            for row in rows:
+                yield row
+        else:
+            for row in self.__iter_body():
+                yield row
+
+    def __iter__(self):
+        return self.rows()
+
+    def __next_key(self):
+        """
+        Reads the next key of the top level object, up to and including its colon.
+
+        :return: The key, or None at the end of the object.
+        """
+
+        character = self.__peek()
+
+        if character == '}':
+            self.__position += 1
+            return None
+
+        if character == ',':
+            self.__position += 1
+
+        key = self.__next_value()
+
+        self.__expect(':')
+
+        return key
+
+    def __iter_body(self):
+        """
+        Decodes the elements of the body array one at a time.
+
+        :return: A generator over the rows of the body, or over its voices in the voice layout.
+        """
+
+        # The layout is unknown while the header has not been read, and a voice is walked into then too.
+        if self.header is not None and self.header.get('body_layout') != 'voice':
+            return self.__iter_array(self.__next_value)
+
+        return self.__iter_array(self.__next_voice)
+
+    def __next_voice(self):
+        """
+        Decodes the next voice of a body in the voice layout, one tick or run at a time.
+
+        :return: The decoded voice.
+        """
+
+        if self.__peek() != '[':
+            return self.__next_value()
+
+        return list(self.__iter_array(self.__next_value))
+
+    def __iter_array(self, next_element):
+        """
+        Decodes the elements of the next JSON array one at a time.
+
+        :param next_element: The function decoding each element.
+        :return: A generator over the decoded elements.
+        """
+
+        self.__expect('[')
+
+        if self.__peek() == ']':
+            self.__position += 1
+            return
+
+        while True:
+            yield next_element()
+
+            character = self.__peek()
+            self.__position += 1
+
+            if character == ']':
+                return
+
+            if character != ',':
+                raise ValueError("Expected ',' or ']' in VMF document")
+
+    def __next_value(self):
+        """
+        Decodes the next JSON value, reading more of the file until it is complete.
+
+        :return: The decoded value.
+        """
+
+        self.__peek()
+
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__position)
+            except ValueError:
+                # The value is decoded again from its start, so at least as much as was scanned
+                # is read each time, and a long value is scanned a bounded number of times.
+                if not self.__read(len(self.__buffer) - self.__position):
+                    raise
+
+                continue
+
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self.__buffer) and not self.__end_of_file and self.__read():
+                continue
+
+            self.__position = end
+
+            return value
+
+    def __expect(self, character):
+        if self.__peek() != character:
+            raise ValueError("Expected '%s' in VMF document" % character)
+
+        self.__position += 1
+
+    def __peek(self):
+        """
+        Skips whitespace and returns the next character without consuming it.
+
+        :return: The next character, or '' at the end of the file.
+        """
+
+        while True:
+            while self.__position < len(self.__buffer) and self.__buffer[self.__position] in WHITESPACE:
+                self.__position += 1
+
+            if self.__position < len(self.__buffer):
+                return self.__buffer[self.__position]
+
+            if not self.__read():
+                return ''
+
+    def __read(self, size=0):
+        """
+        Reads another chunk of the file into the buffer, dropping what was consumed.
+
+        :param size: The least number of characters to read, when it is more than the chunk size.
+        :return: False at the end of the file.
+        """
+
+        if self.__end_of_file:
+            return False
+
+        chunk = self.__file.read(max(size, self.__chunk_size))
+
+        if chunk == '':
+            self.__end_of_file = True
+            return False
+
+        self.__buffer = self.__buffer[self.__position:] + chunk
+        self.__position = 0
+
+        return True
+
+
+def read_vmf_stream(file):
+    """
+    Opens a VMF JSON document for incremental reading.
+
+    :param file: A text file object positioned at the start of a VMF document.
+    :return: A tuple of the header dictionary and a generator over the body rows.
+    """
+
+    reader = VMFStreamReader(file)
+
+    return reader.header, reader.rows()
@@ -1,28 +1,74 @@
 """Bi-directional converter for the vector music format (VMF)."""
 from music21 import converter, note, stream, meter
 import vmf_converter.core.vmf_converter_core as vmf_converter_core
+import vmf_converter.core.vmf_binary as vmf_binary
 
-import json
 
 class VMFConverter(converter.subConverters.SubConverter):
-    """Converter for parsing and writing VMF files."""
-    registerFormats = ('vmf',)
-    registerInputExtensions = ('vmf',)
-    registerOutputExtensions = ('vmf',)
+    """Converter for parsing and writing VMF files, as JSON (.vmf) or binary (.vmfb)."""
+    registerFormats = ('vmf', 'vmfb')
+    registerInputExtensions = ('vmf', 'vmfb')
+    registerOutputExtensions = ('vmf', 'vmfb')
+
+    def __init__(self, cache=None, **keywords):
+        """
+        Creates a converter, optionally backed by an on-disk cache of parsed files.
+
+        :param cache: A VMFCache consulted by parseFile, or None to always parse.
+        """
+        super(VMFConverter, self).__init__(**keywords)
+
+        self.cache = cache
 
     def parseData(self, strData, number=None):
         """Parses a string containing VMF data into a music21 stream."""
         self.stream = vmf_converter_core.read_vmf_string(strData)
 
     def parseFile(self, filePath, number=None):
-        """Parses a file containing VMF data into a music21 stream."""
-        self.stream = vmf_converter_core.read_vmf_file(filePath)
+        """
+        Parses a file containing VMF data into a music21 stream.
+        When a cache is set, a file parsed before is loaded from the cache instead.
+        """
+        if self.cache is not None:
+            self.stream = self.cache.load(filePath, vmf_converter_core.read_vmf_file)
+        else:
+            self.stream = vmf_converter_core.read_vmf_file(filePath)
     
     def write(self, obj, fmt, fp=None, subformats=None, **keywords):
-        """Writes the music21 stream to a VMF file."""
-        vmfDict = vmf_converter_core.convert_score_to_vmf(obj)
-        
+        """
+        Writes the music21 stream to a VMF file.
+        Writing the 'vmf.rle' format run-length encodes the body, writing the 'vmf.voice'
+        format lays the body out by voice, the 'vmf.adaptive' format lets the tick value change
+        between measures, the 'vmf.indexed' format indexes the first tick of each measure in the
+        header, and writing to a .vmfb path writes a binary VMF file.
+        """
+        if subformats and vmf_converter_core.BODY_ENCODING_RLE in subformats:
+            bodyEncoding = vmf_converter_core.BODY_ENCODING_RLE
+        else:
+            bodyEncoding = vmf_converter_core.BODY_ENCODING_PLAIN
+
+        if subformats and vmf_converter_core.BODY_LAYOUT_VOICE in subformats:
+            bodyLayout = vmf_converter_core.BODY_LAYOUT_VOICE
+        else:
+            bodyLayout = vmf_converter_core.BODY_LAYOUT_TICK
+
+        # The 'vmf.adaptive' format lets the tick value change between measures.
+        adaptiveResolution = bool(subformats) and 'adaptive' in subformats
+
+        # The 'vmf.indexed' format adds the measure index, for decoding ranges of measures.
+        measureIndex = bool(subformats) and 'indexed' in subformats
+
+        # music21 regularizes the format to 'vmf', so the binary format is told by its extension.
+        if fmt == 'vmfb' or str(fp).endswith('.vmfb'):
+            vmfDict = vmf_converter_core.convert_score_to_vmf(obj, body_encoding=bodyEncoding, body_layout=bodyLayout,
+                                                           adaptive_resolution=adaptiveResolution,
+                                                           measure_index=measureIndex)
+            vmf_binary.write_vmf_binary_file(vmfDict, fp)
+            return fp
+
+        # Stream the rows out as they are encoded.
         with open(fp, 'w') as f:
-            f.write(json.dumps(vmfDict))
-        
+            vmf_converter_core.write_vmf(obj, f, body_encoding=bodyEncoding, body_layout=bodyLayout,
+                                         adaptive_resolution=adaptiveResolution, measure_index=measureIndex)
+
         return fp